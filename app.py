@@ -1,3 +1,4 @@
+import hashlib
 import os
 import traceback
 from datetime import datetime
@@ -10,6 +11,8 @@ import utils.db_operations as db_operations
 from utils.auto_check import (
     process_and_save_pdf_results,
 )
+from utils.dashboard_loader import DashboardLoader
+from utils.shared_state import claim_job, set_job_status
 
 # 環境変数の読み込み
 load_dotenv()
@@ -28,36 +31,19 @@ if not st.user.is_logged_in:
     st.stop()
 
 # ログイン後の処理
-if st.user.is_logged_in:
-    # ユーザーIDの取得（ログインユーザーのメールアドレスから）
-    user_id = st.user.email
-
-    # ユーザー名の取得（st.user.nameを使用）
-    user_name = st.user.name
-
-    try:
-        # ユーザーが存在しない場合は作成
-        user_created = db_operations.insert_user(user_id, user_name)
-        
-        # ユーザーが新規作成された場合、すべてのチェックグループに追加
-        if user_created:
-            # すべてのチェックグループを取得
-            all_check_groups = db_operations.get_all_check_groups()
-            
-            # 各チェックグループに対してuser_check_groupsテーブルにレコードを追加
-            for group in all_check_groups:
-                try:
-                    db_operations.insert_user_check_group(
-                        user_id=user_id,
-                        check_group_id=group["id"],
-                        reviewer_id=user_id,  # 自分自身をレビュアーに設定
-                        role="reviewer"
-                    )
-                except Exception as e:
-                    st.error(f"チェックグループ '{group['name']}' への追加中にエラーが発生しました: {str(e)}")
-    except Exception as e:
-        st.error(f"ユーザー情報の処理中にエラーが発生しました: {str(e)}")
-        st.code(traceback.format_exc())
+# ユーザーIDの取得（ログインユーザーのメールアドレスから）
+user_id = st.user.email
+
+# ユーザー名の取得（st.user.nameを使用）
+user_name = st.user.name
+
+# ユーザー情報・チェックグループ・タスク・保留中のチェック項目の取得を並行して開始する
+# ユーザーの作成・チェックグループへの追加はセッションで最初の1回だけ行う
+loader = DashboardLoader(
+    user_id,
+    user_name,
+    bootstrap=st.session_state.get("bootstrapped_user") != user_id,
+)
 
 st.title("Smart Check Sheet")
 
@@ -73,6 +59,13 @@ with col2:
             type="secondary",
         ):
             st.switch_page("pages/user_management.py")
+        if st.button(
+            "処理時間",
+            icon=":material/monitoring:",
+            use_container_width=True,
+            type="secondary",
+        ):
+            st.switch_page("pages/pipeline_dashboard.py")
 with col3:
     if st.button(
         "ログアウトする",
@@ -82,16 +75,18 @@ with col3:
     ):
         st.logout()  # ログアウト処理
 
-# ユーザーIDの取得（ログインユーザーのメールアドレスから）
-user_id = st.user.email
 
-# 新しいチェックボタン
-st.header("新しいチェックを開始する", divider=True)
+def mark_bootstrapped():
+    """ユーザー情報の処理が完了したことをセッションに記録する（以降の再実行では行わない）"""
+    st.session_state["bootstrapped_user"] = user_id
+
 
-# ユーザーのチェックグループ一覧を取得
-user_groups = db_operations.get_user_check_groups(user_id)
+def render_groups(user_groups):
+    """チェックグループごとの新しいチェックの開始ボタンを表示する"""
+    if not user_groups:
+        st.warning("あなたに割り当てられたチェックグループがありません。")
+        return
 
-if user_groups:
     # 3列のレイアウトでチェックグループを表示
     for i in range(0, len(user_groups), 3):
         cols = st.columns(3)
@@ -112,8 +107,9 @@ if user_groups:
                         use_container_width=True,
                         type="primary",
                     ):
-                        # セッション状態のタイムスタンプを初期化
+                        # セッション状態のタイムスタンプと入力中の結果を初期化
                         st.session_state["timestamp"] = None
+                        st.session_state.pop("results_key", None)
                         # チェックグループIDをセッションに設定
                         st.session_state["check_group_id"] = check_group_id
                         # チェックシートページに遷移
@@ -140,6 +136,12 @@ if user_groups:
                         # PDFファイルの内容を読み込む
                         pdf_content = uploaded_file.getvalue()
 
+                        # 処理状況はインスタンス間で共有する（接続し直した場合などの二重実行を防ぐ）
+                        job_id = f"pdf:{user_id}:{check_group_id}:{hashlib.sha256(pdf_content).hexdigest()}"
+                        if not claim_job(job_id):
+                            st.info("このファイルは処理中です。しばらくしてから再度お試しください。")
+                            continue
+
                         try:
                             # PDFファイルの処理と結果の保存
                             check_sheet_id = process_and_save_pdf_results(
@@ -150,31 +152,21 @@ if user_groups:
                                 user_id=user_id,
                                 check_group_id=check_group_id,
                             )
+                            set_job_status(job_id, "done", check_sheet_id=check_sheet_id)
 
                             # セッション状態のタイムスタンプを初期化
                             st.session_state["timestamp"] = check_sheet_id
                             # チェックシートページに遷移
                             st.switch_page("pages/result.py")
                         except Exception as e:
+                            set_job_status(job_id, "error", error=str(e))
                             st.error(f"テキスト抽出中にエラーが発生しました: {str(e)}")
                             st.error("スタックトレース:")
                             st.code(traceback.format_exc())
 
-else:
-    st.warning("あなたに割り当てられたチェックグループがありません。")
-
-st.header("あなたのタスク", divider=True)
-
-# 全てのタスクへのリンク
-col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
-with col4:
-    if st.button("📋 全タスク一覧はこちら", type="secondary", use_container_width=True):
-        st.switch_page("pages/checksheet_list.py")
-
-# 差し戻されたチェックシートを取得
-try:
-    user_tasks = db_operations.get_user_tasks(user_id)
 
+def render_tasks(user_tasks):
+    """差し戻されたチェックシートなどのタスクを表示する"""
     if user_tasks:
         # DataFrameに変換して表示
         df = pd.DataFrame(user_tasks)
@@ -203,17 +195,13 @@ try:
     else:
         st.info("あなたのタスクはありません。")
 
-except Exception as e:
-    st.error(f"ユーザータスクの取得中にエラーが発生しました: {str(e)}")
-    st.code(traceback.format_exc())
-
-# Pendingのチェック項目一覧を表示
-st.header("新規チェック項目の追加の提案", divider=True)
 
-# pendingのcheck_itemsを取得
-pending_items = db_operations.get_pending_check_items(user_id)
+def render_pending(pending_items):
+    """レビュアーまたは管理者として担当している保留中のチェック項目を表示する"""
+    if not pending_items:
+        st.info("あなたが担当している保留中のチェック項目はありません。")
+        return
 
-if pending_items:
     st.info(
         f"あなたがレビュアーまたは管理者として担当している保留中のチェック項目が {len(pending_items)} 件あります。"
     )
@@ -256,5 +244,48 @@ if pending_items:
                         st.rerun()  # ページを再読み込み
                     except Exception as e:
                         st.error(f"却下中にエラーが発生しました: {str(e)}")
-else:
-    st.info("あなたが担当している保留中のチェック項目はありません。")
+
+
+# 各セクションの表示位置を先に確保し、取得できた順に表示する
+user_section = st.container()
+
+# 新しいチェックボタン
+st.header("新しいチェックを開始する", divider=True)
+groups_section = st.empty()
+groups_section.caption("読み込み中...")
+
+st.header("あなたのタスク", divider=True)
+
+# 全てのタスクへのリンク
+col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
+with col4:
+    if st.button("📋 全タスク一覧はこちら", type="secondary", use_container_width=True):
+        st.switch_page("pages/checksheet_list.py")
+
+tasks_section = st.empty()
+tasks_section.caption("読み込み中...")
+
+# Pendingのチェック項目一覧を表示
+st.header("新規チェック項目の追加の提案", divider=True)
+pending_section = st.empty()
+pending_section.caption("読み込み中...")
+
+sections = {
+    "user": (user_section, mark_bootstrapped, "ユーザー情報の処理中"),
+    "groups": (groups_section, render_groups, "チェックグループの取得中"),
+    "tasks": (tasks_section, render_tasks, "ユーザータスクの取得中"),
+    "pending": (pending_section, render_pending, "保留中のチェック項目の取得中"),
+}
+for section, result, error in loader.iter_completed():
+    placeholder, render, label = sections[section]
+    with placeholder.container():
+        if error is not None:
+            st.error(f"{label}にエラーが発生しました: {str(error)}")
+            if not isinstance(error, TimeoutError):
+                st.code("".join(traceback.format_exception(error)))
+            continue
+        if section == "user":
+            # ユーザー情報の処理は表示する内容がないため、完了のみを記録する
+            render()
+        else:
+            render(result)
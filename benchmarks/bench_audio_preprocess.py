@@ -0,0 +1,107 @@
+"""
+音声の前処理（モノラル化・リサンプリング・16bit量子化）のCPU時間とピークメモリを計測するベンチマーク
+
+10分間の合成音声（48kHz ステレオ 16bit）に対して、従来の全体コピーとFFTリサンプリングによる変換と、
+チャンク単位のポリフェーズリサンプリングによる変換を比較します。
+
+    python benchmarks/bench_audio_preprocess.py [--minutes 10] [--sample-rate 48000] [--channels 2]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from scipy import signal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from utils.audio_preprocess import TARGET_SAMPLE_RATE, preprocess_pcm  # noqa: E402
+
+
+def build_samples(minutes: float, sample_rate: int, channels: int) -> np.ndarray:
+    """話し声に近い帯域の正弦波と雑音を重ねた合成音声を作成する"""
+    rng = np.random.default_rng(0)
+    total = int(minutes * 60 * sample_rate)
+    samples = np.empty((total, channels), dtype=np.int16)
+    chunk = sample_rate * 10
+    for start in range(0, total, chunk):
+        t = np.arange(start, min(start + chunk, total)) / sample_rate
+        wave = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.standard_normal(len(t))
+        samples[start : start + len(t)] = (wave * 32767).astype(np.int16)[:, None]
+    return samples
+
+
+def legacy_preprocess(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """従来の変換（全体をfloatにコピーし、16kHz以外の非対応レートのみFFTでリサンプリング）"""
+    audio_array = samples.reshape(-1).astype(np.float32) / 32768.0
+    audio_array = (audio_array * 32767).astype(np.int16)
+    if samples.shape[1] == 2:
+        audio_array = audio_array.reshape(-1, 2).mean(axis=1).astype(np.int16)
+    if sample_rate not in [8000, 16000, 32000, 48000]:
+        audio_array = signal.resample(
+            audio_array, int(len(audio_array) * 16000 / sample_rate)
+        )
+        audio_array = (audio_array * 32767).astype(np.int16)
+    return audio_array
+
+
+def legacy_preprocess_to_target(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """従来の変換に、16kHzへのFFTリサンプリングを常に行った場合（出力サイズをそろえた比較用）"""
+    audio_array = samples.reshape(-1).astype(np.float32) / 32768.0
+    audio_array = (audio_array * 32767).astype(np.int16)
+    if samples.shape[1] == 2:
+        audio_array = audio_array.reshape(-1, 2).mean(axis=1).astype(np.int16)
+    audio_array = signal.resample(
+        audio_array, int(len(audio_array) * TARGET_SAMPLE_RATE / sample_rate)
+    )
+    return np.clip(audio_array, -32768, 32767).astype(np.int16)
+
+
+def measure(label: str, func, *args) -> np.ndarray:
+    tracemalloc.start()
+    started_cpu = time.process_time()
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - started_cpu
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<32} CPU {cpu:7.2f}s  経過 {elapsed:7.2f}s  "
+        f"ピークメモリ {peak / 1024 / 1024:8.1f}MB  出力 {result.nbytes / 1024 / 1024:6.1f}MB"
+    )
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--minutes", type=float, default=10)
+    parser.add_argument("--sample-rate", type=int, default=48000)
+    parser.add_argument("--channels", type=int, default=2)
+    args = parser.parse_args()
+
+    samples = build_samples(args.minutes, args.sample_rate, args.channels)
+    print(
+        f"入力: {args.minutes}分 {args.sample_rate}Hz {args.channels}ch "
+        f"({samples.nbytes / 1024 / 1024:.1f}MB)"
+    )
+
+    measure("従来の変換", legacy_preprocess, samples, args.sample_rate)
+    reference = measure(
+        "従来の変換 + FFTリサンプリング", legacy_preprocess_to_target, samples, args.sample_rate
+    )
+    result = measure("チャンク単位の変換", preprocess_pcm, samples, args.sample_rate, 2)
+
+    # 分割して変換しても全体を一度に変換した場合と一致することを確認する
+    mono = samples.mean(axis=1, dtype=np.float32) / 32768.0
+    gcd = np.gcd(TARGET_SAMPLE_RATE, args.sample_rate)
+    whole = signal.resample_poly(mono, TARGET_SAMPLE_RATE // gcd, args.sample_rate // gcd)
+    whole = np.clip(whole * 32767.0, -32768, 32767).astype(np.int16)
+    print(f"一括変換との最大誤差: {np.abs(whole.astype(np.int32) - result).max()}")
+    print(f"出力サンプル数: 従来 {len(reference)} / チャンク {len(result)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+各モジュールの読み込み時間（起動時間）を計測するベンチマーク
+
+モジュールごとに新しいPythonプロセスで読み込み、最初の1回（コールド）と
+2回目以降の中央値（ウォーム: OSのファイルキャッシュ・バイトコードが揃った状態）を比較します。
+あわせて、読み込み時点で重いSDKが読み込まれていないかを表示します。
+
+    python benchmarks/bench_import_time.py [--runs 5] [--modules utils.db_operations utils.voice_utils]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+# 各ページが読み込むモジュール
+DEFAULT_MODULES = [
+    "streamlit",
+    "utils.db_operations",
+    "utils.dashboard_loader",
+    "utils.auto_check",
+    "utils.result_snapshot",
+    "utils.draft_autosave",
+    "utils.voice_utils",
+    "utils.suggest_check_items",
+    "utils.suggest_user_note",
+]
+
+# 初めて使うときまで読み込みを遅らせている重いSDK
+HEAVY_MODULES = [
+    "scipy",
+    "pydub",
+    "streamlit_webrtc",
+    "google.genai",
+    "google.cloud.documentai_v1",
+]
+
+MEASURE_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy, "modules": len(sys.modules)}}))
+"""
+
+
+def measure(module: str) -> dict:
+    """新しいプロセスでモジュールを読み込み、読み込み時間を計測する"""
+    completed = subprocess.run(
+        [sys.executable, "-c", MEASURE_SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        error = completed.stderr.strip().splitlines()
+        return {"error": error[-1] if error else "不明なエラー"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5, help="モジュールごとの計測回数")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    args = parser.parse_args()
+
+    print(
+        f"{'モジュール':<28} {'コールド':>9} {'ウォーム':>9} {'モジュール数':>10}  読み込まれた重いSDK"
+    )
+    for module in args.modules:
+        results = [measure(module) for _ in range(max(args.runs, 2))]
+        if "error" in results[0]:
+            print(f"{module:<28} 読み込みに失敗しました: {results[0]['error']}")
+            continue
+        cold = results[0]["seconds"]
+        warm = statistics.median(result["seconds"] for result in results[1:])
+        heavy = ", ".join(results[-1]["heavy"]) or "-"
+        print(
+            f"{module:<28} {cold * 1000:7.0f}ms {warm * 1000:7.0f}ms "
+            f"{results[-1]['modules']:>10}  {heavy}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+process_pdfの結果変換にかかる時間とメモリを計測するベンチマーク
+
+300ページの合成ドキュメントに対して、従来の全セクション変換とテキストのみの変換を比較します。
+
+    python benchmarks/bench_process_pdf.py [--pages 300] [--blocks-per-page 20]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from google.cloud import documentai_v1 as documentai  # noqa: E402
+
+from utils.auto_check import PDF_SECTIONS, document_to_dict  # noqa: E402
+
+LayoutBlock = documentai.Document.DocumentLayout.DocumentLayoutBlock
+
+SAMPLE_PARAGRAPH = (
+    "本ドキュメントでは、チェックシートの運用手順と確認観点について説明します。"
+    "各項目は担当者が確認した後、レビュアーが内容を承認します。"
+)
+
+
+def build_document(pages: int, blocks_per_page: int) -> documentai.Document:
+    """レイアウトブロック・ページ・エンティティを持つ合成ドキュメントを作成する"""
+    layout_blocks = []
+    document_pages = []
+    entities = []
+    for page_number in range(1, pages + 1):
+        page_blocks = []
+        for index in range(blocks_per_page):
+            text = f"{page_number}-{index}: {SAMPLE_PARAGRAPH}"
+            layout_blocks.append(
+                LayoutBlock(
+                    block_id=f"{page_number}-{index}",
+                    text_block=LayoutBlock.LayoutTextBlock(text=text, type_="paragraph"),
+                    page_span=LayoutBlock.LayoutPageSpan(
+                        page_start=page_number, page_end=page_number
+                    ),
+                )
+            )
+            page_blocks.append(
+                documentai.Document.Page.Block(
+                    layout=documentai.Document.Page.Layout(confidence=0.98)
+                )
+            )
+        document_pages.append(
+            documentai.Document.Page(page_number=page_number, blocks=page_blocks)
+        )
+        entities.append(
+            documentai.Document.Entity(
+                type_="title", mention_text=f"ページ{page_number}", confidence=0.9
+            )
+        )
+
+    return documentai.Document(
+        document_layout=documentai.Document.DocumentLayout(blocks=layout_blocks),
+        pages=document_pages,
+        entities=entities,
+    )
+
+
+def measure(document, sections: tuple) -> dict:
+    """変換にかかる時間と、変換中のピークメモリを計測する"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = document_to_dict(document, sections)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"seconds": elapsed, "peak_mb": peak / 1024 / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--blocks-per-page", type=int, default=20)
+    args = parser.parse_args()
+
+    document = build_document(args.pages, args.blocks_per_page)
+    print(f"合成ドキュメント: {args.pages}ページ, {args.pages * args.blocks_per_page}ブロック")
+
+    cases = [
+        ("全セクション（従来）", PDF_SECTIONS),
+        ("テキストのみ（デフォルト）", ("text",)),
+    ]
+    print(f"{'変換内容':<24}{'時間(秒)':>12}{'ピークメモリ(MB)':>20}")
+    for label, sections in cases:
+        stats = measure(document, sections)
+        print(f"{label:<24}{stats['seconds']:>12.3f}{stats['peak_mb']:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
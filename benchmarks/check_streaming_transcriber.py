@@ -0,0 +1,157 @@
+"""
+録音中のストリーミング認識（StreamingTranscriber）を疑似サーバーに対して確認するスクリプト
+
+疑似サーバー（fake_speech_server.py）を空いているポートで起動し、単語と短い無音を繰り返す合成音声を
+WebRTCのフレームと同じ単位で追加して、次の点を確認します（失敗した場合は終了コード1）。
+
+- 区間の区切りがすべて無音の中にある（単語の途中で区切っていない）
+- 録音中の途中結果（interim_text）が最終結果（finish）の先頭と一致する
+- 最終結果が各区間の認識結果を依頼した順に結合したものと一致する
+
+    python benchmarks/check_streaming_transcriber.py [--seconds 30] [--speed 10] [--realtime-factor 0.05]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from benchmarks.fake_speech_server import build_handler  # noqa: E402
+from utils import speech_api  # noqa: E402
+from utils.audio_buffer import PcmBuffer  # noqa: E402
+from utils.speech_stream import StreamingTranscriber  # noqa: E402
+
+SAMPLE_RATE = 48000
+# WebRTCの音声フレームの長さ（ミリ秒）
+FRAME_MS = 20
+
+
+class FakeAudioFrame:
+    """av.AudioFrame のうち PcmBuffer.append_frame が使う属性だけを持つフレーム"""
+
+    def __init__(self, samples: np.ndarray, sample_rate: int):
+        self._samples = samples
+        self.sample_rate = sample_rate
+        self.layout = type("Layout", (), {"channels": [None]})()
+
+    def to_ndarray(self) -> np.ndarray:
+        return self._samples.reshape(1, -1)
+
+
+def build_speech(seconds: float, sample_rate: int):
+    """
+    単語（正弦波）と短い無音を繰り返す合成音声を作成する
+
+    Returns:
+        Tuple[np.ndarray, List[Tuple[int, int]]]: (int16のPCMデータ, 無音区間の [開始, 終了) サンプル番号)
+    """
+    rng = np.random.default_rng(0)
+    parts, gaps, position = [], [], 0
+    while position < seconds * sample_rate:
+        word = int(rng.uniform(0.4, 1.2) * sample_rate)
+        t = np.arange(word) / sample_rate
+        parts.append(0.3 * np.sin(2 * np.pi * rng.uniform(150, 300) * t))
+        position += word
+        gap = int(rng.uniform(0.15, 0.4) * sample_rate)
+        parts.append(0.0005 * rng.standard_normal(gap))
+        gaps.append((position, position + gap))
+        position += gap
+    return (np.concatenate(parts) * 32767).astype(np.int16), gaps
+
+
+def to_buffer(chunk: np.ndarray) -> PcmBuffer:
+    """記録した区間の音声を認識に渡せる PcmBuffer にする"""
+    buffer = PcmBuffer()
+    buffer.append(chunk, SAMPLE_RATE)
+    return buffer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument(
+        "--speed", type=float, default=10, help="録音の何倍の速さでフレームを追加するか"
+    )
+    parser.add_argument("--realtime-factor", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("localhost", 0), build_handler(args.realtime_factor))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    speech_api.SPEECH_API_ENDPOINT = (
+        f"http://localhost:{server.server_address[1]}/v1/speech:recognize"
+    )
+
+    samples, gaps = build_speech(args.seconds, SAMPLE_RATE)
+    transcriber = StreamingTranscriber()
+
+    # 区間ごとに認識を依頼した音声を記録する
+    chunks = []
+    recognize = transcriber._recognize
+
+    def record_chunk(audio):
+        chunks.append(audio.to_array()[:, 0].copy())
+        return recognize(audio)
+
+    transcriber._recognize = record_chunk
+
+    frame_length = SAMPLE_RATE * FRAME_MS // 1000
+    interim_texts = []
+    started = time.perf_counter()
+    for start in range(0, len(samples), frame_length):
+        transcriber.append_frame(
+            FakeAudioFrame(samples[start : start + frame_length], SAMPLE_RATE)
+        )
+        interim_texts.append(transcriber.interim_text())
+        time.sleep(FRAME_MS / 1000 / args.speed)
+    final_text = transcriber.finish()
+    elapsed = time.perf_counter() - started
+    transcriber.close()
+
+    failures = []
+
+    # 区切りの位置（最後の区間の末尾は録音の終了位置のため除く）
+    boundaries = np.cumsum([len(chunk) for chunk in chunks])[:-1]
+    for boundary in boundaries:
+        if not any(gap_start <= boundary < gap_end for gap_start, gap_end in gaps):
+            failures.append(f"単語の途中で区切りました: {boundary / SAMPLE_RATE:.2f}秒")
+    if sum(len(chunk) for chunk in chunks) != len(samples):
+        failures.append("区間の合計の長さが録音の長さと一致しません")
+
+    for interim_text in interim_texts:
+        if not final_text.startswith(interim_text):
+            failures.append(f"途中結果が最終結果の先頭と一致しません: {interim_text!r}")
+            break
+    if not any(interim_texts):
+        failures.append("録音中に途中結果が得られませんでした")
+
+    # 各区間を1つずつ認識し直した結果を、依頼した順に結合したものと比較する
+    expected = " ".join(
+        text
+        for text in (
+            speech_api.recognize_linear16(*speech_api.audio_to_linear16(to_buffer(chunk)))
+            for chunk in chunks
+        )
+        if text
+    )
+    if final_text != expected:
+        failures.append(f"最終結果の順序が一致しません: {final_text!r} != {expected!r}")
+
+    server.shutdown()
+    print(
+        f"{len(chunks)}区間（{', '.join(f'{len(c) / SAMPLE_RATE:.1f}' for c in chunks)}秒）, "
+        f"所要時間 {elapsed:.2f}秒"
+    )
+    if failures:
+        for failure in failures:
+            print(f"NG: {failure}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
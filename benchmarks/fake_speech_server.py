@@ -0,0 +1,76 @@
+"""
+Speech-to-Text API（speech:recognize）の疑似サーバー
+
+実際のAPIを呼び出さずに、ストリーミング認識や分割認識の動作と所要時間を確認するためのサーバーです。
+受信した音声の長さを返し、音声の長さに比例した時間だけ待ってから応答します。
+
+    python benchmarks/fake_speech_server.py [--port 8765] [--realtime-factor 0.1]
+    SPEECH_API_ENDPOINT=http://localhost:8765/v1/speech:recognize streamlit run app.py
+
+ストリーミング認識の区切り位置と結果の順序は check_streaming_transcriber.py で自動的に確認できます。
+"""
+import argparse
+import base64
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# LINEAR16以外のエンコーディングでは長さを推定できないため、受信バイト数から概算する
+BYTES_PER_SECOND_ESTIMATE = {"LINEAR16": None, "FLAC": 16000, "OGG_OPUS": 4000}
+
+
+def build_handler(realtime_factor: float):
+    class FakeSpeechHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length))
+            config = body.get("config", {})
+            audio = base64.b64decode(body.get("audio", {}).get("content", ""))
+
+            encoding = config.get("encoding", "LINEAR16")
+            sample_rate = config.get("sampleRateHertz", 16000)
+            if BYTES_PER_SECOND_ESTIMATE.get(encoding):
+                seconds = len(audio) / BYTES_PER_SECOND_ESTIMATE[encoding]
+            else:
+                seconds = len(audio) / 2 / sample_rate
+
+            # 音声の長さに比例した認識時間を再現する
+            time.sleep(seconds * realtime_factor)
+
+            result = {
+                "results": [
+                    {
+                        "alternatives": [
+                            {"transcript": f"{seconds:.1f}秒の音声を受信しました。"}
+                        ]
+                    }
+                ]
+            }
+            payload = json.dumps(result, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return FakeSpeechHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--realtime-factor",
+        type=float,
+        default=0.1,
+        help="音声1秒あたりの認識にかかる秒数",
+    )
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("localhost", args.port), build_handler(args.realtime_factor))
+    print(f"http://localhost:{args.port}/v1/speech:recognize で待ち受けています")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -78,6 +78,7 @@ CREATE TABLE check_items (
     level INTEGER NOT NULL CHECK (level BETWEEN 1 AND 5),
     group_id INTEGER REFERENCES check_groups(id),
     status ENUM('open', 'pending', 'rejected', 'closed') NOT NULL DEFAULT 'open' COMMENT 'open: オープン, pending: 承認待ち, rejected: 却下, closed: クローズ',
+    rule JSON COMMENT '機械判定ルール（regex, keywords, length, sentence_length）',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -133,3 +134,32 @@ CREATE TABLE check_item_notes (
 CREATE INDEX idx_check_item_notes_user_id ON check_item_notes(user_id);
 CREATE INDEX idx_check_item_notes_check_id ON check_item_notes(check_id);
 CREATE INDEX idx_check_item_notes_created_at ON check_item_notes(created_at);
+
+
+-- ドキュメント抽出結果テーブル（修正版の差分チェック用）
+CREATE TABLE document_extractions (
+    check_sheet_id VARCHAR(255) PRIMARY KEY,
+    blocks JSON NOT NULL COMMENT 'ブロック単位の抽出テキスト（JSON配列）',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (check_sheet_id) REFERENCES check_sheets(check_sheet_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- パイプラインのステージごとの実行記録テーブル
+CREATE TABLE pipeline_spans (
+    id SERIAL PRIMARY KEY,
+    trace_id VARCHAR(32) COMMENT 'パイプライン1回分の実行ID',
+    pipeline VARCHAR(50) COMMENT 'パイプライン名',
+    stage VARCHAR(50) NOT NULL COMMENT 'ステージ名',
+    started_at DATETIME(3) NOT NULL COMMENT 'ステージの開始日時',
+    duration_ms DOUBLE NOT NULL COMMENT '処理時間（ミリ秒）',
+    bytes BIGINT NOT NULL DEFAULT 0 COMMENT '処理したデータ量（バイト）',
+    tokens INTEGER NOT NULL DEFAULT 0 COMMENT 'Geminiのトークン数',
+    retries INTEGER NOT NULL DEFAULT 0 COMMENT 'リトライ回数',
+    cache_hits INTEGER NOT NULL DEFAULT 0 COMMENT 'キャッシュヒット数',
+    status ENUM('ok', 'error') NOT NULL DEFAULT 'ok' COMMENT 'ok: 成功, error: 失敗',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- パイプライン実行記録テーブルのインデックス
+CREATE INDEX idx_pipeline_spans_started_at ON pipeline_spans(started_at);
\ No newline at end of file
@@ -110,9 +110,9 @@ def insert_checksheet_data():
             result = db.execute(
                 text("""
                     INSERT INTO check_items 
-                    (name, category_id, description, level, group_id, status)
+                    (name, category_id, description, level, group_id, status, rule)
                     VALUES 
-                    (:name, :category_id, :description, :level, :group_id, :status)
+                    (:name, :category_id, :description, :level, :group_id, :status, :rule)
                 """),
                 {
                     "name": item['name'],
@@ -120,7 +120,8 @@ def insert_checksheet_data():
                     "description": item['description'],
                     "level": item['level'],
                     "group_id": group_map[item['group']],
-                    "status": "open"
+                    "status": "open",
+                    "rule": json.dumps(item['rule'], ensure_ascii=False) if item.get('rule') else None
                 }
             )
             # 挿入されたcheck_itemのidを保存（後でcheck_resultsで使用する場合）
@@ -1,23 +1,286 @@
+import os
 from datetime import datetime
 
-import pydub
 import streamlit as st
 
 import utils.db_operations as db_operations
 import utils.voice_utils as voice_utils
+from utils.shared_state import sync_navigation_state
+from utils.draft_autosave import (
+    AUTOSAVE_ENABLED,
+    AUTOSAVE_INTERVAL_SECONDS,
+    DraftAutosave,
+)
+
+# 1ページに表示するチェック項目数（これを超える場合はページに分けて表示する）
+CHECKSHEET_PAGE_SIZE = int(os.getenv("CHECKSHEET_PAGE_SIZE", "50"))
+
+# チェック項目の定義のキャッシュ時間（秒）
+CHECK_ITEMS_CACHE_TTL = 60
+
+# 既定の編集モード（instant: 変更のたびに反映、form: 保存・ページ移動・送信ボタンでまとめて反映）
+CHECKSHEET_EDIT_MODE = os.getenv("CHECKSHEET_EDIT_MODE", "instant")
+
+
+@st.cache_data(ttl=CHECK_ITEMS_CACHE_TTL, show_spinner=False)
+def load_group_items(check_group_id, user_id):
+    """チェックグループのチェック項目の定義を取得する（再実行のたびにDBを参照しない）"""
+    return db_operations.load_check_items_by_group(
+        check_group_id=check_group_id, user_id=user_id
+    )
+
+
+@st.cache_data(ttl=CHECK_ITEMS_CACHE_TTL, show_spinner=False)
+def load_sheet_items(check_sheet_id, user_id):
+    """チェックシートに含まれるチェック項目の定義を取得する（再実行のたびにDBを参照しない）"""
+    return db_operations.load_checksheet_by_check_sheet_id(
+        check_sheet_id=check_sheet_id, user_id=user_id
+    )
+
+
+def init_results(results_key, checksheet_data, check_results):
+    """
+    チェックシートを開いたときに一度だけ、チェック結果をセッションに設定する。
+    以降はウィジェットの変更時に該当する項目だけを更新する。
+    """
+    if st.session_state.get("results_key") == results_key:
+        return
+
+    results = {}
+    for items in checksheet_data.values():
+        for item in items:
+            saved = (check_results or {}).get(item["check_id"])
+            results[item["check_id"]] = {
+                "checked": saved["checked"] if saved else False,
+                "remarks": (saved["remarks"] or "") if saved else "",
+            }
+            # ウィジェットの値も合わせて設定する
+            st.session_state[item["check_id"]] = results[item["check_id"]]["checked"]
+            st.session_state[f"comment_{item['check_id']}"] = results[item["check_id"]]["remarks"]
+
+    st.session_state["results"] = results
+    st.session_state["results_key"] = results_key
+    # 前に開いていたチェックシートの未保存の変更は引き継がない
+    st.session_state.pop("draft_autosave", None)
+
+
+def init_autosave(results_key, check_sheet_id, exists, user_id, reviewer_id, check_group_id):
+    """
+    チェックシートを開いたときに一度だけ、下書きの自動保存を準備する
+
+    Returns:
+        DraftAutosave: 自動保存（無効の場合はNone）
+    """
+    if not AUTOSAVE_ENABLED:
+        return None
+    autosave = st.session_state.get("draft_autosave")
+    if autosave and st.session_state.get("draft_autosave_key") == results_key:
+        return autosave
+
+    autosave = DraftAutosave(
+        check_sheet_id,
+        exists,
+        user_id,
+        reviewer_id=reviewer_id,
+        check_group_id=check_group_id,
+    )
+    st.session_state["draft_autosave"] = autosave
+    st.session_state["draft_autosave_key"] = results_key
+    return autosave
+
+
+def flush_draft(autosave):
+    """下書きの保存時期であれば、入力中の結果を保存する"""
+    if not autosave.due():
+        return
+    if autosave.flush(st.session_state["results"], st.session_state.get("remarks", "")):
+        # 新規のチェックシートは以降、保存した下書きとして開く（入力中の結果はそのまま使う）
+        st.session_state["timestamp"] = autosave.check_sheet_id
+        st.session_state["results_key"] = autosave.check_sheet_id
+        st.session_state["draft_autosave_key"] = autosave.check_sheet_id
+
+
+def record_edit(check_id=None):
+    """変更を自動保存に記録し、変更が一定件数溜まっていれば保存する"""
+    autosave = st.session_state.get("draft_autosave")
+    if not autosave:
+        return
+    if check_id is None:
+        autosave.record_remarks()
+    else:
+        autosave.record(check_id, st.session_state["results"][check_id])
+    flush_draft(autosave)
+
+
+def on_checked_change(check_id):
+    """チェックボックスの変更を結果に反映する"""
+    st.session_state["results"][check_id]["checked"] = st.session_state[check_id]
+    record_edit(check_id)
+
+
+def on_comment_change(check_id):
+    """コメントの変更を結果に反映する"""
+    st.session_state["results"][check_id]["remarks"] = st.session_state[f"comment_{check_id}"]
+    record_edit(check_id)
+
+
+@st.fragment(run_every=AUTOSAVE_INTERVAL_SECONDS if AUTOSAVE_ENABLED else None)
+def render_autosave_status():
+    """一定時間ごとに未保存の変更を確認して下書きを保存し、最終保存時刻を表示する"""
+    autosave = st.session_state.get("draft_autosave")
+    if not autosave:
+        return
+    flush_draft(autosave)
+    if autosave.pending:
+        st.caption("未保存の変更があります")
+    elif autosave.saved_at:
+        st.caption(f"下書きを保存しました（{autosave.saved_at.strftime('%H:%M:%S')}）")
+
+
+def paginate(checksheet_data, page_size):
+    """
+    カテゴリーごとのチェック項目を、1ページあたりの項目数でページに分ける
+
+    Returns:
+        list: ページごとの [(カテゴリー名, チェック項目のリスト)]
+    """
+    pages = [[]]
+    count = 0
+    for category, items in checksheet_data.items():
+        start = 0
+        while start < len(items):
+            if count >= page_size:
+                pages.append([])
+                count = 0
+            chunk = items[start : start + page_size - count]
+            pages[-1].append((category, chunk))
+            count += len(chunk)
+            start += len(chunk)
+    return pages
+
+
+def collect_form_results(page):
+    """フォームで編集したページのウィジェットの値を結果に反映し、変更した項目を自動保存に記録する"""
+    results = st.session_state["results"]
+    autosave = st.session_state.get("draft_autosave")
+    for _, items in page:
+        for item in items:
+            key = item["check_id"]
+            result = {
+                "checked": st.session_state.get(key, results[key]["checked"]),
+                "remarks": st.session_state.get(f"comment_{key}", results[key]["remarks"]),
+            }
+            if result != results[key]:
+                results[key] = result
+                if autosave:
+                    autosave.record(key, result)
+
+
+def on_form_submit(page, next_page=None):
+    """
+    フォームの送信時（再実行の前）に、表示していたページの入力内容を結果に反映する。
+    フォーム内のウィジェットの値は送信時にしか確定しないため、ページの移動・送信もフォームのボタンで行う。
+
+    Args:
+        page (list): 表示していたページの [(カテゴリー名, チェック項目のリスト)]
+        next_page (int): 移動先のページ番号（移動しない場合はNone）
+    """
+    collect_form_results(page)
+    autosave = st.session_state.get("draft_autosave")
+    if autosave:
+        flush_draft(autosave)
+    if next_page is not None:
+        st.session_state["checksheet_form_page"] = next_page
+
+
+def page_label(pages, index):
+    """ページの表示名（ページ番号と含まれるカテゴリー）"""
+    categories = ", ".join(dict.fromkeys(category for category, _ in pages[index]))
+    return f"{index + 1} / {len(pages)}（{categories}）"
+
+
+@st.fragment
+def render_category(category, items, review_results):
+    """
+    カテゴリーのチェック項目を表示する。
+    フラグメントとして表示するため、チェックやコメントの変更時はこのカテゴリーのみが再実行される。
+    """
+    st.subheader(f"{category}", divider=True)
+    render_items(items, review_results, instant=True)
+
+
+def render_items(items, review_results, instant):
+    """
+    チェック項目を表示する
+
+    Args:
+        items (list): チェック項目のリスト
+        review_results (dict): レビュー結果
+        instant (bool): 変更のたびに結果に反映するか（フォーム内ではFalse）
+    """
+    results = st.session_state["results"]
+
+    # チェック項目をリスト形式で表示
+    for item in items:
+        key = item["check_id"]
+        comment_key = f"comment_{key}"
+        # 別のページに移動している間に破棄されたウィジェットの値を結果から復元する
+        if key not in st.session_state:
+            st.session_state[key] = results[key]["checked"]
+        if comment_key not in st.session_state:
+            st.session_state[comment_key] = results[key]["remarks"]
+
+        col1, col2 = st.columns([1, 9])
+
+        with col1:
+            # チェックボックス
+            st.checkbox(
+                "チェック",
+                key=key,
+                label_visibility="collapsed",
+                on_change=on_checked_change if instant else None,
+                args=(key,) if instant else None,
+            )
+
+        with col2:
+            # 項目名と説明を表示
+            st.markdown(f"#### {item['name']}")
+            st.markdown(f"*{item['description']}*")
+
+            # 注意事項がある場合は表示
+            if item.get("note"):
+                st.warning(item["note"])
+
+            # コメント入力
+            st.text_area(
+                "コメント",
+                key=comment_key,
+                height=68,
+                on_change=on_comment_change if instant else None,
+                args=(key,) if instant else None,
+            )
+
+            # レビュー結果がある場合は表示
+            if review_results and key in review_results:
+                review_result = review_results[key]
+                review_status = "✅" if review_result["checked"] else "❌"
+                review_comment = review_result.get("remarks", "")
+                st.markdown(f"**レビュー結果:** {review_status}")
+                if review_comment:
+                    st.markdown(f"**レビューコメント:** {review_comment}")
 
 
 def main():
     st.set_page_config(layout="wide")
 
+    # 別のインスタンスに接続し直した場合も、表示中のチェックシートを引き継ぐ
+    sync_navigation_state(st.user.email, st.session_state, st.query_params)
+
     # 変数の初期化
     check_sheet = None
     check_results = None
     review_results = None
 
-    # 結果を格納する辞書
-    st.session_state["results"] = {}
-
     # チェックグループIDを取得（セッションから）
     check_group_id = st.session_state.get("check_group_id")
 
@@ -72,7 +335,34 @@ def main():
         else None
     )
 
-    voice_check_results = {}
+    # チェックシートデータの読み込み
+    if check_group_id:
+        if check_results:
+            # 既存のチェックシートを編集する場合：チェック結果に含まれるcheck_idのみを対象
+            checksheet_data = load_sheet_items(timestamp, user_id)
+        else:
+            # 新規作成の場合：チェックグループ全体のデータを取得
+            checksheet_data = load_group_items(check_group_id, user_id)
+    else:
+        st.error("チェックグループが選択されていません。")
+        st.stop()
+
+    # チェック結果をセッションに設定（チェックシートを開いたときのみ）
+    init_results(timestamp or f"new_{check_group_id}", checksheet_data, check_results)
+
+    # 下書きの自動保存（新規の場合は最初の保存時に作成するチェックシートIDを使う）
+    autosave = init_autosave(
+        st.session_state["results_key"],
+        check_sheet_id,
+        bool(check_results),
+        user_id,
+        reviewer_id,
+        check_group_id,
+    )
+    if autosave:
+        check_sheet_id = autosave.check_sheet_id
+        render_autosave_status()
+
     voice_overall_remarks = ""
 
     record = voice_utils.WebRTCRecord()
@@ -80,26 +370,27 @@ def main():
     audio_buffer = record.recording("test")
     if audio_buffer:
         full_text = voice_utils.transcribe_audio_with_google(audio_buffer)
-        st.session_state["audio_buffer"] = pydub.AudioSegment.empty()
+        voice_utils.reset_audio_buffer()
 
-        if full_text:
-            gemini_response = voice_utils.auto_fill_check_sheet(
+        question = voice_utils.extract_question(full_text) if full_text else None
+        if question:
+            # 「質問」で始めた発話はチェックシートに入力せず、回答を表示する（過去の回答・FAQがあれば再利用する）
+            answer = voice_utils.analyze_voice_content_with_gemini(
+                question, check_group_id=check_group_id, user_id=user_id
+            )
+            st.info(f"**質問:** {question}\n\n**回答:** {answer}")
+        elif full_text:
+            gemini_response, check_ids = voice_utils.auto_fill_check_sheet(
                 st.session_state["check_group_id"], full_text
             )
-            voice_check_results = {
-                result.check_id: {"checked": result.checked, "remarks": result.remarks}
-                for result in gemini_response
-                if isinstance(result, voice_utils.CheckResult)
-            }
-            voice_overall_remarks = [
-                result.overall_remarks
-                for result in gemini_response
-                if isinstance(result, voice_utils.OverallResult)
-            ]
-            st.session_state["results"] = voice_check_results.copy()
-            voice_overall_remarks = (
-                voice_overall_remarks[0] if len(voice_overall_remarks) > 0 else ""
+            # 発話に関連した項目のみを更新し、それ以外の項目は入力中の結果を残す
+            st.session_state["results"], voice_overall_remarks = (
+                voice_utils.patch_results(
+                    st.session_state["results"], gemini_response, check_ids
+                )
             )
+            if not voice_overall_remarks and check_sheet:
+                voice_overall_remarks = check_sheet.get("check_remarks") or ""
             # 結果を保存
             timestamp = db_operations.save_results(
                 check_sheet_id,
@@ -111,106 +402,99 @@ def main():
                 status="checking",
             )
 
-            # session_stateに保存してページ遷移
+            # session_stateに保存してページ遷移（保存した結果から表示し直す）
             st.session_state["timestamp"] = timestamp
+            st.session_state.pop("results_key", None)
             st.rerun()
         else:
             st.warning("音声認識結果が空でした。音声を録音してください。")
 
-    # チェックシートデータの読み込み
-    if check_group_id:
-        if check_results:
-            # 既存のチェックシートを編集する場合：チェック結果に含まれるcheck_idのみを対象
-            checksheet_data = db_operations.load_checksheet_by_check_sheet_id(
-                check_sheet_id=timestamp, user_id=user_id
-            )
-        else:
-            # 新規作成の場合：チェックグループ全体のデータを取得
-            checksheet_data = db_operations.load_check_items_by_group(check_group_id=check_group_id, user_id=user_id)
-    else:
-        st.error("チェックグループが選択されていません。")
-        st.stop()
-
-    # フォームの作成
-    # カテゴリーごとにセクションを作成
-    for category, items in checksheet_data.items():
-        st.subheader(f"{category}", divider=True)
+    # カテゴリーごとにセクションを作成（項目数が多い場合はページに分ける）
+    pages = paginate(checksheet_data, CHECKSHEET_PAGE_SIZE)
 
-        # チェック項目をリスト形式で表示
-        for item in items:
-            col1, col2 = st.columns([1, 9])
+    form_mode = st.toggle(
+        "まとめて保存する",
+        value=CHECKSHEET_EDIT_MODE == "form",
+        key="checksheet_form_mode",
+        help="オンの場合、入力内容は「入力内容を保存」・ページの移動・「チェック結果を送信」のときにまとめて反映されます。",
+    )
 
+    form_submitted = False
+    if form_mode:
+        page_index = min(st.session_state.get("checksheet_form_page", 0), len(pages) - 1)
+        page = pages[page_index]
+        # フォーム内の変更は再実行されず、フォームのボタンで1回の再実行にまとめる
+        with st.form("checksheet_form"):
+            if len(pages) > 1:
+                st.markdown(f"**ページ {page_label(pages, page_index)}**")
+            for category, items in page:
+                st.subheader(f"{category}", divider=True)
+                render_items(items, review_results, instant=False)
+            st.caption(
+                "入力内容は「入力内容を保存」・ページの移動・「チェック結果を送信」のときに反映されます。"
+            )
+            col1, col2, col3 = st.columns([2, 1, 1])
             with col1:
-                # チェックボックス
-                key = item["check_id"]
-                # 既存の結果があれば、その値を初期値として設定
-                initial_checked = (
-                    check_results.get(key)["checked"] if check_results else False
-                )
-
-                # geminiの回答があれば、その値を初期値として設定
-                initial_checked = (
-                    voice_check_results.get(key).checked
-                    if voice_check_results.get(key)
-                    else initial_checked
-                )
-
-                checked = st.checkbox(
-                    "チェック",
-                    key=key,
-                    label_visibility="collapsed",
-                    value=initial_checked,
-                )
-                if voice_check_results.get(key):
-                    st.session_state["results"][key] = {
-                        "checked": voice_check_results.get(key).checked
-                    }
-                else:
-                    st.session_state["results"][key] = {"checked": checked}
-
-            with col2:
-                # 項目名と説明を表示
-                st.markdown(f"#### {item['name']}")
-                st.markdown(f"*{item['description']}*")
-
-                # 注意事項がある場合は表示
-                if item.get("note"):
-                    st.warning(item["note"])
-
-                # コメント入力
-                comment_key = f"comment_{item['check_id']}"
-
-                # 既存の結果があれば、その値を初期値として設定
-                initial_comment = (
-                    check_results.get(key)["remarks"] if check_results else ""
-                )
-
-                # geminiの回答があれば、その値を初期値として設定
-                initial_comment = (
-                    voice_check_results.get(key).remarks
-                    if voice_check_results.get(key)
-                    else initial_comment
-                )
-
-                comment = st.text_area(
-                    "コメント", key=comment_key, height=68, value=initial_comment
+                saved = st.form_submit_button(
+                    "入力内容を保存",
+                    icon=":material/save:",
+                    on_click=on_form_submit,
+                    args=(page,),
                 )
-
-                if voice_check_results.get(key):
-                    st.session_state["results"][key]["remarks"] = (
-                        voice_check_results.get(key).remarks
+            if len(pages) > 1:
+                with col2:
+                    st.form_submit_button(
+                        "前のページ",
+                        disabled=page_index == 0,
+                        on_click=on_form_submit,
+                        args=(page, page_index - 1),
+                        use_container_width=True,
+                    )
+                with col3:
+                    st.form_submit_button(
+                        "次のページ",
+                        disabled=page_index == len(pages) - 1,
+                        on_click=on_form_submit,
+                        args=(page, page_index + 1),
+                        use_container_width=True,
                     )
-                else:
-                    st.session_state["results"][key]["remarks"] = comment
-
-                # レビュー結果がある場合は表示
-                if review_results and key in review_results:
-                    review_result = review_results[key]
-                    review_status = "✅" if review_result["checked"] else "❌"
-                    review_comment = review_result.get("remarks", "")
-                    st.markdown(f"**レビュー結果:** {review_status}")
-                    if review_comment:
-                        st.markdown(f"**レビューコメント:** {review_comment}")
+            form_submitted = st.form_submit_button(
+                "チェック結果を送信",
+                type="primary",
+                on_click=on_form_submit,
+                args=(page,),
+            )
+
+        if saved:
+            initial_remarks = check_sheet.get("check_remarks") if check_sheet else ""
+            timestamp = db_operations.save_results(
+                check_sheet_id,
+                st.session_state["results"],
+                st.session_state.get("remarks", initial_remarks),
+                user_id,
+                reviewer_id=reviewer_id,
+                check_group_id=check_group_id,
+                status="checking",
+            )
+            # 保存したチェックシートを編集中として扱う（入力中の結果はそのまま使う）
+            st.session_state["timestamp"] = timestamp
+            st.session_state["results_key"] = timestamp
+            if autosave:
+                autosave.exists = True
+                autosave.discard()
+                st.session_state["draft_autosave_key"] = timestamp
+            st.toast("入力内容を保存しました。", icon=":material/check:")
+    else:
+        page_index = 0
+        if len(pages) > 1:
+            page_index = st.selectbox(
+                "ページ",
+                options=range(len(pages)),
+                format_func=lambda index: page_label(pages, index),
+                key="checksheet_page",
+            )
+        for category, items in pages[page_index]:
+            render_category(category, items, review_results)
 
     # その他備考欄
     st.subheader("その他備考", divider=True)
@@ -228,6 +512,7 @@ def main():
         height=100,
         value=initial_remarks,
         placeholder="例：\n・次回レビュー時の確認事項\n・特に注意が必要な点\n・改善提案など",
+        on_change=record_edit,
     )
 
     # レビュー備考がある場合は表示
@@ -235,8 +520,10 @@ def main():
         st.markdown("### レビュー備考")
         st.markdown(check_sheet["review_remarks"])
 
-    # 送信ボタン
-    submitted = st.button("チェック結果を送信", type="primary")
+    # 送信ボタン（まとめて保存する場合はフォーム内の送信ボタンを使う）
+    submitted = form_submitted or (
+        not form_mode and st.button("チェック結果を送信", type="primary")
+    )
 
     if submitted:
         # 結果を保存
@@ -248,6 +535,8 @@ def main():
             reviewer_id=reviewer_id,
             check_group_id=check_group_id,
         )
+        if autosave:
+            autosave.discard()
 
         # session_stateに保存してページ遷移
         st.session_state["timestamp"] = timestamp
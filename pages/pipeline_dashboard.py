@@ -0,0 +1,174 @@
+import os
+import traceback
+
+import pandas as pd
+import streamlit as st
+
+import utils.db_operations as db_operations
+from utils.audio_buffer import get_audio_memory_stats
+from utils.model_router import get_tier_stats
+from utils.prompt_builder import get_usage_history
+
+# ステージごとの処理時間の集計に使うパーセンタイル
+PERCENTILES = {"p50": 0.5, "p95": 0.95}
+
+
+def summarize_spans(spans: list) -> pd.DataFrame:
+    """
+    スパンを日・パイプライン・ステージごとに集計する
+
+    Args:
+        spans (list): get_pipeline_spansで取得したスパンのリスト
+
+    Returns:
+        pd.DataFrame: 日ごとのp50/p95レイテンシと合計値
+    """
+    df = pd.DataFrame(spans)
+    df["日付"] = pd.to_datetime(df["started_at"]).dt.date
+    grouped = df.groupby(["日付", "pipeline", "stage"])
+
+    summary = grouped["duration_ms"].agg(
+        件数="count",
+        **{
+            name: (lambda values, q=q: values.quantile(q))
+            for name, q in PERCENTILES.items()
+        },
+    )
+    summary["エラー"] = grouped["status"].apply(lambda values: (values == "error").sum())
+    for counter in ("bytes", "tokens", "retries", "cache_hits"):
+        summary[counter] = grouped[counter].sum()
+    return summary.reset_index()
+
+
+def summarize_usage(records: list) -> pd.DataFrame:
+    """
+    Gemini APIの呼び出しごとの使用量を、呼び出し元とモデルごとに集計する
+
+    Args:
+        records (list): get_usage_historyで取得した使用量のリスト
+
+    Returns:
+        pd.DataFrame: 件数、入力・キャッシュ・出力トークン数の合計、キャッシュの割合（%）、p50/p95レイテンシ
+    """
+    df = pd.DataFrame(records)
+    grouped = df.groupby(["label", "model"])
+    summary = grouped.agg(
+        件数=("latency_ms", "count"),
+        input_tokens=("input_tokens", "sum"),
+        cached_tokens=("cached_tokens", "sum"),
+        output_tokens=("output_tokens", "sum"),
+        **{
+            name: ("latency_ms", lambda values, q=q: values.quantile(q))
+            for name, q in PERCENTILES.items()
+        },
+    )
+    summary["キャッシュの割合"] = (
+        summary["cached_tokens"] / summary["input_tokens"].where(summary["input_tokens"] > 0) * 100
+    ).fillna(0)
+    return summary.reset_index()
+
+
+def main():
+    st.set_page_config(layout="wide")
+
+    # ログイン状態の確認
+    if not st.user.is_logged_in:
+        if st.button("Googleアカウントでログイン", icon=":material/login:"):
+            st.login()
+        st.stop()
+
+    # 管理者のみ閲覧可能
+    if st.user.email != os.getenv("ADMIN_USER"):
+        st.error("このページは管理者のみ閲覧できます。")
+        st.stop()
+
+    st.title("パイプライン処理時間")
+
+    # トップページに戻るボタンを右側に配置
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
+    with col4:
+        if st.button("🏠 トップページに戻る", type="secondary", use_container_width=True):
+            st.switch_page("app.py")
+
+    # 全セッションの録音バッファの使用量（このプロセス内）
+    audio_stats = get_audio_memory_stats()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("録音バッファ数", audio_stats["buffers"])
+    col2.metric("録音のメモリ使用量", f"{audio_stats['memory_bytes'] / 1024 / 1024:.1f} MB")
+    col3.metric(
+        "一時ファイルへの書き出し",
+        f"{audio_stats['disk_bytes'] / 1024 / 1024:.1f} MB",
+        f"{audio_stats['spilled']} セッション",
+        delta_color="off",
+    )
+
+    days = st.slider("集計期間（日）", min_value=1, max_value=30, value=14)
+
+    try:
+        spans = db_operations.get_pipeline_spans(days)
+    except Exception as e:
+        st.error(f"パイプラインの実行記録の取得中にエラーが発生しました: {str(e)}")
+        st.code(traceback.format_exc())
+        st.stop()
+
+    if not spans:
+        st.info("この期間のパイプラインの実行記録はありません。")
+    else:
+        summary = summarize_spans(spans)
+
+        for pipeline in sorted(summary["pipeline"].dropna().unique()):
+            st.header(pipeline, divider=True)
+            pipeline_summary = summary[summary["pipeline"] == pipeline]
+
+            # ステージごとのp95の推移（どのステージが遅くなっているかを確認する）
+            st.line_chart(
+                pipeline_summary.pivot(index="日付", columns="stage", values="p95"),
+                x_label="日付",
+                y_label="p95 (ms)",
+            )
+            st.dataframe(
+                pipeline_summary.drop(columns=["pipeline"]).sort_values(
+                    by=["日付", "p95"], ascending=[False, False]
+                ),
+                column_config={
+                    "p50": st.column_config.NumberColumn("p50 (ms)", format="%.1f"),
+                    "p95": st.column_config.NumberColumn("p95 (ms)", format="%.1f"),
+                },
+                hide_index=True,
+            )
+
+    # モデル階層ごとの統計（このプロセスの起動以降）
+    tier_stats = get_tier_stats()
+    if tier_stats:
+        st.header("モデル階層", divider=True)
+        st.dataframe(
+            pd.DataFrame.from_dict(tier_stats, orient="index"),
+            use_container_width=True,
+        )
+
+    # Gemini APIの呼び出しごとのトークン使用量（このプロセスの起動以降の直近の呼び出し）
+    usage_records = get_usage_history()
+    if usage_records:
+        st.header("Gemini APIの使用量", divider=True)
+        st.dataframe(
+            summarize_usage(usage_records),
+            column_config={
+                "p50": st.column_config.NumberColumn("p50 (ms)", format="%.1f"),
+                "p95": st.column_config.NumberColumn("p95 (ms)", format="%.1f"),
+                "キャッシュの割合": st.column_config.ProgressColumn(
+                    "キャッシュの割合", format="%.0f%%", min_value=0, max_value=100
+                ),
+            },
+            hide_index=True,
+        )
+        with st.expander("直近の呼び出し"):
+            st.dataframe(
+                pd.DataFrame(usage_records[::-1]).assign(
+                    timestamp=lambda df: pd.to_datetime(df["timestamp"], unit="s")
+                ),
+                hide_index=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,118 @@
+import hashlib
+import os
+
 import streamlit as st
 
 import utils.db_operations as db_operations
+from utils.auto_check import process_and_save_revised_pdf_results
+from utils.shared_state import claim_job, set_job_status, sync_navigation_state
+from utils.result_snapshot import (
+    get_snapshot,
+    invalidate_snapshots,
+    put_snapshot,
+    snapshot_key,
+)
+
+
+def build_snapshot(timestamp, assignee_id):
+    """
+    結果ページに表示する内容を作成する
+
+    Returns:
+        dict: {"title": str, "sections": [[カテゴリー名, 表のMarkdown]], "check_remarks": str, "review_remarks": str}
+            チェックシートまたはチェックグループIDが見つからない場合はNone
+
+    Raises:
+        Exception: チェックグループ名の取得中にエラーが発生した場合
+    """
+    check_sheet = db_operations.load_check_sheet_metadata(timestamp)
+    check_results = db_operations.load_check_results(timestamp)
+    if not check_sheet or not check_results:
+        return None
+
+    # レビュー結果の読み込み
+    review = db_operations.load_check_results(timestamp, check_type="review")
+
+    # チェックシートデータの読み込み
+    check_group_id = check_sheet.get("check_group_id")
+    if not check_group_id:
+        return None
+    # 担当者のIDを使用してチェックシートデータを読み込み
+    checksheet_data = db_operations.load_checksheet_by_check_sheet_id(
+        check_sheet_id=timestamp, user_id=assignee_id
+    )
+
+    # チェックグループ名を取得（取得に失敗した場合は例外をそのまま送出し、
+    # 呼び出し元で1回だけエラーを表示する。表示内容を保存しないようにするため）
+    check_group_name = db_operations.get_check_group_name(check_group_id)
+
+    # カテゴリーごとの表を作成
+    sections = []
+    for category, items in checksheet_data.items():
+        rows = ["| CHK | REV | 項目 |\n|:---:|:---:|:---|\n"]
+
+        for item in items:
+            # チェック状態を取得
+            key = item["check_id"]
+            check_result = check_results.get(key, {})
+            checked = (
+                check_result.get("checked", False)
+                if isinstance(check_result, dict)
+                else check_result
+            )
+            check_status = "✅" if checked else "❌"
+
+            # レビュー状態を取得
+            if review:
+                review_result = review.get(key, {})
+                review_checked = (
+                    review_result.get("checked", False)
+                    if isinstance(review_result, dict)
+                    else review_result
+                )
+                review_status = "✅" if review_checked else "❌"
+            else:
+                review_status = "⏳"
+
+            # コメントを取得
+            comment = (
+                check_result.get("remarks", "")
+                if isinstance(check_result, dict)
+                else ""
+            )
+            comment_text = (
+                f"<br>**チェックコメント:** <br>{comment}" if comment else ""
+            )
+
+            # レビューコメントを取得
+            if review:
+                review_comment = (
+                    review_result.get("remarks", "")
+                    if isinstance(review_result, dict)
+                    else ""
+                )
+                review_comment_text = (
+                    f"<br>**レビューコメント:** <br>{review_comment}"
+                    if review_comment
+                    else ""
+                )
+            else:
+                review_comment_text = ""
+
+            # 表の行を追加
+            rows.append(
+                f"| {check_status} | {review_status} | **{item['name']}** (レベル: {item['level']})<br>*{item['description']}*{comment_text}{review_comment_text} |\n"
+            )
+
+        sections.append([category, "".join(rows)])
+
+    return {
+        "title": f"{check_group_name} チェックシート結果",
+        "sections": sections,
+        "check_remarks": check_sheet.get("check_remarks") or "",
+        # レビュー備考はレビュー結果がある場合のみ表示する
+        "review_remarks": (check_sheet.get("review_remarks") or "") if review else "",
+    }
 
 
 def main():
@@ -9,6 +121,9 @@ def main():
     # ユーザーIDの取得（ログインユーザーのメールアドレスから）
     user_id = st.user.email
 
+    # 別のインスタンスに接続し直した場合も、表示中のチェックシートを引き継ぐ
+    sync_navigation_state(user_id, st.session_state, st.query_params)
+
     # クエリパラメータからタイムスタンプを取得
     try:
         timestamp = st.query_params.get("id")
@@ -19,39 +134,28 @@ def main():
             st.warning("結果IDが指定されていません。")
             return
 
-        check_sheet = db_operations.load_check_sheet_metadata(timestamp)
-        check_results = db_operations.load_check_results(timestamp)
-        if not check_sheet or not check_results:
+        version = db_operations.get_check_sheet_version(timestamp)
+        if not version:
             st.error("指定された結果が見つかりませんでした。")
             return
 
-        # レビュー結果の読み込み
-        review = db_operations.load_check_results(timestamp, check_type="review")
-
-        # チェックシートデータの読み込み
-        check_group_id = check_sheet.get("check_group_id")
-        if check_group_id:
-            # 担当者のIDを使用してチェックシートデータを読み込み
-            assignee_id = check_sheet.get("created_by")
-            # auto_checkの場合はログインユーザーのIDを使用
-            if assignee_id == "auto_check":
-                assignee_id = user_id
-            checksheet_data = db_operations.load_checksheet_by_check_sheet_id(
-                check_sheet_id=timestamp, user_id=assignee_id
-            )
-        else:
-            st.error("チェックグループIDが見つかりませんでした。")
-            return
+        # 担当者のIDを使用してチェックシートデータを読み込み
+        assignee_id = version["created_by"]
+        # auto_checkの場合はログインユーザーのIDを使用
+        if assignee_id == "auto_check":
+            assignee_id = user_id
 
-        # チェックグループ名を取得
-        check_group_name = "未分類"
-        if check_group_id:
-            try:
-                check_group_name = db_operations.get_check_group_name(check_group_id)
-            except Exception as e:
-                st.error(f"チェックグループ名の取得中にエラーが発生しました: {e}")
+        # 更新されていなければ、前回表示した内容をそのまま使う
+        key = snapshot_key(timestamp, version, assignee_id)
+        snapshot = get_snapshot(key)
+        if snapshot is None:
+            snapshot = build_snapshot(timestamp, assignee_id)
+            if snapshot is None:
+                st.error("指定された結果が見つかりませんでした。")
+                return
+            put_snapshot(key, snapshot)
 
-        st.title(f"{check_group_name} チェックシート結果")
+        st.title(snapshot["title"])
 
         # トップページに戻るボタンを右側に配置
         col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
@@ -60,63 +164,9 @@ def main():
                 st.switch_page("app.py")
 
         # カテゴリーごとに結果を表示
-        for category, items in checksheet_data.items():
+        for category, table_md in snapshot["sections"]:
             st.markdown(f"### {category}")
 
-            # カテゴリーごとの表を作成
-            table_md = "| CHK | REV | 項目 |\n|:---:|:---:|:---|\n"
-
-            for item in items:
-                # チェック状態を取得
-                key = item["check_id"]
-                check_result = check_results.get(key, {})
-                checked = (
-                    check_result.get("checked", False)
-                    if isinstance(check_result, dict)
-                    else check_result
-                )
-                check_status = "✅" if checked else "❌"
-
-                # レビュー状態を取得
-                if review:
-                    review_result = review.get(key, {})
-                    review_checked = (
-                        review_result.get("checked", False)
-                        if isinstance(review_result, dict)
-                        else review_result
-                    )
-                    review_status = "✅" if review_checked else "❌"
-                else:
-                    review_status = "⏳"
-
-                # コメントを取得
-                comment = (
-                    check_result.get("remarks", "")
-                    if isinstance(check_result, dict)
-                    else ""
-                )
-                comment_text = (
-                    f"<br>**チェックコメント:** <br>{comment}" if comment else ""
-                )
-
-                # レビューコメントを取得
-                if review:
-                    review_comment = (
-                        review_result.get("remarks", "")
-                        if isinstance(review_result, dict)
-                        else ""
-                    )
-                    review_comment_text = (
-                        f"<br>**レビューコメント:** <br>{review_comment}"
-                        if review_comment
-                        else ""
-                    )
-                else:
-                    review_comment_text = ""
-
-                # 表の行を追加
-                table_md += f"| {check_status} | {review_status} | **{item['name']}** (レベル: {item['level']})<br>*{item['description']}*{comment_text}{review_comment_text} |\n"
-
             # 表を表示
             st.markdown(table_md, unsafe_allow_html=True)
 
@@ -125,15 +175,54 @@ def main():
         # 備考の表示
         col1, col2 = st.columns(2)
         with col1:
-            if check_sheet.get("check_remarks"):
+            if snapshot["check_remarks"]:
                 st.markdown("### チェック備考")
-                st.markdown(check_sheet["check_remarks"])
+                st.markdown(snapshot["check_remarks"])
 
         # レビュー備考がある場合は表示
         with col2:
-            if review and check_sheet.get("review_remarks"):
+            if snapshot["review_remarks"]:
                 st.markdown("### レビュー備考")
-                st.markdown(check_sheet["review_remarks"])
+                st.markdown(snapshot["review_remarks"])
+
+        # 差し戻されたチェックシートは、修正版のPDFで変更箇所のみを再チェックする
+        if version["check_status"] == "returned":
+            st.markdown("### 修正版の再チェック")
+            revised_file = st.file_uploader(
+                "修正版のPDFをアップロードして変更箇所を自動チェック",
+                type=["pdf"],
+                key=f"revised_{timestamp}",
+            )
+            if revised_file is not None:
+                pdf_content = revised_file.getvalue()
+                pdf_hash = hashlib.sha256(pdf_content).hexdigest()
+                # 失敗したファイルはアップローダーに残るため、別のファイルがアップロードされるまで再実行しない
+                failed_hashes = st.session_state.setdefault("failed_revised_pdf_hashes", set())
+                # 処理状況はインスタンス間で共有する（接続し直した場合などの二重実行を防ぐ）
+                job_id = f"revised_pdf:{timestamp}:{pdf_hash}"
+                if pdf_hash in failed_hashes:
+                    st.info("このファイルの再チェックは失敗しました。修正したファイルをアップロードしてください。")
+                elif not claim_job(job_id):
+                    st.info("このファイルは処理中です。しばらくしてから再度お試しください。")
+                else:
+                    try:
+                        with st.spinner("変更箇所を再チェックしています..."):
+                            process_and_save_revised_pdf_results(
+                                pdf_content=pdf_content,
+                                project_id=os.getenv("GOOGLE_CLOUD_PROJECT"),
+                                location=os.getenv("DOCUMENT_AI_LOCATION", "us"),
+                                processor_id=os.getenv("DOCUMENT_AI_PROCESSOR_ID"),
+                                check_sheet_id=timestamp,
+                            )
+                        set_job_status(job_id, "done", check_sheet_id=timestamp)
+                    except Exception as e:
+                        set_job_status(job_id, "error", error=str(e))
+                        failed_hashes.add(pdf_hash)
+                        st.error(f"修正版の再チェック中にエラーが発生しました: {str(e)}")
+                    else:
+                        invalidate_snapshots(timestamp)
+                        st.session_state["timestamp"] = timestamp
+                        st.rerun()
 
         # 再チェックボタンを追加（画面の一番下）
         st.session_state["timestamp"] = timestamp
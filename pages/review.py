@@ -1,9 +1,9 @@
-import pydub
 import streamlit as st
 import traceback
 
 import utils.db_operations as db_operations
 import utils.voice_utils as voice_utils
+from utils.shared_state import sync_navigation_state
 from utils.suggest_check_items import suggest_check_items, add_suggested_items
 from utils.suggest_user_note import suggest_check_note, add_suggested_note
 
@@ -12,6 +12,9 @@ def main():
     # ユーザーIDの取得（ログインユーザーのメールアドレスから）
     user_id = st.user.email
 
+    # 別のインスタンスに接続し直した場合も、表示中のチェックシートを引き継ぐ
+    sync_navigation_state(user_id, st.session_state, st.query_params)
+
     st.set_page_config(layout="wide")
     
     # クエリパラメータからタイムスタンプを取得
@@ -81,29 +84,30 @@ def main():
         audio_buffer = record.recording("test")
         if audio_buffer:
             full_text = voice_utils.transcribe_audio_with_google(audio_buffer)
-            st.session_state["audio_buffer"] = pydub.AudioSegment.empty()
+            voice_utils.reset_audio_buffer()
 
-            if full_text:
-                gemini_response = voice_utils.auto_fill_check_sheet(
+            question = voice_utils.extract_question(full_text) if full_text else None
+            if question:
+                # 「質問」で始めた発話はレビュー結果に入力せず、回答を表示する（過去の回答・FAQがあれば再利用する）
+                answer = voice_utils.analyze_voice_content_with_gemini(
+                    question, check_group_id=check_group_id, user_id=user_id
+                )
+                st.info(f"**質問:** {question}\n\n**回答:** {answer}")
+            elif full_text:
+                gemini_response, check_ids = voice_utils.auto_fill_check_sheet(
                     check_group_id, full_text
                 )
-                voice_check_results = {
-                    result.check_id: {
-                        "checked": result.checked,
-                        "remarks": result.remarks,
-                    }
-                    for result in gemini_response
-                    if isinstance(result, voice_utils.CheckResult)
+                # 発話に関連した項目のみを更新し、それ以外の項目は現在のレビュー結果を残す
+                current_review = existing_review or {
+                    item["check_id"]: {"checked": False, "remarks": ""}
+                    for items in checksheet_data.values()
+                    for item in items
                 }
-                voice_overall_remarks = [
-                    result.overall_remarks
-                    for result in gemini_response
-                    if isinstance(result, voice_utils.OverallResult)
-                ]
-                st.session_state["results"] = voice_check_results.copy()
-                voice_overall_remarks = (
-                    voice_overall_remarks[0] if len(voice_overall_remarks) > 0 else ""
+                st.session_state["results"], voice_overall_remarks = (
+                    voice_utils.patch_results(current_review, gemini_response, check_ids)
                 )
+                if not voice_overall_remarks:
+                    voice_overall_remarks = check_sheet.get("review_remarks") or ""
                 # 結果を保存
                 db_operations.save_review_with_status(
                     timestamp,
@@ -0,0 +1,260 @@
+import logging
+import os
+import tempfile
+import weakref
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pydub
+
+logger = logging.getLogger(__name__)
+
+# 録音できる最大の長さ（秒）。超えた場合は古い音声から上書きする
+MAX_RECORDING_SECONDS = int(os.getenv("MAX_RECORDING_SECONDS", "600"))
+
+# セッションごとにメモリに保持する音声の上限（MB）。超えた分は一時ファイルに書き出す
+AUDIO_MEMORY_CAP_MB = float(os.getenv("AUDIO_MEMORY_CAP_MB", "8"))
+# 一時ファイルの保存先（Cloud Runの /tmp はメモリ上にあるため、ボリュームをマウントして指定する）
+AUDIO_SPILL_DIR = os.getenv("AUDIO_SPILL_DIR") or None
+
+# 最初に確保する長さ（秒）。足りなくなったら倍に拡張する
+INITIAL_BUFFER_SECONDS = 10
+
+# 全セッションの録音バッファ（使用量の集計用）
+_live_buffers: "weakref.WeakSet[PcmBuffer]" = weakref.WeakSet()
+
+
+def _remove_spill_file(path: str) -> None:
+    """一時ファイルを削除する（セッション終了時にバッファが破棄されたときにも呼ばれる）"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"音声の一時ファイルの削除に失敗しました: {path} - {e}")
+
+
+class PcmBuffer:
+    """
+    WebRTCで受信した音声フレームを書き込むPCMバッファ。
+    フレームごとにAudioSegmentを作って連結すると毎回バッファ全体がコピーされるため、
+    numpy配列を確保して直接書き込む。
+    最大の長さに達した後はリングバッファとして古い音声から上書きする。
+    メモリ上の容量が AUDIO_MEMORY_CAP_MB を超える場合は一時ファイルにメモリマップして保持する。
+    """
+
+    def __init__(
+        self,
+        max_seconds: int = MAX_RECORDING_SECONDS,
+        memory_cap_bytes: int = int(AUDIO_MEMORY_CAP_MB * 1024 * 1024),
+    ):
+        self.max_seconds = max_seconds
+        self.memory_cap_bytes = memory_cap_bytes
+        self.sample_rate: Optional[int] = None
+        self.channels: Optional[int] = None
+        self.sample_width: Optional[int] = None
+        self._data: Optional[np.ndarray] = None
+        self._max_samples = 0
+        # 書き込み位置と有効なサンプル数（いずれもチャンネルをまとめた1サンプル単位）
+        self._write_pos = 0
+        self._size = 0
+        # 一時ファイルに書き出した場合のパスと、破棄時に削除するためのファイナライザ
+        self._spill_path: Optional[str] = None
+        self._finalizer: Optional[weakref.finalize] = None
+        _live_buffers.add(self)
+
+    def __len__(self) -> int:
+        """録音済みの長さ（ミリ秒）。AudioSegmentと同様に空のときはFalseとして扱える"""
+        if not self.sample_rate:
+            return 0
+        return int(self._size * 1000 / self.sample_rate)
+
+    @property
+    def spilled(self) -> bool:
+        """一時ファイルに書き出しているかどうか"""
+        return self._spill_path is not None
+
+    @property
+    def nbytes(self) -> int:
+        """録音済みの音声の容量（バイト）"""
+        if not self._size:
+            return 0
+        return self._size * self.channels * self.sample_width
+
+    @property
+    def memory_bytes(self) -> int:
+        """メモリ上に確保している容量（バイト）"""
+        if self._data is None or self.spilled:
+            return 0
+        return self._data.nbytes
+
+    @property
+    def disk_bytes(self) -> int:
+        """一時ファイルに書き出した音声の容量（バイト）"""
+        return self.nbytes if self.spilled else 0
+
+    def _allocate(self, frame: np.ndarray, sample_rate: int, channels: int) -> None:
+        """最初のフレームの形式に合わせてバッファを確保する"""
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = frame.dtype.itemsize
+        self._max_samples = max(self.max_seconds * sample_rate, 1)
+        initial = min(INITIAL_BUFFER_SECONDS * sample_rate, self._max_samples)
+        self._data = np.empty((initial, channels), dtype=frame.dtype)
+
+    def _grow(self, required: int) -> None:
+        """容量が足りない場合は最大の長さまで倍に拡張する（上限を超える場合は一時ファイルに移す）"""
+        capacity = len(self._data)
+        if required <= capacity or capacity >= self._max_samples:
+            return
+        new_capacity = capacity
+        while new_capacity < required:
+            new_capacity *= 2
+        new_capacity = min(new_capacity, self._max_samples)
+
+        bytes_per_sample = self.channels * self.sample_width
+        if new_capacity * bytes_per_sample > self.memory_cap_bytes:
+            self._spill()
+            return
+
+        grown = np.empty((new_capacity, self.channels), dtype=self._data.dtype)
+        grown[: self._size] = self._data[: self._size]
+        self._data = grown
+
+    def _spill(self) -> None:
+        """録音済みの音声を一時ファイルに移し、以降は最大の長さ分のメモリマップに書き込む"""
+        fd, path = tempfile.mkstemp(prefix="audio_", suffix=".pcm", dir=AUDIO_SPILL_DIR)
+        os.close(fd)
+        self._finalizer = weakref.finalize(self, _remove_spill_file, path)
+
+        # 最大の長さ分のファイルを作成する（書き込んだ部分だけがディスクを消費する）
+        mapped = np.memmap(
+            path, dtype=self._data.dtype, mode="w+", shape=(self._max_samples, self.channels)
+        )
+        mapped[: self._size] = self._data[: self._size]
+        self._data = mapped
+        self._spill_path = path
+        logger.info(
+            f"録音がメモリの上限（{self.memory_cap_bytes / 1024 / 1024:.1f}MB）を超えたため"
+            f"一時ファイルに書き出しました: {path}"
+        )
+
+    def append_frame(self, audio_frame) -> None:
+        """
+        WebRTCの音声フレーム（av.AudioFrame）をバッファに書き込む
+
+        Args:
+            audio_frame: av.AudioFrame
+        """
+        channels = len(audio_frame.layout.channels)
+        # パックド形式のフレームは (1, サンプル数 * チャンネル数) のインターリーブ配列
+        samples = audio_frame.to_ndarray().reshape(-1, channels)
+        self.append(samples, audio_frame.sample_rate)
+
+    def append(self, samples: np.ndarray, sample_rate: int) -> None:
+        """
+        (サンプル数, チャンネル数) のPCM配列をバッファに書き込む
+
+        Args:
+            samples (np.ndarray): PCMデータ
+            sample_rate (int): サンプリングレート
+        """
+        if samples.ndim == 1:
+            samples = samples.reshape(-1, 1)
+        if len(samples) == 0:
+            return
+
+        format_changed = self._data is not None and (
+            sample_rate != self.sample_rate
+            or samples.shape[1] != self.channels
+            or samples.dtype != self._data.dtype
+        )
+        if self._data is None or (format_changed and not self._size):
+            # 空のバッファは次の録音の形式（マイクの切り替えなど）に合わせて確保し直す
+            self._allocate(samples, sample_rate, samples.shape[1])
+        elif format_changed:
+            logger.warning(
+                f"音声フレームの形式が変わったため破棄しました: {sample_rate}Hz, "
+                f"{samples.shape[1]}ch, {samples.dtype}"
+            )
+            return
+
+        # 1回で最大の長さを超える場合は末尾だけを残す
+        if len(samples) > self._max_samples:
+            samples = samples[-self._max_samples :]
+
+        self._grow(self._size + len(samples))
+        capacity = len(self._data)
+
+        if self._size + len(samples) <= capacity and self._write_pos == self._size:
+            # 満杯になるまでは末尾に追記するだけ
+            self._data[self._size : self._size + len(samples)] = samples
+            self._size += len(samples)
+            self._write_pos = self._size
+            return
+
+        # 最大の長さに達した後は古いサンプルを上書きする
+        first = min(len(samples), capacity - self._write_pos)
+        self._data[self._write_pos : self._write_pos + first] = samples[:first]
+        self._data[: len(samples) - first] = samples[first:]
+        self._write_pos = (self._write_pos + len(samples)) % capacity
+        self._size = min(self._size + len(samples), capacity)
+
+    def to_array(self) -> np.ndarray:
+        """
+        録音済みのPCMデータを時系列順の (サンプル数, チャンネル数) 配列で取得する。
+        一時ファイルに書き出している場合はメモリマップのまま返す（一周している場合を除く）
+        """
+        if self._data is None:
+            return np.empty((0, 1), dtype=np.int16)
+        if self._write_pos == self._size:
+            return self._data[: self._size]
+        # リングバッファが一周している場合は書き込み位置が最も古いサンプル
+        return np.concatenate(
+            (self._data[self._write_pos : self._size], self._data[: self._write_pos])
+        )
+
+    def to_audio_segment(self) -> "pydub.AudioSegment":
+        """録音済みのPCMデータからAudioSegmentを作成する"""
+        import pydub  # 録音画面以外で読み込まないよう、使うときに読み込む
+
+        if not self._size:
+            return pydub.AudioSegment.empty()
+        return pydub.AudioSegment(
+            data=self.to_array().tobytes(),
+            sample_width=self.sample_width,
+            frame_rate=self.sample_rate,
+            channels=self.channels,
+        )
+
+    def clear(self) -> None:
+        """
+        録音済みのデータを破棄する（一時ファイルは削除し、メモリ上の領域は次の録音で再利用する）。
+        次の録音の形式が異なる場合は、最初のフレームの追加時に確保し直す
+        """
+        self._write_pos = 0
+        self._size = 0
+        if self.spilled:
+            self._data = None
+            self._spill_path = None
+            self.sample_rate = None
+            self._finalizer()
+            self._finalizer = None
+
+
+def get_audio_memory_stats() -> Dict[str, Any]:
+    """
+    全セッションの録音バッファの使用量を取得する
+
+    Returns:
+        Dict[str, Any]: {"buffers": int, "memory_bytes": int, "disk_bytes": int, "spilled": int}
+    """
+    buffers = list(_live_buffers)
+    return {
+        "buffers": len(buffers),
+        "memory_bytes": sum(buffer.memory_bytes for buffer in buffers),
+        "disk_bytes": sum(buffer.disk_bytes for buffer in buffers),
+        "spilled": sum(1 for buffer in buffers if buffer.spilled),
+    }
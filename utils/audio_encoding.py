@@ -0,0 +1,71 @@
+import io
+import logging
+import os
+from typing import Tuple
+
+import numpy as np
+
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Speech-to-Text APIに送信する音声のエンコーディング（LINEAR16, FLAC, OGG_OPUS）
+SPEECH_AUDIO_ENCODING = os.getenv("SPEECH_AUDIO_ENCODING", "FLAC").upper()
+SUPPORTED_ENCODINGS = ("LINEAR16", "FLAC", "OGG_OPUS")
+
+# Opusが対応しているサンプリングレート（これ以外はFLACで送信する）
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+# soundfileの書き込み形式
+_SOUNDFILE_FORMATS = {
+    "FLAC": {"format": "FLAC", "subtype": "PCM_16"},
+    "OGG_OPUS": {"format": "OGG", "subtype": "OPUS"},
+}
+
+
+def _encode_with_soundfile(audio_array: np.ndarray, sample_rate: int, encoding: str) -> bytes:
+    """soundfile（libsndfile）でPCMデータを圧縮する"""
+    # libsndfileがない環境でもLINEAR16で動作するよう、使用時にインポートする
+    import soundfile
+
+    output = io.BytesIO()
+    soundfile.write(output, audio_array, sample_rate, **_SOUNDFILE_FORMATS[encoding])
+    return output.getvalue()
+
+
+def encode_audio(
+    audio_array: np.ndarray, sample_rate: int, encoding: str = SPEECH_AUDIO_ENCODING
+) -> Tuple[bytes, str]:
+    """
+    16bitモノラルPCMをSpeech-to-Text APIに送信する形式に変換します。
+    圧縮できない場合はLINEAR16のまま返します。
+
+    Args:
+        audio_array (np.ndarray): int16のモノラルPCMデータ
+        sample_rate (int): サンプリングレート
+        encoding (str): 'LINEAR16', 'FLAC', 'OGG_OPUS' のいずれか
+
+    Returns:
+        Tuple[bytes, str]: (音声データ, config.encodingに指定するエンコーディング)
+    """
+    if encoding not in SUPPORTED_ENCODINGS:
+        logger.warning(f"未対応のエンコーディングのためLINEAR16で送信します: {encoding}")
+        encoding = "LINEAR16"
+    if encoding == "OGG_OPUS" and sample_rate not in OPUS_SAMPLE_RATES:
+        encoding = "FLAC"
+    if encoding == "LINEAR16":
+        return audio_array.tobytes(), encoding
+
+    with span("encode") as record:
+        try:
+            encoded = _encode_with_soundfile(audio_array, sample_rate, encoding)
+        except Exception as e:
+            logger.warning(f"音声の圧縮に失敗したためLINEAR16で送信します: {e}")
+            return audio_array.tobytes(), "LINEAR16"
+        record["bytes"] = len(encoded)
+
+    logger.info(
+        f"音声を{encoding}に変換しました: {audio_array.nbytes} -> {len(encoded)} bytes "
+        f"(処理時間={record['duration_ms']}ms)"
+    )
+    return encoded, encoding
@@ -0,0 +1,113 @@
+import logging
+import math
+import os
+from typing import Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Speech-to-Text APIに送信するサンプリングレート（音声認識には16kHzで十分）
+TARGET_SAMPLE_RATE = int(os.getenv("SPEECH_SAMPLE_RATE", "16000"))
+
+# 一度に変換する長さ（秒）。全体をfloatに変換せず、この長さずつ処理する
+CHUNK_SECONDS = 10
+
+# サンプル幅ごとの入力の型と、-1.0〜1.0に正規化するための値（オフセット, 倍率）
+_SAMPLE_FORMATS = {
+    1: (np.uint8, 128.0, 1 / 128.0),
+    2: (np.int16, 0.0, 1 / 32768.0),
+    4: (np.int32, 0.0, 1 / 2147483648.0),
+}
+
+
+def _resample_context(up: int, down: int) -> int:
+    """
+    分割して変換しても全体を一度に変換した場合と同じ結果になるよう、
+    チャンクの前後に付ける入力サンプル数を計算する（downの倍数）
+    """
+    # resample_polyの既定のフィルタ長は片側 10 * max(up, down)（アップサンプル後のレート）
+    filter_half_length = math.ceil(10 * max(up, down) / up) + 1
+    return math.ceil(filter_half_length / down) * down
+
+
+def preprocess_pcm(
+    samples: np.ndarray,
+    sample_rate: int,
+    sample_width: int,
+    target_rate: int = TARGET_SAMPLE_RATE,
+) -> np.ndarray:
+    """
+    PCMデータをチャンクごとにfloat32に変換し、モノラル化・リサンプリング・16bit量子化を行います。
+    出力は最初に確保した配列へ直接書き込むため、全体のコピーは作成しません。
+
+    Args:
+        samples (np.ndarray): (サンプル数, チャンネル数) のPCMデータ
+        sample_rate (int): 入力のサンプリングレート
+        sample_width (int): 入力のサンプル幅（バイト）
+        target_rate (int): 出力のサンプリングレート
+
+    Returns:
+        np.ndarray: int16のモノラルPCMデータ
+    """
+    _, offset, scale = _SAMPLE_FORMATS[sample_width]
+    if samples.ndim == 1:
+        samples = samples.reshape(-1, 1)
+
+    gcd = math.gcd(target_rate, sample_rate)
+    up, down = target_rate // gcd, sample_rate // gcd
+    context = 0
+    if up != down:
+        # scipyは読み込みに時間がかかるため、リサンプリングが必要になったときに読み込む
+        from scipy import signal
+
+        context = _resample_context(up, down)
+
+    total = len(samples)
+    output = np.empty(-(-total * up // down), dtype=np.int16)
+    # チャンクの境界をdownの倍数にそろえ、出力の位置が整数になるようにする
+    chunk = max(CHUNK_SECONDS * sample_rate // down, 1) * down
+
+    for start in range(0, total, chunk):
+        end = min(start + chunk, total)
+        context_start = max(start - context, 0)
+        context_end = min(end + context, total)
+
+        # モノラル化と正規化（チャンネルの平均をとってからスケールする）
+        block = samples[context_start:context_end]
+        mono = block.mean(axis=1, dtype=np.float32)
+        if offset:
+            mono -= offset
+        mono *= scale
+
+        if up != down:
+            mono = signal.resample_poly(mono, up, down).astype(np.float32, copy=False)
+
+        # 前後に付けた分を除いて出力に書き込む
+        out_start = start * up // down
+        out_end = -(-end * up // down)
+        local_start = out_start - context_start * up // down
+        resampled = mono[local_start : local_start + (out_end - out_start)]
+
+        # 16bitに量子化（範囲外の値は飽和させる）
+        np.multiply(resampled, 32767.0, out=resampled)
+        np.clip(resampled, -32768.0, 32767.0, out=resampled)
+        output[out_start : out_start + len(resampled)] = resampled
+
+    return output
+
+
+def audio_segment_to_pcm(audio_segment) -> Tuple[np.ndarray, int]:
+    """
+    AudioSegmentの生データをコピーせずに (サンプル数, チャンネル数) の配列として参照する
+
+    Returns:
+        Tuple[np.ndarray, int]: (PCMデータ, サンプル幅)
+    """
+    if audio_segment.sample_width not in _SAMPLE_FORMATS:
+        # 24bitなど対応していない幅は16bitに変換してから処理する
+        audio_segment = audio_segment.set_sample_width(2)
+
+    dtype = _SAMPLE_FORMATS[audio_segment.sample_width][0]
+    samples = np.frombuffer(audio_segment.raw_data, dtype=dtype)
+    return samples.reshape(-1, audio_segment.channels), audio_segment.sample_width
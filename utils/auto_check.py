@@ -1,38 +1,116 @@
 from datetime import datetime
-from typing import Dict, Any, List, Union, Optional
+from typing import TYPE_CHECKING, Dict, Any, List, Union, Optional
+import logging
 import os
+import time
 
-from google import genai
-from google.cloud import documentai_v1 as documentai
 from pydantic import BaseModel
 
 import utils.db_operations as db_operations
+from utils.document_diff import (
+    build_changed_excerpt,
+    diff_blocks,
+    select_items_for_recheck,
+)
+from utils.gemini_cache import generate_with_checklist
+from utils.model_router import (
+    MODEL_TIERS,
+    record_tier_result,
+    select_tier,
+    validate_check_results,
+)
+from utils.prompt_builder import compile_group_prompt, compile_prompt
+from utils.rule_check import apply_rules
+from utils.tracing import span, trace
+
+if TYPE_CHECKING:
+    from google.cloud import documentai_v1 as documentai
+
+logger = logging.getLogger(__name__)
+
+# 変更されたブロックの割合がこれを超える場合は差分ではなく全項目を再チェックする
+FULL_RECHECK_CHANGE_RATIO = float(os.getenv("FULL_RECHECK_CHANGE_RATIO", "0.5"))
+
+# ドキュメント自動チェックの指示文
+AUTO_CHECK_INSTRUCTION = """
+あなたはチェックリストのレビューAIエージェントです。
+人間に変わって、ドキュメントをレビューし、チェックリストに基づいて評価を実施、業務を効率化します。
+以下のドキュメントを、チェックリストに基づいて評価してください。
+各チェック項目について、該当するかどうか（checked）を判定してください。
+そもそも対象のドキュメントについて、チェック項目の対象とならないようなケースの場合は、checkedはtrueとなります。
+例えば、専門用語について説明されているか、というチェック項目について、そもそも専門用語を利用していなければ、checkedはtrueとなります。
+
+チェック項目に対して、当てはまらない場合は、その理由や改善点（remarks）を記載してください。
+特に理由や改善点がない場合は、remarksを空の文字列にしてください。
+ただし、特記事項や素晴らしい点などあれば記載ください。
+ドキュメントの記載が不十分などの理由で判定に自信がない場合は、uncertainをtrueにしてください。
+
+また、全体としての評価や改善点（OverallResult）ももしあれば記載してください。
+なくても問題ありません。その場合は、overall_remarksを空の文字列にしてください。
+全体としての評価や改善点は、全体的にどのような点が良いか、または悪いかを記載してください。
+"""
+
 
 # レスポンススキーマの定義
 class CheckResult(BaseModel):
     check_id: str
     checked: bool
     remarks: Optional[str]
+    uncertain: Optional[bool]
 
 
 class OverallResult(BaseModel):
     overall_remarks: str
 
 
+# process_pdfで取得できる解析結果のセクション
+PDF_SECTIONS = ("text", "blocks", "pages", "entities")
+
+
 def process_pdf(
-    pdf_content: bytes, project_id: str, location: str, processor_id: str
+    pdf_content: bytes,
+    project_id: str,
+    location: str,
+    processor_id: str,
+    sections: tuple = ("text",),
 ) -> Dict[str, Any]:
     """
     PDFファイルをGoogle Cloud Document AIを使用して解析し、テキストを抽出します。
+    デフォルトではテキストのみを返し、ブロック・ページ・エンティティ情報は
+    sectionsで指定された場合のみ辞書に変換します。
 
     Args:
         pdf_content (bytes): PDFファイルのバイナリデータ
         project_id (str): Google Cloud プロジェクトID
         location (str): Document AIのロケーション（例：'us' または 'asia1'）
         processor_id (str): Document AIプロセッサーID
+        sections (tuple): 取得するセクション（PDF_SECTIONSの部分集合）
 
     Returns:
-        Dict[str, Any]: 解析結果を含む辞書
+        Dict[str, Any]: 解析結果を含む辞書（sectionsで指定したキーのみ）
+
+    Raises:
+        ValueError: 必要なパラメータが指定されていない場合
+    """
+    document = process_document(pdf_content, project_id, location, processor_id)
+    return document_to_dict(document, sections)
+
+
+def process_document(
+    pdf_content: bytes, project_id: str, location: str, processor_id: str
+) -> "documentai.Document":
+    """
+    PDFファイルをGoogle Cloud Document AIで解析し、Documentオブジェクトをそのまま返します。
+    必要な情報だけを iter_layout_blocks / iter_pages / iter_entities で順に取り出せます。
+
+    Args:
+        pdf_content (bytes): PDFファイルのバイナリデータ
+        project_id (str): Google Cloud プロジェクトID
+        location (str): Document AIのロケーション（例：'us' または 'asia1'）
+        processor_id (str): Document AIプロセッサーID
+
+    Returns:
+        documentai.Document: 解析結果
 
     Raises:
         ValueError: 必要なパラメータが指定されていない場合
@@ -44,11 +122,13 @@ def process_pdf(
             "project_id, processor_idを指定してください。"
         )
 
+    # Document AIのSDKは読み込みに時間がかかるため、初めて使うときに読み込む
+    from google.cloud import documentai_v1 as documentai
+
     # Document AIクライアントの初期化
     client = documentai.DocumentProcessorServiceClient()
 
     # プロセッサーの完全なリソース名を構築
-    name = f"projects/{project_id}/locations/{location}/processors/{processor_id}"
     name = client.processor_path(project_id, location, processor_id)
 
     # ドキュメントの設定
@@ -60,72 +140,94 @@ def process_pdf(
     try:
         # ドキュメントの処理
         result = client.process_document(request=request)
-        document = result.document
-
-        # 結果の整形
-        result_dict = {"text": "", "pages": [], "entities": [], "blocks": []}
-
-        # document_layoutの情報を抽出
-        if hasattr(document, "document_layout") and document.document_layout:
-            # テキストの抽出
-            all_text = []
-            for block in document.document_layout.blocks:
-                if hasattr(block, "text_block") and block.text_block.text:
-                    all_text.append(block.text_block.text)
-            result_dict["text"] = "\n".join(all_text)
-
-            # ブロック情報の抽出
-            for block in document.document_layout.blocks:
-                block_info = {
-                    "block_id": block.block_id,
-                    "text": (
-                        block.text_block.text if hasattr(block, "text_block") else ""
-                    ),
-                    "type": (
-                        block.text_block.type_ if hasattr(block, "text_block") else ""
-                    ),
-                    "page_span": (
-                        {
-                            "page_start": block.page_span.page_start,
-                            "page_end": block.page_span.page_end,
-                        }
-                        if hasattr(block, "page_span")
-                        else None
-                    ),
-                }
-                result_dict["blocks"].append(block_info)
-
-        # ページ情報の抽出
-        for page in document.pages:
-            page_info = {
-                "page_number": page.page_number,
-                "text": page.text_anchor.content if page.text_anchor else "",
-                "blocks": [],
-            }
+        return result.document
+    except Exception as e:
+        raise Exception(f"Document AIの処理中にエラーが発生しました: {str(e)}")
 
-            # ブロック情報の抽出
-            for block in page.blocks:
-                block_info = {
+
+def document_to_dict(document, sections: tuple = ("text",)) -> Dict[str, Any]:
+    """
+    Documentオブジェクトから、指定されたセクションのみを辞書に変換する
+
+    Args:
+        document (documentai.Document): Document AIの解析結果
+        sections (tuple): 取得するセクション（PDF_SECTIONSの部分集合）
+
+    Returns:
+        Dict[str, Any]: 解析結果を含む辞書
+    """
+    unknown = set(sections) - set(PDF_SECTIONS)
+    if unknown:
+        raise ValueError(f"未対応のセクションが指定されました: {', '.join(unknown)}")
+
+    result_dict = {}
+    if "text" in sections:
+        result_dict["text"] = "\n".join(iter_block_texts(document))
+    if "blocks" in sections:
+        result_dict["blocks"] = list(iter_layout_blocks(document))
+    if "pages" in sections:
+        result_dict["pages"] = list(iter_pages(document))
+    if "entities" in sections:
+        result_dict["entities"] = list(iter_entities(document))
+    return result_dict
+
+
+def _layout_blocks(document):
+    """document_layoutのブロック一覧を取得する（存在しない場合は空）"""
+    if hasattr(document, "document_layout") and document.document_layout:
+        return document.document_layout.blocks
+    return []
+
+
+def iter_block_texts(document):
+    """document_layoutのブロックのうち、テキストを持つもののテキストを順に返す"""
+    for block in _layout_blocks(document):
+        if hasattr(block, "text_block") and block.text_block.text:
+            yield block.text_block.text
+
+
+def iter_layout_blocks(document):
+    """document_layoutのブロック情報を順に辞書として返す"""
+    for block in _layout_blocks(document):
+        yield {
+            "block_id": block.block_id,
+            "text": (block.text_block.text if hasattr(block, "text_block") else ""),
+            "type": (block.text_block.type_ if hasattr(block, "text_block") else ""),
+            "page_span": (
+                {
+                    "page_start": block.page_span.page_start,
+                    "page_end": block.page_span.page_end,
+                }
+                if hasattr(block, "page_span")
+                else None
+            ),
+        }
+
+
+def iter_pages(document):
+    """ページ情報を順に辞書として返す"""
+    for page in document.pages:
+        yield {
+            "page_number": page.page_number,
+            "text": page.text_anchor.content if page.text_anchor else "",
+            "blocks": [
+                {
                     "text": block.text_anchor.content if block.text_anchor else "",
                     "confidence": block.layout.confidence,
                 }
-                page_info["blocks"].append(block_info)
-
-            result_dict["pages"].append(page_info)
-
-        # エンティティ情報の抽出
-        for entity in document.entities:
-            entity_info = {
-                "type": entity.type_,
-                "mention_text": entity.mention_text,
-                "confidence": entity.confidence,
-            }
-            result_dict["entities"].append(entity_info)
+                for block in page.blocks
+            ],
+        }
 
-        return result_dict
 
-    except Exception as e:
-        raise Exception(f"Document AIの処理中にエラーが発生しました: {str(e)}")
+def iter_entities(document):
+    """エンティティ情報を順に辞書として返す"""
+    for entity in document.entities:
+        yield {
+            "type": entity.type_,
+            "mention_text": entity.mention_text,
+            "confidence": entity.confidence,
+        }
 
 
 def extract_text_from_pdf(
@@ -147,83 +249,171 @@ def extract_text_from_pdf(
     return result["text"]
 
 
-def auto_check_document(check_group_id: int, document: str) -> Dict[str, Any]:
+def extract_blocks_from_pdf(
+    pdf_content: bytes, project_id: str, location: str, processor_id: str
+) -> List[str]:
+    """
+    PDFファイルからブロック単位のテキストを抽出する
+
+    Args:
+        pdf_content (bytes): PDFファイルのバイナリデータ
+        project_id (str): Google Cloud プロジェクトID
+        location (str): Document AIのロケーション
+        processor_id (str): Document AIプロセッサーID
+
+    Returns:
+        List[str]: テキストを持つブロックのテキストのリスト（"\n"で連結すると抽出テキスト全体になる）
+    """
+    document = process_document(pdf_content, project_id, location, processor_id)
+    return list(iter_block_texts(document))
+
+
+def auto_check_document(
+    check_group_id: int,
+    document: str,
+    check_ids: Optional[List[str]] = None,
+    rule_text: Optional[str] = None,
+) -> List[Union[CheckResult, OverallResult]]:
     """
     ドキュメントを自動チェックし、チェック結果を返します。
 
     Args:
         check_group_id (int): チェックグループID
         document (str): チェック対象のドキュメントテキスト
+        check_ids (List[str], optional): 評価対象のcheck_id（省略時はグループの全項目）
+        rule_text (str, optional): ルール判定に使用するテキスト（省略時はdocument）
 
     Returns:
-        Dict[str, Any]: チェック結果を含む辞書
+        List[Union[CheckResult, OverallResult]]: 評価対象の項目順のチェック結果と、全体の評価
+            （ルールで判定した項目は remarks が RULE_REMARKS_PREFIX で始まる）
     """
 
-    # チェックリストの取得（指定されたグループの項目を取得）
-    checksheet_data = db_operations.load_check_items_by_group(check_group_id=check_group_id)
+    # チェックリストの取得（指定されたグループの項目をコンパクトな表形式に変換）
+    with span("load_items"):
+        compiled = compile_group_prompt(
+            kind="document",
+            check_group_id=check_group_id,
+            instruction=AUTO_CHECK_INSTRUCTION,
+        )
 
-    # チェック項目の情報を収集
-    check_items = []
-    for category, items in checksheet_data.items():
-        for item in items:
-            check_items.append(
-                {
-                    "check_id": item["check_id"],
-                    "name": item["name"],
-                    "description": item["description"],
-                    "level": item["level"],
-                }
-            )
+    target_items = compiled["check_items"]
+    if check_ids is not None:
+        target_items = [item for item in target_items if item["check_id"] in check_ids]
+    all_check_ids = [item["check_id"] for item in target_items]
+
+    # ルールが設定された項目をOCRテキストに対してローカルで判定し、確定した項目はプロンプトから除外する
+    with span("rule_check"):
+        rule_results, llm_items = apply_rules(
+            target_items, rule_text if rule_text is not None else document
+        )
+    rule_check_results = {
+        check_id: CheckResult(
+            check_id=check_id,
+            checked=result["checked"],
+            remarks=result["remarks"],
+            uncertain=False,
+        )
+        for check_id, result in rule_results.items()
+    }
+    if not llm_items:
+        return [rule_check_results[check_id] for check_id in all_check_ids]
+    if len(llm_items) < len(compiled["check_items"]):
+        compiled = compile_prompt(
+            kind="document",
+            check_group_id=check_group_id,
+            instruction=AUTO_CHECK_INSTRUCTION,
+            check_items=llm_items,
+        )
 
     # Gemini APIの呼び出し
+    from google import genai
+
     client = genai.Client(
         vertexai=True,
         project=os.getenv("GOOGLE_CLOUD_PROJECT"),
         location="us-central1",
     )
 
-    # プロンプトの作成
-    prompt = f"""
-    あなたはチェックリストのレビューAIエージェントです。
-    人間に変わって、ドキュメントをレビューし、チェックリストに基づいて評価を実施、業務を効率化します。
-    以下のドキュメントを、チェックリストに基づいて評価してください。
-    各チェック項目について、該当するかどうか（checked）を判定してください。
-    そもそも対象のドキュメントについて、チェック項目の対象とならないようなケースの場合は、checkedはtrueとなります。
-    例えば、専門用語について説明されているか、というチェック項目について、そもそも専門用語を利用していなければ、checkedはtrueとなります。
-
-    チェック項目に対して、当てはまらない場合は、その理由や改善点（remarks）を記載してください。
-    特に理由や改善点がない場合は、remarksを空の文字列にしてください。
-    ただし、特記事項や素晴らしい点などあれば記載ください。
+    check_ids = [item["check_id"] for item in llm_items]
+    request_text = f"# ドキュメント:\n{document}"
+
+    # 小さなジョブは高速モデルで評価する
+    tier = select_tier(len(document), len(check_ids))
+    accepted, failed_ids, parsed = _run_check_tier(client, tier, compiled, request_text)
+    overall_results = [r for r in parsed if isinstance(r, OverallResult)]
+
+    # 検証に失敗した項目、不確かな項目のみを高精度モデルで再評価する
+    if failed_ids and tier != "strong":
+        escalated = compile_prompt(
+            kind="document",
+            check_group_id=check_group_id,
+            instruction=AUTO_CHECK_INSTRUCTION,
+            check_items=[
+                item
+                for item in compiled["check_items"]
+                if item["check_id"] in failed_ids
+            ],
+        )
+        escalated_accepted, failed_ids, escalated_parsed = _run_check_tier(
+            client, "strong", escalated, request_text
+        )
+        accepted.update(escalated_accepted)
+        # 高精度モデルでも不確かな回答は、そのまま採用する
+        for result in escalated_parsed:
+            if isinstance(result, CheckResult) and result.check_id in failed_ids:
+                accepted.setdefault(result.check_id, result)
+
+    # どのモデルからも回答が得られなかった項目は未チェックとして扱う
+    for check_id in check_ids:
+        if check_id not in accepted:
+            accepted[check_id] = CheckResult(
+                check_id=check_id,
+                checked=False,
+                remarks="自動判定できませんでした",
+                uncertain=True,
+            )
 
-    また、全体としての評価や改善点（OverallResult）ももしあれば記載してください。
-    なくても問題ありません。その場合は、overall_remarksを空の文字列にしてください。
-    全体としての評価や改善点は、全体的にどのような点が良いか、または悪いかを記載してください。
+    accepted.update(rule_check_results)
+    return [accepted[check_id] for check_id in all_check_ids] + overall_results
 
-    # ドキュメント:
-    {document}
 
-    # チェックリスト:
-    {check_items}
+def _run_check_tier(client, tier: str, compiled: Dict[str, Any], request_text: str):
     """
+    指定された階層のモデルでチェックを実行し、レイテンシと検証結果を記録する
 
-    # Gemini APIの呼び出し
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=prompt,
-        config={
-            "response_mime_type": "application/json",
-            "response_schema": list[Union[CheckResult, OverallResult]],
-        },
-    )
+    Returns:
+        tuple: (check_idごとの採用結果, 再評価が必要なcheck_id, レスポンスの全要素)
+    """
+    started = time.perf_counter()
+    with span(f"llm_{tier}", bytes=len(request_text.encode("utf-8"))):
+        response = generate_with_checklist(
+            client,
+            model=MODEL_TIERS[tier],
+            compiled=compiled,
+            request_text=request_text,
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": list[Union[CheckResult, OverallResult]],
+            },
+        )
 
     # レスポンスの解析
     try:
-        return response.parsed
+        parsed = response.parsed or []
     except Exception as e:
         raise Exception(
             f"Gemini APIのレスポンスの解析中にエラーが発生しました: {str(e)}"
         )
 
+    check_ids = [item["check_id"] for item in compiled["check_items"]]
+    accepted, failed_ids = validate_check_results(
+        [r for r in parsed if isinstance(r, CheckResult)], check_ids
+    )
+    record_tier_result(
+        tier, time.perf_counter() - started, len(check_ids), len(failed_ids)
+    )
+    return accepted, failed_ids, parsed
+
 
 def process_and_save_pdf_results(
     pdf_content: bytes,
@@ -251,17 +441,152 @@ def process_and_save_pdf_results(
         Exception: 処理中にエラーが発生した場合
     """
 
-    # Document AIでテキストを抽出
-    extracted_text = extract_text_from_pdf(
-        pdf_content, project_id=project_id, location=location, processor_id=processor_id
-    )
+    with trace("pdf_auto_check"):
+        # Document AIでブロック単位のテキストを抽出
+        with span("ocr", bytes=len(pdf_content)):
+            blocks = extract_blocks_from_pdf(
+                pdf_content,
+                project_id=project_id,
+                location=location,
+                processor_id=processor_id,
+            )
+        extracted_text = "\n".join(blocks)
 
-    # 自動チェックの実行
-    check_result = auto_check_document(
-        check_group_id=check_group_id, document=extracted_text
-    )
+        # 自動チェックの実行
+        with span("auto_check"):
+            check_result = auto_check_document(
+                check_group_id=check_group_id, document=extracted_text
+            )
+        results_dict, overall_remarks = _to_results_dict(check_result)
+
+        # データベースに保存
+        current_time = datetime.now()
+        check_sheet_id = current_time.strftime("%Y%m%d_%H%M%S")  # YYYYMMDD_HHMMSS形式
+
+        with span("save"):
+            check_sheet_id = db_operations.save_results(
+                check_sheet_id=check_sheet_id,
+                results=results_dict,
+                check_remarks=overall_remarks,
+                user_id="auto_check",  # 自動チェックの場合は固定のユーザーIDを使用
+                reviewer_id=user_id,  # 実行したユーザーIDをレビュアーとして設定
+                check_group_id=check_group_id,
+            )
+
+            # 修正版の差分チェック用に抽出結果を保存
+            db_operations.save_document_extraction(check_sheet_id, blocks)
+
+    return check_sheet_id
+
+
+def process_and_save_revised_pdf_results(
+    pdf_content: bytes,
+    project_id: str,
+    location: str,
+    processor_id: str,
+    check_sheet_id: str,
+) -> str:
+    """
+    差し戻されたチェックシートに対して修正版のPDFを処理し、変更箇所に関係する項目のみを再チェックします。
+    変更のない項目は前回のチェック結果を引き継ぎます。
+
+    Args:
+        pdf_content (bytes): 修正版PDFファイルのバイナリデータ
+        project_id (str): Google Cloud プロジェクトID
+        location (str): Document AIのロケーション
+        processor_id (str): Document AIプロセッサーID
+        check_sheet_id (str): 再チェックするチェックシートID
 
-    # チェック結果を辞書形式に変換
+    Returns:
+        str: 保存されたチェックシートID
+
+    Raises:
+        Exception: 処理中にエラーが発生した場合
+    """
+    with trace("pdf_recheck"):
+        check_sheet = db_operations.load_check_sheet_metadata(check_sheet_id)
+        if not check_sheet:
+            raise Exception(f"チェックシートが見つかりません: {check_sheet_id}")
+        check_group_id = check_sheet["check_group_id"]
+
+        previous_blocks = db_operations.load_document_extraction(check_sheet_id)
+        previous_results = db_operations.load_check_results(check_sheet_id)
+
+        # Document AIでブロック単位のテキストを抽出
+        with span("ocr", bytes=len(pdf_content)):
+            blocks = extract_blocks_from_pdf(
+                pdf_content,
+                project_id=project_id,
+                location=location,
+                processor_id=processor_id,
+            )
+        extracted_text = "\n".join(blocks)
+
+        results_dict = dict(previous_results)
+        overall_remarks = check_sheet.get("check_remarks") or ""
+
+        diff = diff_blocks(previous_blocks, blocks) if previous_blocks is not None else None
+        if diff is None or not previous_results or diff["change_ratio"] > FULL_RECHECK_CHANGE_RATIO:
+            # 前回の抽出結果がない場合や変更が大きい場合は全項目を再チェック
+            check_result = auto_check_document(
+                check_group_id=check_group_id,
+                document=extracted_text,
+                check_ids=list(previous_results) or None,
+            )
+            results_dict, overall_remarks = _to_results_dict(check_result)
+        elif diff["changed_indices"] or diff["removed_texts"]:
+            # 変更箇所に関係する項目のみを、変更箇所の抜粋に対して再チェック
+            changed_text = "\n".join(
+                [blocks[index] for index in diff["changed_indices"]] + diff["removed_texts"]
+            )
+            checksheet_data = db_operations.load_checksheet_by_check_sheet_id(check_sheet_id)
+            check_items = [item for items in checksheet_data.values() for item in items]
+            recheck_ids = select_items_for_recheck(check_items, previous_results, changed_text)
+            logger.info(
+                f"差分チェック: 変更ブロック={len(diff['changed_indices'])}件, "
+                f"削除ブロック={len(diff['removed_texts'])}件, "
+                f"再チェック項目={len(recheck_ids)}/{len(check_items)}件"
+            )
+
+            if recheck_ids:
+                excerpt = build_changed_excerpt(blocks, diff["changed_indices"])
+                removed = "\n".join(diff["removed_texts"])
+                document = (
+                    "以下は修正版ドキュメントのうち、変更された箇所（前後を含む）の抜粋です。\n"
+                    f"{excerpt}\n\n"
+                    f"# 修正で削除された記述:\n{removed or 'なし'}"
+                )
+                check_result = auto_check_document(
+                    check_group_id=check_group_id,
+                    document=document,
+                    check_ids=recheck_ids,
+                    rule_text=extracted_text,
+                )
+                recheck_results, recheck_remarks = _to_results_dict(check_result)
+                results_dict.update(recheck_results)
+                overall_remarks = recheck_remarks or overall_remarks
+
+        with span("save"):
+            check_sheet_id = db_operations.save_results(
+                check_sheet_id=check_sheet_id,
+                results=results_dict,
+                check_remarks=overall_remarks,
+                user_id=check_sheet["created_by"],
+                reviewer_id=check_sheet["reviewer_id"],
+                check_group_id=check_group_id,
+            )
+            db_operations.save_document_extraction(check_sheet_id, blocks)
+
+    return check_sheet_id
+
+
+def _to_results_dict(check_result) -> tuple:
+    """
+    auto_check_documentの結果をsave_resultsに渡す辞書形式に変換する
+
+    Returns:
+        tuple: (check_idごとの結果の辞書, 全体の備考)
+    """
     results_dict = {}
     overall_remarks = ""
 
@@ -274,17 +599,4 @@ def process_and_save_pdf_results(
                 "remarks": result.remarks,
             }
 
-    # データベースに保存
-    current_time = datetime.now()
-    check_sheet_id = current_time.strftime("%Y%m%d_%H%M%S")  # YYYYMMDD_HHMMSS形式
-
-    check_sheet_id = db_operations.save_results(
-        check_sheet_id=check_sheet_id,
-        results=results_dict,
-        check_remarks=overall_remarks,
-        user_id="auto_check",  # 自動チェックの場合は固定のユーザーIDを使用
-        reviewer_id=user_id,  # 実行したユーザーIDをレビュアーとして設定
-        check_group_id=check_group_id,
-    )
-
-    return check_sheet_id
+    return results_dict, overall_remarks
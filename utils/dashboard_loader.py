@@ -0,0 +1,142 @@
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import utils.db_operations as db_operations
+
+logger = logging.getLogger(__name__)
+
+# トップページの各セクションの取得を待つ最大の秒数（取得の開始から数える）
+DASHBOARD_SECTION_TIMEOUT_SECONDS = float(
+    os.getenv("DASHBOARD_SECTION_TIMEOUT_SECONDS", "10")
+)
+# 全セッションで共有するスレッド数（各クエリはコネクションプールから別の接続を使うため、プールの上限に合わせる）
+DASHBOARD_MAX_WORKERS = db_operations.POOL_SIZE + db_operations.MAX_OVERFLOW
+
+# セッション間で共有するスレッドプール
+_executor = ThreadPoolExecutor(
+    max_workers=DASHBOARD_MAX_WORKERS, thread_name_prefix="dashboard"
+)
+
+
+def _submit_after(source: Future, func: Callable, *args: Any) -> Future:
+    """
+    source の完了後に func をスレッドプールで実行する（完了を待つ間はスレッドを使わない）
+
+    Returns:
+        Future: func の結果
+    """
+    chained = Future()
+
+    def copy_result(inner: Future) -> None:
+        error = inner.exception()
+        if error:
+            chained.set_exception(error)
+        else:
+            chained.set_result(inner.result())
+
+    def submit(_: Future) -> None:
+        if not chained.set_running_or_notify_cancel():
+            return
+        try:
+            _executor.submit(func, *args).add_done_callback(copy_result)
+        except Exception as e:
+            chained.set_exception(e)
+
+    source.add_done_callback(submit)
+    return chained
+
+
+class DashboardLoader:
+    """
+    トップページに表示するデータを並行して取得する。
+    各セクションは取得できた順に表示できるため、待ち時間は各クエリの合計ではなく最大になる。
+    """
+
+    def __init__(
+        self,
+        user_id: str,
+        user_name: str,
+        bootstrap: bool = True,
+        timeout_seconds: float = DASHBOARD_SECTION_TIMEOUT_SECONDS,
+    ):
+        """
+        Args:
+            user_id (str): ユーザーID
+            user_name (str): ユーザー名
+            bootstrap (bool): ユーザーの作成・チェックグループへの追加を行うか（セッションで初回のみ）
+            timeout_seconds (float): 各セクションの取得を待つ最大の秒数
+        """
+        self.timeout_seconds = timeout_seconds
+        self._created_at = time.monotonic()
+        # セクション名 -> 取得を開始した時刻
+        self._started_at: Dict[str, float] = {}
+
+        if bootstrap:
+            user_future = self._submit("user", db_operations.bootstrap_user, user_id, user_name)
+            # 新規ユーザーはグループへの追加後に取得する（追加の成否にかかわらず取得する）
+            groups_future = _submit_after(
+                user_future,
+                self._run,
+                "groups",
+                db_operations.get_user_check_groups,
+                user_id,
+            )
+        else:
+            # 初期設定済みのセッションでは新規ユーザーとして扱わない
+            user_future = Future()
+            user_future.set_result(False)
+            groups_future = self._submit("groups", db_operations.get_user_check_groups, user_id)
+        self._futures: Dict[Future, str] = {
+            user_future: "user",
+            groups_future: "groups",
+            self._submit("tasks", db_operations.get_user_tasks, user_id): "tasks",
+            self._submit("pending", db_operations.get_pending_check_items, user_id): "pending",
+        }
+
+    def _run(self, section: str, func: Callable, *args: Any) -> Any:
+        """取得を開始した時刻を記録してから実行する"""
+        self._started_at[section] = time.monotonic()
+        return func(*args)
+
+    def _submit(self, section: str, func: Callable, *args: Any) -> Future:
+        return _executor.submit(self._run, section, func, *args)
+
+    def _deadline(self, section: str) -> float:
+        """
+        セクションの取得を打ち切る時刻。
+        取得を開始していない（スレッドの空きや前の処理を待っている）間は、作成から timeout_seconds 以内の開始を待つ
+        """
+        return self._started_at.get(section, self._created_at) + self.timeout_seconds
+
+    def iter_completed(self) -> Iterator[Tuple[str, Any, Optional[Exception]]]:
+        """
+        取得できたセクションから順に結果を返す
+
+        Returns:
+            Iterator[Tuple[str, Any, Optional[Exception]]]: (セクション名, 結果, エラー)
+                時間内に取得できなかった場合はTimeoutErrorをエラーとして返す
+        """
+        pending = set(self._futures)
+        while pending:
+            remaining = min(self._deadline(self._futures[f]) for f in pending) - time.monotonic()
+            done, pending = wait(
+                pending, timeout=max(remaining, 0), return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                section = self._futures[future]
+                error = future.exception()
+                yield section, None if error else future.result(), error
+
+            now = time.monotonic()
+            for future in [f for f in pending if self._deadline(self._futures[f]) <= now]:
+                # 取得を待たずに表示する（実行中のクエリは完了後に破棄される）
+                pending.discard(future)
+                future.cancel()
+                section = self._futures[future]
+                logger.warning(f"トップページの取得がタイムアウトしました: {section}")
+                yield section, None, TimeoutError(
+                    f"{self.timeout_seconds:g}秒以内に取得できませんでした"
+                )
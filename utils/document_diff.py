@@ -0,0 +1,108 @@
+import difflib
+import re
+from typing import Any, Dict, List
+
+# 空白の違いは変更とみなさない
+WHITESPACE = re.compile(r"\s+")
+
+# チェック項目の文字bigramのうち、この割合以上が変更箇所に含まれていれば関連ありとみなす
+RELEVANCE_THRESHOLD = 0.3
+
+# 変更箇所の抜粋に含める前後のブロック数
+CONTEXT_BLOCKS = 1
+
+
+def _normalize(block: str) -> str:
+    """比較用にブロックのテキストを正規化する"""
+    return WHITESPACE.sub(" ", block).strip()
+
+
+def _bigrams(text: str) -> set:
+    """文字bigramの集合を作成する（日本語は単語区切りがないため文字単位で扱う）"""
+    text = WHITESPACE.sub("", text)
+    return {text[i : i + 2] for i in range(len(text) - 1)}
+
+
+def diff_blocks(previous_blocks: List[str], new_blocks: List[str]) -> Dict[str, Any]:
+    """
+    前回と今回のブロック単位のテキストを比較します。
+
+    Args:
+        previous_blocks (List[str]): 前回抽出したブロックのテキスト
+        new_blocks (List[str]): 今回抽出したブロックのテキスト
+
+    Returns:
+        Dict[str, Any]: 差分の情報
+            {
+                "changed_indices": List[int],  # 今回のブロックのうち変更・追加されたもの
+                "removed_texts": List[str],    # 削除されたブロックのテキスト
+                "change_ratio": float          # 変更されたブロックの割合
+            }
+    """
+    matcher = difflib.SequenceMatcher(
+        a=[_normalize(block) for block in previous_blocks],
+        b=[_normalize(block) for block in new_blocks],
+        autojunk=False,
+    )
+
+    changed_indices = []
+    removed_texts = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        changed_indices.extend(range(j1, j2))
+        if tag in ("replace", "delete"):
+            removed_texts.extend(previous_blocks[i1:i2])
+
+    total = max(len(previous_blocks), len(new_blocks), 1)
+    changed = max(len(changed_indices), len(removed_texts))
+    return {
+        "changed_indices": changed_indices,
+        "removed_texts": removed_texts,
+        "change_ratio": changed / total,
+    }
+
+
+def build_changed_excerpt(new_blocks: List[str], changed_indices: List[int]) -> str:
+    """変更・追加されたブロックとその前後のブロックを抜粋する"""
+    selected = set()
+    for index in changed_indices:
+        start = max(index - CONTEXT_BLOCKS, 0)
+        end = min(index + CONTEXT_BLOCKS + 1, len(new_blocks))
+        selected.update(range(start, end))
+    return "\n".join(new_blocks[index] for index in sorted(selected))
+
+
+def select_items_for_recheck(
+    check_items: List[Dict[str, Any]],
+    previous_results: Dict[str, Dict[str, Any]],
+    changed_text: str,
+) -> List[str]:
+    """
+    再評価が必要なチェック項目を選択します。
+    前回NGだった項目（修正の対象）と、項目名・説明が変更箇所と関連する項目を対象とします。
+
+    Args:
+        check_items (List[Dict[str, Any]]): check_id, name, description を含むチェック項目
+        previous_results (Dict[str, Dict[str, Any]]): 前回のチェック結果
+        changed_text (str): 変更・追加・削除されたテキスト
+
+    Returns:
+        List[str]: 再評価が必要なcheck_idのリスト
+    """
+    changed_bigrams = _bigrams(changed_text)
+    selected = []
+    for item in check_items:
+        check_id = item["check_id"]
+        previous = previous_results.get(check_id)
+        if not previous or not previous.get("checked"):
+            selected.append(check_id)
+            continue
+
+        item_bigrams = _bigrams(f"{item['name']}{item['description']}")
+        if not item_bigrams:
+            continue
+        overlap = len(item_bigrams & changed_bigrams) / len(item_bigrams)
+        if overlap >= RELEVANCE_THRESHOLD:
+            selected.append(check_id)
+    return selected
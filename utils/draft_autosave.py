@@ -0,0 +1,132 @@
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import utils.db_operations as db_operations
+
+logger = logging.getLogger(__name__)
+
+# チェック中の入力内容を下書きとして自動保存する（false で無効化）
+AUTOSAVE_ENABLED = os.getenv("AUTOSAVE_ENABLED", "true").lower() == "true"
+# 最後の変更からこの秒数だけ変更がなければ下書きを保存する
+AUTOSAVE_INTERVAL_SECONDS = float(os.getenv("AUTOSAVE_INTERVAL_SECONDS", "10"))
+# 未保存の変更がこの件数に達したら、間隔を待たずに保存する
+AUTOSAVE_MAX_EDITS = int(os.getenv("AUTOSAVE_MAX_EDITS", "20"))
+
+
+class DraftAutosave:
+    """
+    チェックシートの変更をメモリ上に溜め、まとめて下書きとして保存する。
+    変更のたびにDBへ書き込まず、一定時間変更がないか変更が一定件数溜まったときに、
+    変更のあった項目のみを1回のUPSERTで書き込む。
+    """
+
+    def __init__(
+        self,
+        check_sheet_id: str,
+        exists: bool,
+        user_id: str,
+        reviewer_id: Optional[str] = None,
+        check_group_id: Optional[int] = None,
+        interval_seconds: float = AUTOSAVE_INTERVAL_SECONDS,
+        max_edits: int = AUTOSAVE_MAX_EDITS,
+    ):
+        """
+        Args:
+            check_sheet_id (str): チェックシートID
+            exists (bool): チェックシートがDBに保存済みかどうか
+            user_id (str): ユーザーID
+            reviewer_id (Optional[str]): レビュアーのユーザーID
+            check_group_id (Optional[int]): チェックグループID
+            interval_seconds (float): 最後の変更から保存するまでの秒数
+            max_edits (int): 間隔を待たずに保存する変更の件数
+        """
+        self.check_sheet_id = check_sheet_id
+        self.exists = exists
+        self.user_id = user_id
+        self.reviewer_id = reviewer_id
+        self.check_group_id = check_group_id
+        self.interval_seconds = interval_seconds
+        self.max_edits = max_edits
+        self.saved_at: Optional[datetime] = None
+        self._changed: Dict[str, Dict] = {}
+        self._edits = 0
+        self._last_edit_at: Optional[float] = None
+
+    @property
+    def pending(self) -> bool:
+        """未保存の変更があるかどうか"""
+        return bool(self._edits)
+
+    def record(self, check_id: str, result: Dict) -> None:
+        """
+        チェック項目の変更を記録する（同じ項目の変更は最新の値にまとめる）
+
+        Args:
+            check_id (str): チェック項目ID
+            result (Dict): {"checked": bool, "remarks": str}
+        """
+        self._changed[check_id] = dict(result)
+        self._touch()
+
+    def record_remarks(self) -> None:
+        """備考の変更を記録する（備考は保存時に最新の値を書き込む）"""
+        self._touch()
+
+    def _touch(self) -> None:
+        self._edits += 1
+        self._last_edit_at = time.monotonic()
+
+    def due(self) -> bool:
+        """下書きを保存する時期かどうか（変更が一定件数溜まったか、最後の変更から一定時間経過した）"""
+        if not self.pending:
+            return False
+        if self._edits >= self.max_edits:
+            return True
+        return time.monotonic() - self._last_edit_at >= self.interval_seconds
+
+    def flush(self, results: Dict[str, Dict], check_remarks: str) -> bool:
+        """
+        未保存の変更を下書きとして保存する。
+        チェックシートが未保存の場合は、全項目を書き込んでチェックシートを作成する。
+
+        Args:
+            results (Dict[str, Dict]): 全項目の入力中の結果
+            check_remarks (str): チェック時の備考
+
+        Returns:
+            bool: 保存した場合はTrue（保存に失敗した場合は変更を残して次回に再試行する）
+        """
+        if not self.pending:
+            return False
+
+        changed = self._changed if self.exists else results
+        try:
+            db_operations.save_draft_results(
+                self.check_sheet_id,
+                changed,
+                check_remarks,
+                self.user_id,
+                reviewer_id=self.reviewer_id,
+                check_group_id=self.check_group_id,
+            )
+        except Exception as e:
+            logger.warning(f"{e}")
+            return False
+
+        logger.info(
+            f"下書きを保存しました: {self.check_sheet_id} "
+            f"（{len(changed)}項目, 変更{self._edits}回）"
+        )
+        self.exists = True
+        self.saved_at = datetime.now()
+        self.discard()
+        return True
+
+    def discard(self) -> None:
+        """未保存の変更を破棄する（チェックシート全体を保存した場合など）"""
+        self._changed = {}
+        self._edits = 0
+        self._last_edit_at = None
@@ -0,0 +1,109 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import utils.db_operations as db_operations
+from utils.lexical_index import LexicalIndex
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# 過去の質問との類似度がこの値以上であれば同じ質問とみなし、保存済みの回答を返す
+FAQ_MATCH_MIN_SCORE = float(os.getenv("FAQ_MATCH_MIN_SCORE", "0.8"))
+# 他のユーザーが登録した回答を反映するため、この秒数ごとに索引を作り直す
+FAQ_INDEX_TTL_SECONDS = int(os.getenv("FAQ_INDEX_TTL_SECONDS", "300"))
+
+# Geminiが回答した質問に付けるタグ
+GEMINI_ANSWER_TAG = "gemini"
+
+# check_group_id -> (作成時刻, 索引, 質問IDごとの質問と回答)
+_faq_indexes: Dict[int, Tuple[float, LexicalIndex, Dict[str, Dict[str, Any]]]] = {}
+_faq_lock = threading.Lock()
+
+
+def _get_faq_index(check_group_id: int) -> Tuple[LexicalIndex, Dict[str, Dict[str, Any]]]:
+    """チェックグループの回答済み・FAQの質問から類似検索用の索引を取得する"""
+    with _faq_lock:
+        cached = _faq_indexes.get(check_group_id)
+        if cached and time.monotonic() - cached[0] < FAQ_INDEX_TTL_SECONDS:
+            return cached[1], cached[2]
+
+    rows = db_operations.load_answered_questions(check_group_id)
+    entries = {str(row["id"]): row for row in rows}
+    index = LexicalIndex((question_id, row["question"]) for question_id, row in entries.items())
+
+    with _faq_lock:
+        _faq_indexes[check_group_id] = (time.monotonic(), index, entries)
+    return index, entries
+
+
+def preload_faq_index(check_group_id: int) -> None:
+    """チェックグループの索引を作成しておく（起動時のウォームアップ用）"""
+    _get_faq_index(check_group_id)
+
+
+def invalidate_faq_index(check_group_id: int) -> None:
+    """チェックグループの索引を破棄する（回答を登録・更新したときに呼び出す）"""
+    with _faq_lock:
+        _faq_indexes.pop(check_group_id, None)
+
+
+def find_answer(check_group_id: int, question: str) -> Optional[Dict[str, Any]]:
+    """
+    過去の回答済み・FAQの質問から、ほぼ同じ質問の回答を探します。
+    見つかった場合は閲覧回数を増やします。
+
+    Args:
+        check_group_id (int): チェックグループID
+        question (str): 質問内容
+
+    Returns:
+        Optional[Dict[str, Any]]: {"id": int, "question": str, "answer": str, "score": float}
+            見つからない場合はNone
+    """
+    with span("faq_lookup"):
+        index, entries = _get_faq_index(check_group_id)
+        matches = index.search(question, top_k=1, min_score=FAQ_MATCH_MIN_SCORE)
+    if not matches:
+        return None
+
+    question_id, score = matches[0]
+    entry = entries[question_id]
+    logger.info(f"FAQから回答しました: 質問ID={question_id} 類似度={score:.2f}")
+    try:
+        db_operations.increment_question_view_count(entry["id"])
+    except Exception as e:
+        # 閲覧回数の更新に失敗しても回答は返す
+        logger.warning(f"{e}")
+    return {
+        "id": entry["id"],
+        "question": entry["question"],
+        "answer": entry["answer"],
+        "score": score,
+    }
+
+
+def save_answer(check_group_id: int, question: str, answer: str, user_id: str) -> None:
+    """
+    Geminiの回答を質問と回答のテーブルに登録し、次回以降の同じ質問に再利用できるようにします。
+
+    Args:
+        check_group_id (int): チェックグループID
+        question (str): 質問内容
+        answer (str): 回答内容
+        user_id (str): 質問者のユーザーID
+    """
+    try:
+        db_operations.insert_question_answer(
+            question=question,
+            answer=answer,
+            questioner_id=user_id,
+            check_group_id=check_group_id,
+            tags=[GEMINI_ANSWER_TAG],
+        )
+    except Exception as e:
+        logger.warning(f"{e}")
+        return
+    invalidate_faq_index(check_group_id)
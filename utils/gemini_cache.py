@@ -0,0 +1,229 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from utils.tracing import add_to_span
+
+logger = logging.getLogger(__name__)
+
+# コンテキストキャッシュの設定
+CONTEXT_CACHE_ENABLED = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+# 有効期限がこの秒数以内に迫ったキャッシュは作り直す
+CONTEXT_CACHE_REFRESH_MARGIN_SECONDS = 60
+# キャッシュの作成に失敗した場合、この秒数が経過するまでは作成を試みない
+CONTEXT_CACHE_RETRY_SECONDS = 300
+# 別のスレッドがキャッシュを作成中の場合に、完了を待つ最大の秒数（超えた場合は通常のプロンプトで実行する）
+CONTEXT_CACHE_WAIT_SECONDS = 30
+
+# (kind, check_group_id, model) -> キャッシュ情報
+_cache_registry: Dict[tuple, Dict[str, Any]] = {}
+# (kind, check_group_id, model) -> 作成中のキャッシュの完了通知
+_in_flight: Dict[tuple, threading.Event] = {}
+_registry_lock = threading.Lock()
+
+
+def checklist_fingerprint(instruction: str, checklist_text: str) -> str:
+    """指示文とチェックリストからキャッシュの同一性を判定するためのハッシュ値を計算する"""
+    digest = hashlib.sha256()
+    digest.update(instruction.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(checklist_text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _is_fresh(entry: Dict[str, Any]) -> bool:
+    """キャッシュの有効期限が十分に残っているかを判定する"""
+    expire_time = entry.get("expire_time")
+    if expire_time is None:
+        return True
+    margin = timedelta(seconds=CONTEXT_CACHE_REFRESH_MARGIN_SECONDS)
+    return expire_time - margin > datetime.now(timezone.utc)
+
+
+def _delete_cache(client, name: str) -> None:
+    """不要になったキャッシュを削除する（失敗しても処理は継続する）"""
+    try:
+        client.caches.delete(name=name)
+    except Exception as e:
+        logger.warning(f"コンテキストキャッシュの削除に失敗しました: {name} - {e}")
+
+
+def get_cached_content(
+    client,
+    model: str,
+    kind: str,
+    check_group_id: int,
+    instruction: str,
+    checklist_text: str,
+) -> Optional[str]:
+    """
+    チェックグループごとの指示文とチェックリストをコンテキストキャッシュに登録し、
+    キャッシュ名を返します。チェックリストが変更された場合や有効期限が近い場合は
+    キャッシュを作り直します。
+
+    Args:
+        client: genai.Client
+        model (str): 使用するモデル名
+        kind (str): プロンプトの種類（例：'document', 'voice'）
+        check_group_id (int): チェックグループID
+        instruction (str): システム指示文
+        checklist_text (str): チェックリストのテキスト
+
+    Returns:
+        Optional[str]: キャッシュ名（キャッシュを利用できない場合はNone）
+    """
+    if not CONTEXT_CACHE_ENABLED:
+        return None
+
+    key = (kind, check_group_id, model)
+    fingerprint = checklist_fingerprint(instruction, checklist_text)
+
+    # API呼び出しの間はロックを保持せず、同じキーの作成のみを1つのスレッドに限る
+    while True:
+        with _registry_lock:
+            entry = _cache_registry.get(key)
+            if entry and entry["fingerprint"] == fingerprint:
+                if entry["name"] is None:
+                    # 作成に失敗したチェックリスト（トークン数不足など）は一定時間再作成しない
+                    if time.monotonic() < entry["retry_at"]:
+                        return None
+                elif _is_fresh(entry):
+                    return entry["name"]
+            pending = _in_flight.get(key)
+            if pending is None:
+                pending = _in_flight[key] = threading.Event()
+                break
+        # 別のスレッドが作成中のため、完了を待ってから登録を確認し直す
+        if not pending.wait(CONTEXT_CACHE_WAIT_SECONDS):
+            return None
+
+    try:
+        # チェックリストの変更または期限切れのため、古いキャッシュを破棄
+        if entry and entry["name"]:
+            _delete_cache(client, entry["name"])
+
+        try:
+            cache = client.caches.create(
+                model=model,
+                config={
+                    "display_name": f"checklist-{kind}-{check_group_id}",
+                    "system_instruction": instruction,
+                    "contents": [checklist_text],
+                    "ttl": f"{CONTEXT_CACHE_TTL_SECONDS}s",
+                },
+            )
+        except Exception as e:
+            logger.warning(
+                f"コンテキストキャッシュの作成に失敗したため通常のプロンプトで実行します: {e}"
+            )
+            with _registry_lock:
+                _cache_registry[key] = {
+                    "fingerprint": fingerprint,
+                    "name": None,
+                    "expire_time": None,
+                    "retry_at": time.monotonic() + CONTEXT_CACHE_RETRY_SECONDS,
+                }
+            return None
+
+        with _registry_lock:
+            _cache_registry[key] = {
+                "fingerprint": fingerprint,
+                "name": cache.name,
+                "expire_time": cache.expire_time,
+            }
+        logger.info(
+            f"コンテキストキャッシュを作成しました: {cache.name} (グループ: {check_group_id}, 種類: {kind})"
+        )
+        return cache.name
+    finally:
+        with _registry_lock:
+            _in_flight.pop(key, None)
+        pending.set()
+
+
+def invalidate_cached_content(client, kind: str, check_group_id: int) -> None:
+    """指定されたチェックグループのキャッシュを破棄する"""
+    with _registry_lock:
+        entries = [
+            _cache_registry.pop(key)
+            for key in [k for k in _cache_registry if k[0] == kind and k[1] == check_group_id]
+        ]
+    for entry in entries:
+        if entry["name"]:
+            _delete_cache(client, entry["name"])
+
+
+def generate_with_checklist(
+    client,
+    model: str,
+    compiled: Dict[str, Any],
+    request_text: str,
+    config: Dict[str, Any],
+):
+    """
+    チェックリストを含むプロンプトでGemini APIを呼び出します。
+    コンテキストキャッシュが有効な場合は、指示文とチェックリストをキャッシュから参照し、
+    リクエストごとに変わる部分のみを送信します。
+
+    Args:
+        client: genai.Client
+        model (str): 使用するモデル名
+        compiled (Dict[str, Any]): prompt_builderでコンパイルしたプロンプトの固定部分
+        request_text (str): リクエストごとに変わるテキスト（ドキュメントや音声認識結果）
+        config (Dict[str, Any]): generate_contentに渡す設定
+
+    Returns:
+        Gemini APIのレスポンス
+    """
+    # 循環参照を避けるため関数内でインポート
+    from utils.prompt_builder import estimate_input_tokens, generate_content_with_usage
+
+    kind = compiled["kind"]
+    check_group_id = compiled["check_group_id"]
+    label = f"{kind}:{check_group_id}"
+    estimated_tokens = estimate_input_tokens(client, model, compiled, request_text)
+
+    cache_name = None
+    if compiled.get("cacheable"):
+        cache_name = get_cached_content(
+            client,
+            model,
+            kind,
+            check_group_id,
+            compiled["instruction"],
+            compiled["checklist_text"],
+        )
+
+    if cache_name:
+        add_to_span("cache_hits", 1)
+        try:
+            return generate_content_with_usage(
+                client,
+                model,
+                request_text,
+                {**config, "cached_content": cache_name},
+                label,
+                estimated_tokens,
+            )
+        except Exception as e:
+            # キャッシュが削除・失効していた場合は登録を破棄して通常の呼び出しにフォールバック
+            logger.warning(f"コンテキストキャッシュを利用した呼び出しに失敗しました: {e}")
+            add_to_span("retries", 1)
+            with _registry_lock:
+                _cache_registry.pop((kind, check_group_id, model), None)
+
+    prompt = f"""
+    {compiled["instruction"]}
+
+    {request_text}
+
+    {compiled["checklist_text"]}
+    """
+    return generate_content_with_usage(
+        client, model, prompt, config, label, estimated_tokens
+    )
@@ -0,0 +1,82 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+# 空白と記号は照合に使わない
+NON_WORD = re.compile(r"[\s、。，．・「」『』（）()\[\]【】!！?？:：;；,.\-ー]+")
+
+
+def char_bigrams(text: str) -> Counter:
+    """
+    文字bigramの出現回数を数える（日本語は単語区切りがないため文字単位で扱う）
+    1文字だけのテキストは、その文字自体を特徴として扱う
+    """
+    text = NON_WORD.sub("", text.lower())
+    if len(text) == 1:
+        return Counter([text])
+    return Counter(text[i : i + 2] for i in range(len(text) - 1))
+
+
+class LexicalIndex:
+    """
+    文字bigramのTF-IDFによる小さな転置インデックス。
+    チェック項目や質問文など、数百〜数千件程度のテキストから類似するものを探す用途に使う。
+    """
+
+    def __init__(self, documents: Iterable[Tuple[str, str]]):
+        """
+        Args:
+            documents (Iterable[Tuple[str, str]]): (ID, テキスト) のリスト
+        """
+        term_counts = {doc_id: char_bigrams(text) for doc_id, text in documents}
+        self.size = len(term_counts)
+
+        document_frequency = Counter()
+        for counts in term_counts.values():
+            document_frequency.update(counts.keys())
+        self._idf = {
+            term: math.log((1 + self.size) / (1 + frequency)) + 1
+            for term, frequency in document_frequency.items()
+        }
+
+        # bigram -> [(ID, 正規化済みの重み)]
+        self._postings: Dict[str, List[Tuple[str, float]]] = defaultdict(list)
+        for doc_id, counts in term_counts.items():
+            weights = self._weigh(counts)
+            for term, weight in weights.items():
+                self._postings[term].append((doc_id, weight))
+
+    def _weigh(self, counts: Counter) -> Dict[str, float]:
+        """TF-IDFの重みを計算し、長さを1に正規化する"""
+        weights = {
+            term: (1 + math.log(count)) * self._idf[term]
+            for term, count in counts.items()
+            if term in self._idf
+        }
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        if not norm:
+            return {}
+        return {term: weight / norm for term, weight in weights.items()}
+
+    def search(
+        self, text: str, top_k: int = 5, min_score: float = 0.0
+    ) -> List[Tuple[str, float]]:
+        """
+        テキストに類似する文書をコサイン類似度の高い順に返す
+
+        Args:
+            text (str): 検索するテキスト
+            top_k (int): 返す件数の上限
+            min_score (float): この類似度未満の文書は返さない
+
+        Returns:
+            List[Tuple[str, float]]: (ID, 類似度) のリスト
+        """
+        scores: Dict[str, float] = defaultdict(float)
+        for term, weight in self._weigh(char_bigrams(text)).items():
+            for doc_id, doc_weight in self._postings.get(term, ()):
+                scores[doc_id] += weight * doc_weight
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(doc_id, score) for doc_id, score in ranked[:top_k] if score >= min_score]
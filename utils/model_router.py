@@ -0,0 +1,127 @@
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# モデルの階層（高速・標準・高精度）
+MODEL_TIERS = {
+    "fast": os.getenv("GEMINI_MODEL_FAST", "gemini-2.0-flash-lite"),
+    "standard": os.getenv("GEMINI_MODEL_STANDARD", "gemini-2.0-flash"),
+    "strong": os.getenv("GEMINI_MODEL_STRONG", "gemini-2.5-pro"),
+}
+
+# この文字数・項目数以下のジョブは高速モデルで処理する
+FAST_TIER_MAX_CHARS = int(os.getenv("FAST_TIER_MAX_CHARS", "20000"))
+FAST_TIER_MAX_ITEMS = int(os.getenv("FAST_TIER_MAX_ITEMS", "20"))
+
+# 階層ごとの実行統計（閾値の調整用）
+_tier_stats: Dict[str, Dict[str, float]] = {}
+_stats_lock = threading.Lock()
+
+
+def select_tier(document_chars: int, item_count: int) -> str:
+    """
+    ドキュメントの文字数とチェック項目数から、最初に使用するモデルの階層を選択する
+
+    Args:
+        document_chars (int): ドキュメントの文字数
+        item_count (int): チェック項目数
+
+    Returns:
+        str: 'fast' または 'standard'
+    """
+    if document_chars <= FAST_TIER_MAX_CHARS and item_count <= FAST_TIER_MAX_ITEMS:
+        return "fast"
+    return "standard"
+
+
+def validate_check_results(
+    results: List[Any], check_ids: List[str]
+) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Geminiの回答を検証し、採用できる結果と再評価が必要なcheck_idに分ける。
+    回答がない項目、重複した項目、不確かと申告された項目を再評価の対象とする。
+
+    Args:
+        results (List[Any]): check_id, checked, uncertain を持つ結果のリスト
+        check_ids (List[str]): 評価対象のcheck_idのリスト
+
+    Returns:
+        Tuple[Dict[str, Any], List[str]]: (check_idごとの採用結果, 再評価が必要なcheck_id)
+    """
+    expected = set(check_ids)
+    accepted: Dict[str, Any] = {}
+    failed = set()
+
+    for result in results:
+        check_id = str(result.check_id)
+        if check_id not in expected:
+            logger.warning(f"チェックリストにないcheck_idが返されました: {check_id}")
+            continue
+        if check_id in accepted or check_id in failed:
+            # 同じ項目に複数の回答がある場合は判定が揺れているため再評価する
+            accepted.pop(check_id, None)
+            failed.add(check_id)
+            continue
+        if getattr(result, "uncertain", False):
+            failed.add(check_id)
+            continue
+        accepted[check_id] = result
+
+    failed.update(expected - set(accepted) - failed)
+    return accepted, [check_id for check_id in check_ids if check_id in failed]
+
+
+def record_tier_result(
+    tier: str, latency_seconds: float, item_count: int, failed_count: int
+) -> None:
+    """階層ごとのレイテンシと検証通過率を記録する"""
+    with _stats_lock:
+        stats = _tier_stats.setdefault(
+            tier, {"calls": 0, "latency_seconds": 0.0, "items": 0, "failed_items": 0}
+        )
+        stats["calls"] += 1
+        stats["latency_seconds"] += latency_seconds
+        stats["items"] += item_count
+        stats["failed_items"] += failed_count
+
+    logger.info(
+        f"モデル階層 [{tier}] モデル={MODEL_TIERS[tier]} 項目数={item_count} "
+        f"再評価={failed_count} レイテンシ={latency_seconds * 1000:.1f}ms"
+    )
+
+
+def get_tier_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    階層ごとの平均レイテンシと検証通過率を取得する
+
+    Returns:
+        Dict[str, Dict[str, Any]]: 階層ごとの統計
+            {
+                "fast": {
+                    "model": str,
+                    "calls": int,
+                    "avg_latency_ms": float,
+                    "items": int,
+                    "failed_items": int,
+                    "accuracy": float
+                }
+            }
+    """
+    with _stats_lock:
+        return {
+            tier: {
+                "model": MODEL_TIERS[tier],
+                "calls": stats["calls"],
+                "avg_latency_ms": round(stats["latency_seconds"] * 1000 / stats["calls"], 1),
+                "items": stats["items"],
+                "failed_items": stats["failed_items"],
+                "accuracy": (
+                    1 - stats["failed_items"] / stats["items"] if stats["items"] else 1.0
+                ),
+            }
+            for tier, stats in _tier_stats.items()
+            if stats["calls"]
+        }
@@ -0,0 +1,232 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import utils.db_operations as db_operations
+from utils.gemini_cache import checklist_fingerprint
+from utils.tracing import add_to_span
+
+logger = logging.getLogger(__name__)
+
+# 送信前にトークン数を計測するかどうか（count_tokens APIの呼び出しが追加で発生する）
+COUNT_TOKENS_ENABLED = os.getenv("GEMINI_COUNT_TOKENS", "false").lower() == "true"
+
+# 直近の呼び出しのトークン使用量とレイテンシ（このプロセスの起動以降、管理画面で表示する）
+USAGE_HISTORY_SIZE = 1000
+usage_history = deque(maxlen=USAGE_HISTORY_SIZE)
+_usage_lock = threading.Lock()
+
+# (kind, check_group_id) -> コンパイル済みのプロンプト
+_compiled_prompts: Dict[tuple, Dict[str, Any]] = {}
+_compiled_lock = threading.Lock()
+
+CHECKLIST_HEADER = "ID|Lv|項目|説明"
+
+
+def _escape_cell(value: Any) -> str:
+    """表形式のセルとして扱えるように区切り文字と改行を置き換える"""
+    return str(value).replace("|", "／").replace("\r", " ").replace("\n", " ").strip()
+
+
+def encode_checklist(check_items: List[Dict[str, Any]]) -> str:
+    """
+    チェック項目を表形式のコンパクトなテキストに変換します。
+    辞書のreprと比べてキー名や引用符の繰り返しがないため、トークン数を抑えられます。
+
+    Args:
+        check_items (List[Dict[str, Any]]): check_id, name, description, level を含む項目のリスト
+
+    Returns:
+        str: 1行目がヘッダー、2行目以降が1項目1行のテキスト
+    """
+    lines = [CHECKLIST_HEADER]
+    for item in check_items:
+        lines.append(
+            "|".join(
+                _escape_cell(item[key])
+                for key in ("check_id", "level", "name", "description")
+            )
+        )
+    return "\n".join(lines)
+
+
+def collect_check_items(checksheet_data: Dict[str, List[Dict[str, Any]]]) -> list:
+    """カテゴリー別のチェックシートデータからプロンプト用の項目リストを作成する"""
+    check_items = []
+    for category, items in checksheet_data.items():
+        for item in items:
+            check_items.append(
+                {
+                    "check_id": item["check_id"],
+                    "name": item["name"],
+                    "description": item["description"],
+                    "level": item["level"],
+                    "rule": item.get("rule"),
+                }
+            )
+    return check_items
+
+
+def compile_prompt(
+    kind: str,
+    check_group_id: int,
+    instruction: str,
+    check_items: List[Dict[str, Any]],
+    cacheable: bool = False,
+) -> Dict[str, Any]:
+    """
+    指示文とチェック項目からプロンプトの固定部分を組み立てます。
+    一部の項目だけを対象とするプロンプトはコンテキストキャッシュの対象外（cacheable=False）とします。
+
+    Returns:
+        Dict[str, Any]: コンパイル済みのプロンプト
+            {
+                "kind": str,
+                "check_group_id": int,
+                "instruction": str,
+                "checklist_text": str,
+                "check_items": list,
+                "fingerprint": str,
+                "static_tokens": Optional[int],
+                "cacheable": bool
+            }
+    """
+    checklist_text = (
+        f"# チェックリスト（{CHECKLIST_HEADER}の表形式。check_idにはID列の値を使用）:\n"
+        f"{encode_checklist(check_items)}"
+    )
+    return {
+        "kind": kind,
+        "check_group_id": check_group_id,
+        "instruction": instruction,
+        "checklist_text": checklist_text,
+        "check_items": check_items,
+        "fingerprint": checklist_fingerprint(instruction, checklist_text),
+        "static_tokens": None,
+        "cacheable": cacheable,
+    }
+
+
+def compile_group_prompt(kind: str, check_group_id: int, instruction: str) -> Dict[str, Any]:
+    """
+    チェックグループのプロンプトの固定部分を取得します。
+    チェックリストに変更がなければ、前回コンパイルしたもの（計測済みのトークン数を含む）を再利用します。
+
+    Args:
+        kind (str): プロンプトの種類（例：'document', 'voice'）
+        check_group_id (int): チェックグループID
+        instruction (str): システム指示文
+
+    Returns:
+        Dict[str, Any]: コンパイル済みのプロンプト
+    """
+    checksheet_data = db_operations.load_check_items_by_group(check_group_id=check_group_id)
+    compiled = compile_prompt(
+        kind,
+        check_group_id,
+        instruction,
+        collect_check_items(checksheet_data),
+        cacheable=True,
+    )
+
+    with _compiled_lock:
+        cached = _compiled_prompts.get((kind, check_group_id))
+        if cached and cached["fingerprint"] == compiled["fingerprint"]:
+            return cached
+        _compiled_prompts[(kind, check_group_id)] = compiled
+    return compiled
+
+
+def count_tokens(client, model: str, contents: Any) -> Optional[int]:
+    """送信前にプロンプトのトークン数を計測する（失敗した場合はNone）"""
+    try:
+        return client.models.count_tokens(model=model, contents=contents).total_tokens
+    except Exception as e:
+        logger.warning(f"トークン数の計測に失敗しました: {e}")
+        return None
+
+
+def estimate_input_tokens(
+    client, model: str, compiled: Dict[str, Any], request_text: str
+) -> Optional[int]:
+    """
+    固定部分（初回のみ計測）とリクエストごとの部分のトークン数を合計して、入力トークン数を見積もる
+    """
+    if not COUNT_TOKENS_ENABLED:
+        return None
+
+    if compiled["static_tokens"] is None:
+        compiled["static_tokens"] = count_tokens(
+            client, model, [compiled["instruction"], compiled["checklist_text"]]
+        )
+    request_tokens = count_tokens(client, model, request_text)
+    if compiled["static_tokens"] is None or request_tokens is None:
+        return None
+    return compiled["static_tokens"] + request_tokens
+
+
+def record_usage(
+    label: str,
+    model: str,
+    response,
+    latency_seconds: float,
+    estimated_input_tokens: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Gemini APIのレスポンスに含まれるusage_metadataとレイテンシを記録する
+
+    Returns:
+        Dict[str, Any]: 記録した使用量
+    """
+    usage = getattr(response, "usage_metadata", None)
+    record = {
+        "label": label,
+        "model": model,
+        "input_tokens": getattr(usage, "prompt_token_count", None),
+        "cached_tokens": getattr(usage, "cached_content_token_count", None),
+        "output_tokens": getattr(usage, "candidates_token_count", None),
+        "total_tokens": getattr(usage, "total_token_count", None),
+        "estimated_input_tokens": estimated_input_tokens,
+        "latency_ms": round(latency_seconds * 1000, 1),
+        "timestamp": time.time(),
+    }
+    with _usage_lock:
+        usage_history.append(record)
+    add_to_span("tokens", record["total_tokens"])
+    logger.info(
+        f"Gemini使用量 [{label}] モデル={model} 入力={record['input_tokens']} "
+        f"(キャッシュ={record['cached_tokens']}, 見積={estimated_input_tokens}) "
+        f"出力={record['output_tokens']} レイテンシ={record['latency_ms']}ms"
+    )
+    return record
+
+
+def get_usage_history() -> List[Dict[str, Any]]:
+    """
+    直近の呼び出しのトークン使用量とレイテンシを取得する
+
+    Returns:
+        List[Dict[str, Any]]: record_usage で記録した使用量（古い順）
+    """
+    with _usage_lock:
+        return list(usage_history)
+
+
+def generate_content_with_usage(
+    client,
+    model: str,
+    contents: Any,
+    config: Dict[str, Any],
+    label: str,
+    estimated_input_tokens: Optional[int] = None,
+):
+    """Gemini APIを呼び出し、トークン使用量とレイテンシを記録する"""
+    started = time.perf_counter()
+    response = client.models.generate_content(model=model, contents=contents, config=config)
+    record_usage(
+        label, model, response, time.perf_counter() - started, estimated_input_tokens
+    )
+    return response
@@ -0,0 +1,72 @@
+import json
+import os
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+from utils import shared_state
+
+# スナップショットを保持する秒数（更新されたチェックシートは保持期間内でも作り直す）
+RESULT_SNAPSHOT_TTL_SECONDS = int(os.getenv("RESULT_SNAPSHOT_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+
+
+def _storage_key(check_sheet_id: str) -> str:
+    """共有の保存先のキー（チェックシートごとに最新のスナップショットのみを保持する）"""
+    return f"result_snapshot:{check_sheet_id}"
+
+
+def snapshot_key(check_sheet_id: str, version: Dict[str, Any], user_id: str) -> Tuple:
+    """
+    スナップショットのキーを作成する。
+    ステータスやチェック結果が変わると更新日時・件数・チェックサムが変わるため、古いスナップショットは参照されなくなる。
+
+    Args:
+        check_sheet_id (str): チェックシートID
+        version (Dict[str, Any]): db_operations.get_check_sheet_version の戻り値
+        user_id (str): チェック項目の読み込みに使うユーザーID
+
+    Returns:
+        Tuple: スナップショットのキー
+    """
+    return (
+        check_sheet_id,
+        str(version["updated_at"]),
+        version["result_count"],
+        version["check_status"],
+        version["content_hash"],
+        user_id,
+    )
+
+
+def get_snapshot(key: Tuple) -> Optional[Dict[str, Any]]:
+    """
+    表示済みの結果ページのスナップショットを取得する
+
+    Returns:
+        Optional[Dict[str, Any]]: スナップショット（存在しない場合・更新されている場合はNone）
+    """
+    compressed = shared_state.get_bytes(_storage_key(key[0]))
+    if compressed is None:
+        return None
+    stored = json.loads(zlib.decompress(compressed).decode("utf-8"))
+    if stored["key"] != list(key):
+        return None
+    return stored["snapshot"]
+
+
+def put_snapshot(key: Tuple, snapshot: Dict[str, Any]) -> None:
+    """
+    結果ページのスナップショットを圧縮して保存する（同じチェックシートの古いスナップショットは置き換える）
+
+    Args:
+        key (Tuple): snapshot_key で作成したキー
+        snapshot (Dict[str, Any]): 表示する内容
+    """
+    compressed = zlib.compress(
+        json.dumps({"key": list(key), "snapshot": snapshot}, ensure_ascii=False).encode("utf-8")
+    )
+    shared_state.set_bytes(_storage_key(key[0]), compressed, RESULT_SNAPSHOT_TTL_SECONDS)
+
+
+def invalidate_snapshots(check_sheet_id: str) -> None:
+    """チェックシートのスナップショットを破棄する（結果を保存したときに呼び出す）"""
+    shared_state.delete(_storage_key(check_sheet_id))
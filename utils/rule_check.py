@@ -0,0 +1,141 @@
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ルールで判定した結果のコメントに付与する接頭辞
+RULE_REMARKS_PREFIX = "[ルール判定]"
+
+# 文の区切りとみなす文字
+SENTENCE_DELIMITER = re.compile(r"[。．！？!?\n]+")
+
+# コンパイル済みの正規表現（ルールの文字列 -> パターン）
+_pattern_cache: Dict[str, re.Pattern] = {}
+
+
+def parse_rule(rule: Any) -> Optional[Dict[str, Any]]:
+    """
+    check_items.rule の値を辞書に変換する（JSON文字列と辞書のどちらにも対応）
+
+    Returns:
+        Optional[Dict[str, Any]]: ルール（未設定・不正な場合はNone）
+    """
+    if not rule:
+        return None
+    if isinstance(rule, dict):
+        return rule
+    try:
+        parsed = json.loads(rule)
+    except (TypeError, ValueError) as e:
+        logger.warning(f"チェック項目のルールを解析できませんでした: {rule} - {e}")
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+
+def _compile(pattern: str) -> re.Pattern:
+    """正規表現をコンパイルしてキャッシュする"""
+    compiled = _pattern_cache.get(pattern)
+    if compiled is None:
+        compiled = re.compile(pattern, re.MULTILINE)
+        _pattern_cache[pattern] = compiled
+    return compiled
+
+
+def _evaluate_condition(rule: Dict[str, Any], text: str) -> Tuple[bool, str]:
+    """
+    ルールの条件を評価する
+
+    Returns:
+        Tuple[bool, str]: (条件を満たすか, 判定根拠の説明)
+    """
+    rule_type = rule.get("type")
+
+    if rule_type == "regex":
+        match = _compile(rule["pattern"]).search(text)
+        if match:
+            return True, f"「{match.group(0)[:30]}」が見つかりました"
+        return False, "該当する表現が見つかりませんでした"
+
+    if rule_type == "keywords":
+        found = [keyword for keyword in rule["keywords"] if keyword in text]
+        if found:
+            return True, f"キーワード「{'、'.join(found[:5])}」が見つかりました"
+        return False, "キーワードが見つかりませんでした"
+
+    if rule_type == "length":
+        length = len(text)
+        within = rule.get("min", 0) <= length <= rule.get("max", length)
+        return within, f"文書の文字数は{length}文字です"
+
+    if rule_type == "sentence_length":
+        sentences = [s for s in SENTENCE_DELIMITER.split(text) if s.strip()]
+        longest = max((len(s) for s in sentences), default=0)
+        return longest <= rule["max"], f"最も長い文は{longest}文字です"
+
+    raise ValueError(f"未対応のルール種別です: {rule_type}")
+
+
+def evaluate_rule(rule: Dict[str, Any], text: str) -> Optional[Dict[str, Any]]:
+    """
+    ルールをテキストに対して評価します。
+
+    ルールの形式:
+        {
+            "type": "regex" | "keywords" | "length" | "sentence_length",
+            "pattern": str,          # regex
+            "keywords": List[str],   # keywords
+            "min": int, "max": int,  # length, sentence_length
+            "when_true": bool | None,   # 条件を満たした場合のchecked（Noneは判定しない）
+            "when_false": bool | None,  # 条件を満たさない場合のchecked（Noneは判定しない）
+            "remarks": str           # 判定時のコメント（任意）
+        }
+
+    Returns:
+        Optional[Dict[str, Any]]: 確定した場合は {"checked": bool, "remarks": str}、
+            ルールで判定できない場合はNone
+    """
+    try:
+        condition, reason = _evaluate_condition(rule, text)
+    except Exception as e:
+        logger.warning(f"ルールの評価中にエラーが発生しました: {rule} - {e}")
+        return None
+
+    checked = rule.get("when_true") if condition else rule.get("when_false")
+    if checked is None:
+        return None
+
+    remarks = f"{RULE_REMARKS_PREFIX} {reason}"
+    if rule.get("remarks") and not checked:
+        remarks += f" {rule['remarks']}"
+    return {"checked": bool(checked), "remarks": remarks}
+
+
+def apply_rules(
+    check_items: List[Dict[str, Any]], text: str
+) -> Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    ルールが設定されたチェック項目をローカルで判定し、LLMに送る項目と分けます。
+
+    Args:
+        check_items (List[Dict[str, Any]]): rule を含むチェック項目のリスト
+        text (str): 判定対象のテキスト（OCR結果）
+
+    Returns:
+        Tuple[Dict[str, Dict[str, Any]], List[Dict[str, Any]]]:
+            (check_idごとのルール判定結果, LLMでの評価が必要な項目)
+    """
+    decided = {}
+    remaining = []
+    for item in check_items:
+        rule = parse_rule(item.get("rule"))
+        result = evaluate_rule(rule, text) if rule else None
+        if result is None:
+            remaining.append(item)
+        else:
+            decided[item["check_id"]] = result
+
+    if decided:
+        logger.info(f"ルールで判定したチェック項目: {len(decided)}/{len(check_items)}件")
+    return decided, remaining
@@ -0,0 +1,328 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 複数のインスタンスで共有する保存先（例: redis://localhost:6379/0）。未設定の場合はプロセス内のメモリに保持する
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL")
+# キーの接頭辞（同じRedisを複数の環境で使う場合に分ける）
+SHARED_STATE_PREFIX = os.getenv("SHARED_STATE_PREFIX", "scs:")
+# メモリに保持する場合の最大件数（古く参照されていないものから破棄する）
+SHARED_STATE_MAX_ENTRIES = int(os.getenv("SHARED_STATE_MAX_ENTRIES", "1024"))
+# 共有の保存先への操作がこの回数続けて失敗した場合は、メモリに保持するよう切り替える
+SHARED_STATE_MAX_FAILURES = int(os.getenv("SHARED_STATE_MAX_FAILURES", "3"))
+# メモリに切り替えてから、共有の保存先への再接続を試みるまでの秒数
+SHARED_STATE_RETRY_SECONDS = float(os.getenv("SHARED_STATE_RETRY_SECONDS", "60"))
+
+# 画面遷移の状態を保持する秒数
+NAVIGATION_TTL_SECONDS = 24 * 60 * 60
+# インスタンスが入れ替わっても引き継ぐセッションの値
+NAVIGATION_KEYS = ("timestamp", "check_group_id")
+# 画面遷移の状態をブラウザのタブごとに分ける識別子のクエリパラメータ名
+NAVIGATION_SESSION_PARAM = "sid"
+# ジョブの状況を保持する秒数
+JOB_STATUS_TTL_SECONDS = 24 * 60 * 60
+# この秒数を超えて実行中のままのジョブは、インスタンスの停止などで中断したものとみなす
+JOB_RUNNING_TIMEOUT_SECONDS = 10 * 60
+
+
+class InMemoryBackend:
+    """プロセス内のメモリに保持する保存先（インスタンスが1つの場合・ローカル開発用）"""
+
+    def __init__(self, max_entries: int = SHARED_STATE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        # キー -> (有効期限, 値)
+        self._entries: "OrderedDict[str, Tuple[Optional[float], bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def set_if_absent(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        # 確認と保存を同じロックの中で行い、同時に呼び出されても1つだけが保存できるようにする
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or time.monotonic() < entry[0]):
+                return False
+            self._entries[key] = (time.monotonic() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisBackend:
+    """Redis互換のサーバー（Memorystore・ローカルのRedis/Valkeyなど）に保持する保存先"""
+
+    def __init__(self, url: str):
+        import redis  # Redisを使う場合のみ必要
+
+        self._client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        # 接続は最初のコマンドまで行われないため、ここで接続できることを確認する
+        self._client.ping()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        self._client.set(key, value, ex=int(ttl) if ttl else None)
+
+    def set_if_absent(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        return bool(self._client.set(key, value, ex=int(ttl) if ttl else None, nx=True))
+
+    def delete(self, key: str) -> None:
+        self._client.delete(key)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+# 続けて失敗した回数と、メモリに切り替えた場合に再接続を試みる時刻
+_failures = 0
+_retry_at: Optional[float] = None
+
+
+def get_backend():
+    """
+    共有の保存先を取得する。
+    Redisに接続できない場合・操作が続けて失敗した場合はメモリに保持し、一定時間後に再接続を試みる
+    """
+    global _backend, _failures, _retry_at
+    with _backend_lock:
+        if _backend is not None and not (_retry_at is not None and time.monotonic() >= _retry_at):
+            return _backend
+        _retry_at = None
+        if SHARED_STATE_URL:
+            try:
+                _backend = RedisBackend(SHARED_STATE_URL)
+                _failures = 0
+                return _backend
+            except Exception as e:
+                logger.warning(f"共有の保存先に接続できないため、メモリに保持します: {e}")
+                _retry_at = time.monotonic() + SHARED_STATE_RETRY_SECONDS
+        if not isinstance(_backend, InMemoryBackend):
+            _backend = InMemoryBackend()
+        return _backend
+
+
+def _record_result(backend, error: Optional[Exception]) -> None:
+    """操作の成否を記録し、共有の保存先への操作が続けて失敗した場合はメモリに切り替える"""
+    global _backend, _failures, _retry_at
+    with _backend_lock:
+        if backend is not _backend:
+            return
+        if error is None:
+            _failures = 0
+            return
+        _failures += 1
+        if _failures >= SHARED_STATE_MAX_FAILURES and not isinstance(_backend, InMemoryBackend):
+            logger.warning(
+                f"共有の保存先への操作が{_failures}回続けて失敗したため、"
+                f"{SHARED_STATE_RETRY_SECONDS:g}秒間メモリに保持します"
+            )
+            _backend = InMemoryBackend()
+            _failures = 0
+            _retry_at = time.monotonic() + SHARED_STATE_RETRY_SECONDS
+
+
+def _call(method: str, key: str, *args: Any) -> Any:
+    """共有の保存先の操作を呼び出し、成否を記録する（失敗した場合は例外を送出する）"""
+    backend = get_backend()
+    try:
+        result = getattr(backend, method)(SHARED_STATE_PREFIX + key, *args)
+    except Exception as e:
+        _record_result(backend, e)
+        raise
+    _record_result(backend, None)
+    return result
+
+
+def get_bytes(key: str) -> Optional[bytes]:
+    """
+    共有の保存先から値を取得する（取得できない場合はキャッシュがない場合と同様にNoneを返す）
+
+    Args:
+        key (str): キー
+
+    Returns:
+        Optional[bytes]: 値
+    """
+    try:
+        return _call("get", key)
+    except Exception as e:
+        logger.warning(f"共有の保存先からの取得中にエラーが発生しました: {key} - {e}")
+        return None
+
+
+def set_bytes(key: str, value: bytes, ttl: Optional[float] = None) -> None:
+    """
+    共有の保存先に値を保存する（保存に失敗しても処理は続ける）
+
+    Args:
+        key (str): キー
+        value (bytes): 値
+        ttl (Optional[float]): 保持する秒数（Noneの場合は破棄されるまで保持する）
+    """
+    try:
+        _call("set", key, value, ttl)
+    except Exception as e:
+        logger.warning(f"共有の保存先への保存中にエラーが発生しました: {key} - {e}")
+
+
+def set_if_absent(key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+    """
+    共有の保存先に値が存在しない場合のみ保存する（複数のインスタンスから同時に呼び出されても1つだけが保存できる）
+
+    Args:
+        key (str): キー
+        value (bytes): 値
+        ttl (Optional[float]): 保持する秒数（Noneの場合は破棄されるまで保持する）
+
+    Returns:
+        bool: 保存した場合はTrue（保存先を利用できない場合も処理を止めないようTrueを返す）
+    """
+    try:
+        return _call("set_if_absent", key, value, ttl)
+    except Exception as e:
+        logger.warning(f"共有の保存先への保存中にエラーが発生しました: {key} - {e}")
+        return True
+
+
+def delete(key: str) -> None:
+    """共有の保存先から値を削除する"""
+    try:
+        _call("delete", key)
+    except Exception as e:
+        logger.warning(f"共有の保存先からの削除中にエラーが発生しました: {key} - {e}")
+
+
+def get_json(key: str) -> Any:
+    """共有の保存先からJSONの値を取得する"""
+    value = get_bytes(key)
+    return json.loads(value) if value is not None else None
+
+
+def set_json(key: str, value: Any, ttl: Optional[float] = None) -> None:
+    """共有の保存先にJSONの値を保存する"""
+    set_bytes(key, json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"), ttl)
+
+
+def navigation_session_id(session_state, query_params) -> str:
+    """
+    画面遷移の状態を分ける識別子を取得する。
+    セッションとURLのクエリパラメータの両方に保持するため、別のインスタンスに接続し直しても同じ識別子になり、
+    同じユーザーが複数のタブで別のチェックシートを開いても互いの状態を上書きしない。
+
+    Args:
+        session_state: st.session_state
+        query_params: st.query_params
+
+    Returns:
+        str: 識別子
+    """
+    session_id = (
+        session_state.get("navigation_session_id")
+        or query_params.get(NAVIGATION_SESSION_PARAM)
+        or uuid.uuid4().hex
+    )
+    session_state["navigation_session_id"] = session_id
+    if query_params.get(NAVIGATION_SESSION_PARAM) != session_id:
+        query_params[NAVIGATION_SESSION_PARAM] = session_id
+    return session_id
+
+
+def sync_navigation_state(user_id: str, session_state, query_params) -> None:
+    """
+    画面遷移の状態（表示中のチェックシート・チェックグループ）をブラウザのタブごとに共有の保存先と同期する。
+    別のインスタンスに接続し直してセッションが空になった場合は、保存した状態を復元する。
+
+    Args:
+        user_id (str): ユーザーID
+        session_state: st.session_state
+        query_params: st.query_params（タブの識別子を保持する）
+    """
+    key = f"navigation:{user_id}:{navigation_session_id(session_state, query_params)}"
+    saved = get_json(key) or {}
+    for name in NAVIGATION_KEYS:
+        if name not in session_state and saved.get(name) is not None:
+            session_state[name] = saved[name]
+
+    current = {name: session_state.get(name) for name in NAVIGATION_KEYS}
+    if current != {name: saved.get(name) for name in NAVIGATION_KEYS}:
+        set_json(key, current, NAVIGATION_TTL_SECONDS)
+
+
+def get_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    ジョブの状況を取得する
+
+    Returns:
+        Optional[Dict[str, Any]]: {"status": str, "updated_at": float, ...}
+            存在しない場合・中断したとみなす場合はNone
+    """
+    job = get_json(f"job:{job_id}")
+    if (
+        job
+        and job["status"] == "running"
+        and time.time() - job["updated_at"] >= JOB_RUNNING_TIMEOUT_SECONDS
+    ):
+        return None
+    return job
+
+
+def claim_job(job_id: str) -> bool:
+    """
+    ジョブを実行中として登録する。
+    同じジョブが実行中の場合は登録しない（確認と登録を1回の操作で行うため、同時に呼び出されても1つだけが登録できる）
+
+    Returns:
+        bool: 登録できた場合はTrue
+    """
+    claimed = set_if_absent(f"job_lock:{job_id}", b"1", JOB_RUNNING_TIMEOUT_SECONDS)
+    if claimed:
+        set_job_status(job_id, "running")
+    return claimed
+
+
+def set_job_status(job_id: str, status: str, **details: Any) -> None:
+    """
+    ジョブの状況を保存する（実行中以外の状況にした場合は、同じジョブを再び実行できるようにする）
+
+    Args:
+        job_id (str): ジョブID
+        status (str): 状況（'running', 'done', 'error'）
+        **details: 結果のIDやエラー内容など
+    """
+    set_json(
+        f"job:{job_id}",
+        {"status": status, "updated_at": time.time(), **details},
+        JOB_STATUS_TTL_SECONDS,
+    )
+    if status != "running":
+        delete(f"job_lock:{job_id}")
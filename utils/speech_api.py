@@ -0,0 +1,202 @@
+import base64
+import contextvars
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.audio_buffer import PcmBuffer
+from utils.audio_encoding import encode_audio
+from utils.audio_preprocess import TARGET_SAMPLE_RATE, audio_segment_to_pcm, preprocess_pcm
+from utils.tracing import span
+from utils.vad import apply_vad, find_split_points
+
+logger = logging.getLogger(__name__)
+
+LANGUAGE = "ja-JP"  # 音声認識に使用する言語
+
+# Speech-to-Text APIのエンドポイント（ローカルの疑似サーバーで試験する場合は上書きする）
+DEFAULT_SPEECH_API_ENDPOINT = "https://speech.googleapis.com/v1/speech:recognize"
+SPEECH_API_ENDPOINT = os.getenv("SPEECH_API_ENDPOINT", DEFAULT_SPEECH_API_ENDPOINT)
+SPEECH_API_TIMEOUT_SECONDS = float(os.getenv("SPEECH_API_TIMEOUT_SECONDS", "60"))
+
+# 同期認識（speech:recognize）の上限（約1分）を超える音声は無音の位置で分割して並列に認識する
+SPEECH_CHUNK_SECONDS = float(os.getenv("SPEECH_CHUNK_SECONDS", "50"))
+SPEECH_CHUNK_MAX_SECONDS = float(os.getenv("SPEECH_CHUNK_MAX_SECONDS", "55"))
+SPEECH_MAX_PARALLEL = int(os.getenv("SPEECH_MAX_PARALLEL", "8"))
+# 同期認識で受け付けられる音声の最大の秒数
+SPEECH_SYNC_LIMIT_SECONDS = 60
+
+if SPEECH_CHUNK_MAX_SECONDS > SPEECH_SYNC_LIMIT_SECONDS:
+    logger.warning(
+        f"SPEECH_CHUNK_MAX_SECONDS ({SPEECH_CHUNK_MAX_SECONDS:g}) が同期認識の上限を超えるため、"
+        f"{SPEECH_SYNC_LIMIT_SECONDS}秒で分割します"
+    )
+    SPEECH_CHUNK_MAX_SECONDS = float(SPEECH_SYNC_LIMIT_SECONDS)
+if SPEECH_CHUNK_SECONDS > SPEECH_CHUNK_MAX_SECONDS:
+    # 目安が最大を超えると分割位置の探索範囲がなくなり、分割されずに上限を超えるため最大に合わせる
+    logger.warning(
+        f"SPEECH_CHUNK_SECONDS ({SPEECH_CHUNK_SECONDS:g}) が SPEECH_CHUNK_MAX_SECONDS "
+        f"({SPEECH_CHUNK_MAX_SECONDS:g}) を超えるため、{SPEECH_CHUNK_MAX_SECONDS:g}秒を目安に分割します"
+    )
+    SPEECH_CHUNK_SECONDS = SPEECH_CHUNK_MAX_SECONDS
+
+# 接続を再利用するためのHTTPセッション（スレッド間で共有する）
+_session = None
+_session_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    """接続プールを持つHTTPセッションを取得する"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=max(SPEECH_MAX_PARALLEL, 1)
+            )
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def warm_session() -> None:
+    """HTTPセッションを作成しておく（起動時のウォームアップ用）"""
+    _get_session()
+
+
+def audio_to_linear16(audio) -> Tuple[np.ndarray, int]:
+    """
+    録音した音声をSpeech-to-Text APIに送信できる16bitモノラルPCMに変換する
+
+    Args:
+        audio: PcmBuffer または pydubのAudioSegmentオブジェクト
+
+    Returns:
+        Tuple[np.ndarray, int]: (int16のPCMデータ, サンプリングレート)
+    """
+    if isinstance(audio, PcmBuffer):
+        # 一時ファイルに書き出した録音はメモリマップのままチャンク単位で読み込む
+        samples, sample_rate, sample_width = (
+            audio.to_array(),
+            audio.sample_rate,
+            audio.sample_width,
+        )
+    else:
+        samples, sample_width = audio_segment_to_pcm(audio)
+        sample_rate = audio.frame_rate
+
+    with span("preprocess", bytes=samples.nbytes):
+        audio_array = preprocess_pcm(samples, sample_rate, sample_width)
+
+    # デバッグ情報をログに出力
+    logger.info(
+        f"音声データ情報: 長さ={len(audio_array)}, サンプリングレート={TARGET_SAMPLE_RATE}, "
+        f"元のサンプリングレート={sample_rate}, チャンネル数={samples.shape[1]}"
+    )
+    return audio_array, TARGET_SAMPLE_RATE
+
+
+def recognize_linear16(audio_array: np.ndarray, sample_rate: int) -> str:
+    """
+    16bitモノラルPCMをSpeech-to-Text APIで文字起こしします。
+    同期認識の上限を超える長さの音声は無音の位置で分割し、並列に認識して順番に結合します。
+
+    Args:
+        audio_array (np.ndarray): int16のPCMデータ
+        sample_rate (int): サンプリングレート
+
+    Returns:
+        str: 認識されたテキスト（認識結果がない場合は空文字列）
+    """
+    # 前後の無音と長い無音を除去して送信量を減らす
+    audio_array = apply_vad(audio_array, sample_rate)
+    if len(audio_array) == 0:
+        return ""
+
+    if len(audio_array) <= SPEECH_CHUNK_MAX_SECONDS * sample_rate:
+        return _recognize_chunk(audio_array, sample_rate)
+
+    split_points = find_split_points(
+        audio_array, sample_rate, SPEECH_CHUNK_SECONDS, SPEECH_CHUNK_MAX_SECONDS
+    )
+    chunks = np.split(audio_array, split_points)
+    logger.info(
+        f"音声を{len(chunks)}区間に分割して認識します: "
+        f"{[round(len(chunk) / sample_rate, 1) for chunk in chunks]}秒"
+    )
+
+    with ThreadPoolExecutor(
+        max_workers=min(SPEECH_MAX_PARALLEL, len(chunks)),
+        thread_name_prefix="speech-chunk",
+    ) as executor:
+        # 各スレッドのスパンが呼び出し元のトレースに記録されるよう、コンテキストを引き継ぐ
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run, _recognize_chunk, chunk, sample_rate
+            )
+            for chunk in chunks
+        ]
+        texts = [future.result() for future in futures]
+    return " ".join(text for text in texts if text)
+
+
+def _recognize_chunk(audio_array: np.ndarray, sample_rate: int) -> str:
+    """同期認識の上限以内の音声を1回のリクエストで文字起こしする"""
+    # 音声データを圧縮してbase64エンコード
+    audio_bytes, encoding = encode_audio(audio_array, sample_rate)
+    audio_base64 = base64.b64encode(audio_bytes).decode("utf-8")
+
+    # Google Cloud APIキーを取得（ローカルの疑似サーバーではキーは不要）
+    api_key = os.getenv("GOOGLE_CLOUD_API_KEY")
+    if not api_key and SPEECH_API_ENDPOINT == DEFAULT_SPEECH_API_ENDPOINT:
+        raise Exception("GOOGLE_CLOUD_API_KEY環境変数が設定されていません")
+
+    # リクエストボディの作成
+    request_body = {
+        "config": {
+            "encoding": encoding,
+            "sampleRateHertz": sample_rate,
+            "languageCode": LANGUAGE,
+            "enableAutomaticPunctuation": True,
+            "model": "default",
+        },
+        "audio": {"content": audio_base64},
+    }
+
+    # APIリクエストの送信
+    headers = {"Content-Type": "application/json"}
+
+    with span("speech_api", bytes=len(audio_base64)):
+        response = _get_session().post(
+            SPEECH_API_ENDPOINT,
+            params={"key": api_key} if api_key else None,
+            headers=headers,
+            json=request_body,
+            timeout=SPEECH_API_TIMEOUT_SECONDS,
+        )
+
+    if response.status_code != 200:
+        logger.error(
+            f"Google Speech-to-Text Web API エラー: {response.status_code} - {response.text}"
+        )
+        raise Exception(f"Google Speech-to-Text Web API エラー: {response.status_code}")
+
+    # 認識結果を取得
+    result = response.json()
+    if not result.get("results"):
+        logger.warning("音声認識結果が空でした")
+        return ""
+
+    full_text = " ".join(
+        res["alternatives"][0]["transcript"]
+        for res in result["results"]
+        if res.get("alternatives")
+    )
+    logger.info(f"認識結果: {full_text.strip()}")
+    return full_text.strip()
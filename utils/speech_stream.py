@@ -0,0 +1,141 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+
+from utils.audio_buffer import PcmBuffer
+from utils.speech_api import audio_to_linear16, recognize_linear16
+from utils.vad import find_last_pause
+
+logger = logging.getLogger(__name__)
+
+# 録音中に音声を認識する（true で有効化）
+STREAMING_TRANSCRIPTION = (
+    os.getenv("STREAMING_TRANSCRIPTION", "false").lower() == "true"
+)
+# 録音中にこの秒数分の音声が溜まった後、最後の無音の位置で区切って認識を依頼する
+STREAMING_CHUNK_SECONDS = float(os.getenv("STREAMING_CHUNK_SECONDS", "5"))
+# 無音が見つからないまま溜まった音声がこの秒数に達した場合は、その位置で区切る
+STREAMING_MAX_CHUNK_SECONDS = float(os.getenv("STREAMING_MAX_CHUNK_SECONDS", "15"))
+# 同時に実行する認識リクエストの数
+STREAMING_MAX_WORKERS = 2
+
+
+class StreamingTranscriber:
+    """
+    録音中に一定の長さの音声が溜まるごとにバックグラウンドで文字起こしを行う。
+    単語の途中で区切ると前後の区間で認識を誤るため、一定の長さを超えた後の最後の無音の位置で区切る。
+    録音停止時には最後の短い区間のみを認識すればよいため、停止から結果が出るまでが短くなる。
+    Web APIの speech:recognize には双方向ストリーミングがないため、短い区間ごとの同期認識で代用する。
+    """
+
+    def __init__(
+        self,
+        chunk_seconds: float = STREAMING_CHUNK_SECONDS,
+        max_chunk_seconds: float = STREAMING_MAX_CHUNK_SECONDS,
+    ):
+        self.chunk_seconds = chunk_seconds
+        self.max_chunk_seconds = max(max_chunk_seconds, chunk_seconds)
+        self._pending = PcmBuffer()
+        self._futures: List = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=STREAMING_MAX_WORKERS, thread_name_prefix="speech-stream"
+        )
+
+    def __len__(self) -> int:
+        """認識を依頼した区間と未送信の音声の合計（区間数 + 未送信のミリ秒）"""
+        return len(self._futures) + len(self._pending)
+
+    def append_frame(self, audio_frame) -> None:
+        """
+        音声フレームを追加し、一定の長さに達した後の無音の位置で区切って認識を依頼する
+
+        Args:
+            audio_frame: av.AudioFrame
+        """
+        self._pending.append_frame(audio_frame)
+        if len(self._pending) >= self.chunk_seconds * 1000:
+            self._submit_until_pause()
+
+    def _submit_until_pause(self) -> None:
+        """未送信の音声のうち最後の無音までの認識を開始し、以降の音声は次の区間に残す"""
+        samples = self._pending.to_array()
+        sample_rate = self._pending.sample_rate
+        cut = None
+        if samples.dtype == np.int16:
+            mono = samples[:, 0] if samples.shape[1] == 1 else samples.mean(axis=1).astype(np.int16)
+            cut = find_last_pause(mono, sample_rate, self.chunk_seconds / 2)
+        if cut is None:
+            if len(self._pending) < self.max_chunk_seconds * 1000:
+                # 話し続けている間は無音まで待つ
+                return
+            cut = len(samples)
+
+        remainder = samples[cut:].copy()
+        self._submit(samples[:cut].copy(), sample_rate)
+        self._pending.clear()
+        self._pending.append(remainder, sample_rate)
+
+    def _submit_pending(self) -> None:
+        """未送信の音声すべての認識をバックグラウンドで開始する"""
+        if not len(self._pending):
+            return
+        self._submit(self._pending.to_array().copy(), self._pending.sample_rate)
+        self._pending.clear()
+
+    def _submit(self, samples: np.ndarray, sample_rate: int) -> None:
+        """区間の音声の認識をバックグラウンドで開始する（結果は依頼した順に結合する）"""
+        chunk = PcmBuffer()
+        chunk.append(samples, sample_rate)
+        with self._lock:
+            self._futures.append(self._executor.submit(self._recognize, chunk))
+
+    @staticmethod
+    def _recognize(audio) -> str:
+        audio_array, sample_rate = audio_to_linear16(audio)
+        return recognize_linear16(audio_array, sample_rate)
+
+    def interim_text(self) -> str:
+        """認識が完了した区間までのテキストを取得する（録音中の表示用）"""
+        texts = []
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            if not future.done():
+                break
+            if future.exception() is None:
+                texts.append(future.result())
+        return " ".join(text for text in texts if text)
+
+    def finish(self) -> str:
+        """
+        残りの音声を認識し、全区間のテキストを順番に結合して返す
+
+        Returns:
+            str: 認識されたテキスト
+        """
+        self._submit_pending()
+        texts = []
+        with self._lock:
+            futures = list(self._futures)
+            self._futures = []
+        for future in futures:
+            try:
+                texts.append(future.result())
+            except Exception as e:
+                # 一部の区間の失敗で全体を失わないよう、その区間だけを欠落させる
+                logger.error(f"音声区間の認識中にエラーが発生しました: {e}")
+        return " ".join(text for text in texts if text)
+
+    def close(self) -> None:
+        """未完了の認識を破棄してスレッドを終了する"""
+        with self._lock:
+            for future in self._futures:
+                future.cancel()
+            self._futures = []
+        self._pending.clear()
+        self._executor.shutdown(wait=False)
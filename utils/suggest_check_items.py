@@ -1,6 +1,5 @@
 from typing import Dict, List, Union
 
-from google import genai
 from pydantic import BaseModel
 import os
 
@@ -27,7 +26,9 @@ def suggest_check_items(
     Returns:
         Dict[str, Any]: 提案されたチェック項目のリストを含む辞書
     """
-    # Gemini APIのクライアントを初期化
+    # Gemini APIのクライアントを初期化（SDKは初めて使うときに読み込む）
+    from google import genai
+
     client = genai.Client(
         vertexai=True,
         project=os.getenv("GOOGLE_CLOUD_PROJECT"),
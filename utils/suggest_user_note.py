@@ -1,7 +1,6 @@
 from typing import Dict, List, Union
 import os
 
-from google import genai
 from pydantic import BaseModel
 
 import utils.db_operations as db_operations
@@ -22,7 +21,9 @@ def suggest_check_note(review_results: Dict, user_id: str) -> List[SuggestedNote
     Returns:
         List[SuggestedNote]: 提案されたチェック項目のリスト
     """
-    # Gemini APIのクライアントを初期化
+    # Gemini APIのクライアントを初期化（SDKは初めて使うときに読み込む）
+    from google import genai
+
     client = genai.Client(
         vertexai=True,
         project=os.getenv("GOOGLE_CLOUD_PROJECT"),
@@ -0,0 +1,102 @@
+import contextvars
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+import utils.db_operations as db_operations
+
+logger = logging.getLogger(__name__)
+
+# 実行中のトレース（パイプライン1回分）とスパン（ステージ1つ分）
+_current_trace: contextvars.ContextVar = contextvars.ContextVar(
+    "pipeline_trace", default=None
+)
+_current_span: contextvars.ContextVar = contextvars.ContextVar(
+    "pipeline_span", default=None
+)
+
+# スパンに記録できる数値属性
+SPAN_COUNTERS = ("bytes", "tokens", "retries", "cache_hits")
+
+
+@contextmanager
+def trace(pipeline: str):
+    """
+    パイプライン1回分のトレースを開始し、終了時に記録したスパンをまとめて保存します。
+    既にトレース中の場合は外側のトレースにスパンを追加します。
+
+    Args:
+        pipeline (str): パイプライン名（例：'pdf_auto_check', 'voice_fill', 'transcription'）
+    """
+    if _current_trace.get() is not None:
+        yield _current_trace.get()
+        return
+
+    current = {"trace_id": uuid.uuid4().hex, "pipeline": pipeline, "spans": []}
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+        _save_spans(current["spans"])
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    """
+    ステージ1つ分の処理時間と属性（バイト数、トークン数、リトライ回数、キャッシュヒット数）を記録します。
+
+    Args:
+        stage (str): ステージ名（例：'ocr', 'llm', 'save'）
+        **attributes: 初期値として設定する属性
+    """
+    current_trace = _current_trace.get()
+    record = {
+        "trace_id": current_trace["trace_id"] if current_trace else None,
+        "pipeline": current_trace["pipeline"] if current_trace else None,
+        "stage": stage,
+        "started_at": datetime.now(),
+        "duration_ms": 0.0,
+        "status": "ok",
+        **{counter: 0 for counter in SPAN_COUNTERS},
+    }
+    record.update(attributes)
+
+    token = _current_span.set(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception:
+        record["status"] = "error"
+        raise
+    finally:
+        record["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        _current_span.reset(token)
+        logger.info(
+            f"スパン [{record['pipeline']}/{stage}] {record['duration_ms']}ms "
+            + " ".join(f"{counter}={record[counter]}" for counter in SPAN_COUNTERS)
+        )
+        if current_trace is not None:
+            current_trace["spans"].append(record)
+
+
+def add_to_span(counter: str, amount: Optional[int]) -> None:
+    """実行中のスパンの数値属性に加算する（スパン外で呼ばれた場合は何もしない）"""
+    record = _current_span.get()
+    if record is None or not amount:
+        return
+    record[counter] = record.get(counter, 0) + amount
+
+
+def _save_spans(spans: list) -> None:
+    """スパンをデータベースに保存する（失敗してもパイプラインは止めない）"""
+    if not spans:
+        return
+    try:
+        db_operations.save_pipeline_spans(spans)
+    except Exception as e:
+        logger.warning(f"パイプラインのスパンの保存に失敗しました: {e}")
+
@@ -0,0 +1,256 @@
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# 文字起こしの前に無音を除去する（false で無効化）
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() == "true"
+
+# 判定の単位とするフレームの長さ（ミリ秒）
+FRAME_MS = 30
+# 雑音の大きさ（フレームのエネルギーの下位10%）をこのdB以上上回るフレームを音声とみなす
+ENERGY_MARGIN_DB = float(os.getenv("VAD_ENERGY_MARGIN_DB", "10"))
+# 雑音がほとんどない録音でも、これより小さいフレームは無音とみなす（dBFS）
+MIN_SPEECH_DBFS = -50.0
+# 雑音の大きさの上限（dBFS）。話し続けている録音では下位10%も発話になるため、これを超える場合は上限で判定する
+NOISE_FLOOR_MAX_DBFS = float(os.getenv("VAD_NOISE_FLOOR_MAX_DBFS", "-35"))
+# 音声と判定したフレームの割合がこれ未満で、最大のエネルギーが MIN_SPEECH_DBFS を
+# ENERGY_MARGIN_DB 以上上回る場合は判定の誤りとみなし、無音を除去せずに返す
+MIN_SPEECH_RATIO = float(os.getenv("VAD_MIN_SPEECH_RATIO", "0.05"))
+# 無声子音（さ行など）はエネルギーが小さく零交差率が高いため、閾値を下げて判定する
+UNVOICED_MARGIN_DB = 6.0
+UNVOICED_MIN_ZCR = 0.25
+# 音声の前後に残す長さ（ミリ秒）。語頭・語尾の切れを防ぐ
+PADDING_MS = 200
+# この長さを超える無音は KEPT_PAUSE_MS に短縮する（ミリ秒）
+MAX_PAUSE_MS = int(os.getenv("VAD_MAX_PAUSE_MS", "1000"))
+KEPT_PAUSE_MS = 400
+
+
+def frame_features(
+    audio_array: np.ndarray, sample_rate: int, frame_ms: int = FRAME_MS
+) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    フレームごとのエネルギー（dBFS）と零交差率を計算する
+
+    Args:
+        audio_array (np.ndarray): int16のモノラルPCMデータ
+        sample_rate (int): サンプリングレート
+        frame_ms (int): フレームの長さ（ミリ秒）
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, int]: (エネルギー, 零交差率, フレームのサンプル数)
+    """
+    frame_length = max(int(sample_rate * frame_ms / 1000), 1)
+    frame_count = len(audio_array) // frame_length
+    frames = audio_array[: frame_count * frame_length].reshape(frame_count, frame_length)
+
+    # 全体をfloatに変換するとメモリが倍になるため、フレームごとの二乗平均だけを求める
+    power = np.einsum("ij,ij->i", frames, frames, dtype=np.float64) / frame_length
+    energy = 10 * np.log10(power / (32768.0**2) + 1e-10)
+
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame_length
+    return energy, zcr, frame_length
+
+
+def speech_threshold(energy: np.ndarray) -> float:
+    """フレームのエネルギーから、音声とみなすエネルギーの閾値（dBFS）を求める"""
+    noise_floor = min(np.percentile(energy, 10), NOISE_FLOOR_MAX_DBFS)
+    return max(noise_floor + ENERGY_MARGIN_DB, MIN_SPEECH_DBFS)
+
+
+def detect_speech(energy: np.ndarray, zcr: np.ndarray) -> np.ndarray:
+    """
+    フレームごとのエネルギーと零交差率から音声区間を判定する
+
+    Returns:
+        np.ndarray: フレームごとの音声判定（bool）
+    """
+    if len(energy) == 0:
+        return np.zeros(0, dtype=bool)
+
+    threshold = speech_threshold(energy)
+    voiced = energy > threshold
+    unvoiced = (energy > threshold - UNVOICED_MARGIN_DB) & (zcr > UNVOICED_MIN_ZCR)
+    speech = voiced | unvoiced
+
+    # 音声の前後を少し残す（判定の周囲をPADDING_MS分だけ広げる）
+    padding = PADDING_MS // FRAME_MS
+    if padding and speech.any():
+        kernel = np.ones(2 * padding + 1, dtype=np.int32)
+        speech = np.convolve(speech.astype(np.int32), kernel, mode="same") > 0
+    return speech
+
+
+def _collapse_pauses(speech: np.ndarray) -> np.ndarray:
+    """長い無音区間の中央を除き、前後の KEPT_PAUSE_MS 分だけを残す"""
+    keep = speech.copy()
+    max_pause = MAX_PAUSE_MS // FRAME_MS
+    kept_half = KEPT_PAUSE_MS // FRAME_MS // 2
+
+    # 無音区間の開始・終了位置（先頭と末尾の無音は丸ごと除去する）
+    edges = np.diff(speech.astype(np.int8))
+    starts = np.flatnonzero(edges == -1) + 1
+    ends = np.flatnonzero(edges == 1) + 1
+    if len(starts):
+        ends = ends[ends > starts[0]]
+    for start, end in zip(starts, ends):
+        if end - start > max_pause:
+            keep[start : start + kept_half] = True
+            keep[end - kept_half : end] = True
+        else:
+            keep[start:end] = True
+    return keep
+
+
+def trim_silence(audio_array: np.ndarray, sample_rate: int) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """
+    前後の無音を除去し、長い無音を短縮します。
+
+    Args:
+        audio_array (np.ndarray): int16のモノラルPCMデータ
+        sample_rate (int): サンプリングレート
+
+    Returns:
+        Tuple[np.ndarray, Dict[str, Any]]: (無音を除去したPCMデータ, 統計情報)
+            統計情報: {"original_bytes": int, "trimmed_bytes": int, "speech_ratio": float, "fallback": bool}
+    """
+    energy, zcr, frame_length = frame_features(audio_array, sample_rate)
+    speech = detect_speech(energy, zcr)
+    speech_ratio = float(speech.mean()) if len(speech) else 0.0
+    # 音声がほとんど検出されないのに十分な音量がある場合は、判定を誤ったとみなす
+    fallback = bool(
+        len(speech)
+        and speech_ratio < MIN_SPEECH_RATIO
+        and energy.max() > MIN_SPEECH_DBFS + ENERGY_MARGIN_DB
+    )
+
+    if not len(speech) or fallback:
+        # フレームに満たない短い音声・判定を誤った音声はそのまま返す
+        trimmed = audio_array
+    elif not speech.any():
+        trimmed = audio_array[:0]
+    else:
+        keep = _collapse_pauses(speech)
+        # フレームに満たない末尾のサンプルは最後のフレームの判定に従う
+        mask = np.repeat(keep, frame_length)
+        remainder = len(audio_array) - len(mask)
+        if remainder:
+            mask = np.concatenate((mask, np.full(remainder, keep[-1])))
+        trimmed = audio_array[mask]
+
+    stats = {
+        "original_bytes": audio_array.nbytes,
+        "trimmed_bytes": trimmed.nbytes,
+        "speech_ratio": speech_ratio,
+        "fallback": fallback,
+    }
+    return trimmed, stats
+
+
+def apply_vad(audio_array: np.ndarray, sample_rate: int) -> np.ndarray:
+    """
+    文字起こしの前に無音を除去し、削減したバイト数と処理時間を記録します。
+    VAD_ENABLED が false の場合はそのまま返します。
+
+    Args:
+        audio_array (np.ndarray): int16のモノラルPCMデータ
+        sample_rate (int): サンプリングレート
+
+    Returns:
+        np.ndarray: 無音を除去したPCMデータ
+    """
+    if not VAD_ENABLED:
+        return audio_array
+
+    with span("vad") as record:
+        trimmed, stats = trim_silence(audio_array, sample_rate)
+        saved_bytes = stats["original_bytes"] - stats["trimmed_bytes"]
+        record["bytes"] = saved_bytes
+
+    if stats["fallback"]:
+        logger.warning(
+            f"音声がほとんど検出されなかったため、無音を除去せずに文字起こしします"
+            f"（音声の割合={stats['speech_ratio']:.0%}）"
+        )
+        return trimmed
+
+    saved_ratio = saved_bytes / stats["original_bytes"] if stats["original_bytes"] else 0.0
+    logger.info(
+        f"無音を除去しました: {stats['original_bytes']} -> {stats['trimmed_bytes']} bytes "
+        f"({saved_ratio:.0%}削減, 音声の割合={stats['speech_ratio']:.0%}, "
+        f"処理時間={record['duration_ms']}ms)"
+    )
+    return trimmed
+
+
+def find_last_pause(
+    audio_array: np.ndarray, sample_rate: int, min_seconds: float
+) -> Optional[int]:
+    """
+    録音中の音声を区切る位置として、min_seconds 以降で最後の無音のフレームを探します。
+    単語の途中で区切らないよう、音声の閾値を下回るフレームのみを対象とします。
+
+    Args:
+        audio_array (np.ndarray): int16のモノラルPCMデータ
+        sample_rate (int): サンプリングレート
+        min_seconds (float): 区切る位置の下限（秒）
+
+    Returns:
+        Optional[int]: 区切る位置（サンプル番号、無音のフレームの中央）。無音がない場合はNone
+    """
+    energy, zcr, frame_length = frame_features(audio_array, sample_rate)
+    if not len(energy):
+        return None
+    threshold = speech_threshold(energy)
+    silent = (energy <= threshold - UNVOICED_MARGIN_DB) | (
+        (energy <= threshold) & (zcr <= UNVOICED_MIN_ZCR)
+    )
+    start = int(min_seconds * sample_rate / frame_length)
+    candidates = np.flatnonzero(silent[start:])
+    if not len(candidates):
+        return None
+    frame = start + int(candidates[-1])
+    return frame * frame_length + frame_length // 2
+
+
+def find_split_points(
+    audio_array: np.ndarray,
+    sample_rate: int,
+    target_seconds: float,
+    max_seconds: float,
+) -> List[int]:
+    """
+    長い音声を分割する位置を、目標の長さの前後で最も静かなフレームから選びます。
+
+    Args:
+        audio_array (np.ndarray): int16のモノラルPCMデータ
+        sample_rate (int): サンプリングレート
+        target_seconds (float): 1区間の目安の長さ（秒）
+        max_seconds (float): 1区間の最大の長さ（秒）
+
+    Returns:
+        List[int]: 分割位置（サンプル番号、先頭と末尾は含まない）
+    """
+    energy, _, frame_length = frame_features(audio_array, sample_rate)
+    frames_per_second = sample_rate / frame_length
+    # 目標の長さの8割から最大の長さまでの範囲で分割位置を探す
+    search_start = int(target_seconds * 0.8 * frames_per_second)
+    search_end = int(max_seconds * frames_per_second)
+
+    split_points = []
+    start = 0
+    while (len(audio_array) - start * frame_length) > max_seconds * sample_rate:
+        window = energy[start + search_start : start + search_end]
+        if not len(window):
+            break
+        split = start + search_start + int(np.argmin(window))
+        split_points.append(split * frame_length)
+        start = split
+    return split_points
@@ -1,24 +1,67 @@
-import base64
 import logging
 import os
 import queue
-from typing import Dict, Any, List, Union, Optional
+import re
+import threading
+from typing import TYPE_CHECKING, Dict, Any, List, Tuple, Union, Optional
 
-import numpy as np
-import pydub
-import requests
 import streamlit as st
-from google import genai
 from pydantic import BaseModel
-from scipy import signal
-from streamlit_webrtc import webrtc_streamer, WebRtcMode
 
-import utils.db_operations as db_operations
-
-LANGUAGE = "ja-JP"  # 音声認識に使用する言語
+from utils.audio_buffer import PcmBuffer
+from utils.gemini_cache import generate_with_checklist
+from utils.faq_cache import find_answer, save_answer
+from utils.lexical_index import LexicalIndex
+from utils.prompt_builder import compile_group_prompt, compile_prompt
+from utils.rule_check import SENTENCE_DELIMITER
+from utils.speech_api import audio_to_linear16, recognize_linear16
+from utils.speech_stream import STREAMING_TRANSCRIPTION, StreamingTranscriber
+from utils.tracing import span, trace
+
+if TYPE_CHECKING:
+    from google import genai
+
+# 音声によるチェックシート入力の指示文
+AUTO_FILL_INSTRUCTION = """
+あなたはチェックシート入力プロキシAIエージェントです。
+人間に変わって、チェックシートを入力します。
+以下は人間がチェックシートをチェックする際の音声認識の結果です。
+この音声認識の結果に基づいてチェックリストを埋めてください。
+あなたは話者になりきって、チェックリストを埋めてください。
+
+各チェック項目について、該当するかどうか（checked）を判定してください。
+音声が聞き取れない場合や、音声認識の結果がない場合、判断が難しい場合、checkedはfalseとなります。
+
+チェック項目に対して、チェック結果の理由や改善点、褒めるポイントがあれば（remarks）を記載してください。
+無ければ、remarksを空の文字列にしてください。
+特に理由や改善点がない場合、聞き取れない場合、判断が難しい場合は、remarksを空の文字列にしてください。
+
+また、全体としての評価や改善点（OverallResult）がもしあれば記載してください。
+なくても問題ありません。その場合は、overall_remarksを空の文字列にしてください。
+全体としての評価や改善点は、全体的にどのような点が良いか、または悪いかを記載してください。
+"""
+
+# 発話ごとに関連するチェック項目のみを評価する（false で毎回全項目を評価）
+VOICE_INCREMENTAL_FILL = os.getenv("VOICE_INCREMENTAL_FILL", "true").lower() == "true"
+# 発話の1文ごとに、類似度がこの値以上の項目を上位から最大 VOICE_MATCH_TOP_K 件選ぶ
+VOICE_MATCH_MIN_SCORE = float(os.getenv("VOICE_MATCH_MIN_SCORE", "0.15"))
+VOICE_MATCH_TOP_K = 5
+
+# 「質問」で始まる発話のみを質問として扱う（チェック結果の発話を誤って質問とみなさないよう、明示的な合図に限る）
+QUESTION_PATTERN = re.compile(
+    r"^\s*質問(ですが?[、。,.:：\s]*|[、。,.:：\s]+)(?P<question>.+)$", re.DOTALL
+)
 
 logger = logging.getLogger(__name__)
 
+# check_group_id -> (チェックリストのフィンガープリント, チェック項目の検索インデックス)
+_item_indexes: Dict[int, Tuple[str, LexicalIndex]] = {}
+_item_indexes_lock = threading.Lock()
+
+# 質問への回答に使うGemini APIクライアント
+_answer_client = None
+_answer_client_lock = threading.Lock()
+
 
 # Gemini APIのレスポンススキーマの定義
 class VoiceResponse(BaseModel):
@@ -38,6 +81,9 @@ class OverallResult(BaseModel):
 
 class WebRTCRecord:
     def __init__(self):
+        # WebRTCのライブラリは読み込みに時間がかかるため、録音画面を表示するときに読み込む
+        from streamlit_webrtc import webrtc_streamer, WebRtcMode
+
         self.webrtc_ctx = webrtc_streamer(
             key="sendonly-audio",
             mode=WebRtcMode.SENDONLY,
@@ -51,7 +97,7 @@ class WebRTCRecord:
         )
 
         if "audio_buffer" not in st.session_state:
-            st.session_state["audio_buffer"] = pydub.AudioSegment.empty()
+            st.session_state["audio_buffer"] = PcmBuffer()
         
         # フローティングボタンのCSS
         st.markdown(
@@ -90,139 +136,60 @@ class WebRTCRecord:
                     status_box.warning("No frame arrived.")
                     continue
 
-                status_box.info("Now Recording...")
-
-                sound_chunk = pydub.AudioSegment.empty()
+                # フレームはバッファに直接書き込み、AudioSegmentは録音停止時に一度だけ作成する
+                audio_buffer = st.session_state["audio_buffer"]
+                speech_stream = _get_speech_stream()
                 for audio_frame in audio_frames:
-                    sound = pydub.AudioSegment(
-                        data=audio_frame.to_ndarray().tobytes(),
-                        sample_width=audio_frame.format.bytes,
-                        frame_rate=audio_frame.sample_rate,
-                        channels=len(audio_frame.layout.channels),
-                    )
-                    sound_chunk += sound
-
-                if len(sound_chunk) > 0:
-                    st.session_state["audio_buffer"] += sound_chunk
+                    audio_buffer.append_frame(audio_frame)
+                    if speech_stream is not None:
+                        speech_stream.append_frame(audio_frame)
+
+                # ストリーミング認識中は認識済みのテキストを表示する
+                interim_text = speech_stream.interim_text() if speech_stream else ""
+                status_box.info(
+                    f"Now Recording... {interim_text}" if interim_text else "Now Recording..."
+                )
             else:
                 break
 
-        audio_buffer = st.session_state["audio_buffer"]
-        return audio_buffer
+        # AudioSegmentに変換せずにバッファを返す（一時ファイルに書き出した録音はメモリマップのまま認識する）
+        return st.session_state["audio_buffer"]
+
+
+def _get_speech_stream() -> Optional[StreamingTranscriber]:
+    """録音中のストリーミング認識を取得する（無効な場合はNone）"""
+    if not STREAMING_TRANSCRIPTION:
+        return None
+    # 録音停止時のリランでも認識結果を引き継ぐため、セッションに保持する
+    if "speech_stream" not in st.session_state:
+        st.session_state["speech_stream"] = StreamingTranscriber()
+    return st.session_state["speech_stream"]
+
+
+def reset_audio_buffer() -> None:
+    """録音済みの音声を破棄する（文字起こしの後に呼び出す）"""
+    audio_buffer = st.session_state.get("audio_buffer")
+    if audio_buffer is not None:
+        audio_buffer.clear()
+    speech_stream = st.session_state.pop("speech_stream", None)
+    if speech_stream is not None:
+        speech_stream.close()
 
 
 # Google Speech-to-Text Web APIを使用した音声認識
-def transcribe_audio_with_google_web_api(audio_segment):
+def transcribe_audio_with_google_web_api(audio):
     """
     Google Speech-to-Text Web APIを使用して音声を文字起こしします。
 
     Args:
-        audio_segment: pydubのAudioSegmentオブジェクト
+        audio: 録音したPcmBuffer または pydubのAudioSegmentオブジェクト
 
     Returns:
         str: 認識されたテキスト
     """
     try:
-        # 音声データを適切な形式に変換
-        samples = audio_segment.get_array_of_samples()
-
-        # 音声データの形式を確認
-        if audio_segment.sample_width == 1:
-            # 8bit unsigned
-            audio_array = np.array(samples, dtype=np.uint8)
-            audio_array = (audio_array.astype(np.float32) - 128) / 128.0
-        elif audio_segment.sample_width == 2:
-            # 16bit signed
-            audio_array = np.array(samples, dtype=np.int16)
-            audio_array = audio_array.astype(np.float32) / 32768.0
-        elif audio_segment.sample_width == 4:
-            # 32bit signed
-            audio_array = np.array(samples, dtype=np.int32)
-            audio_array = audio_array.astype(np.float32) / 2147483648.0
-        else:
-            # その他の場合は16bitとして処理
-            audio_array = np.array(samples, dtype=np.float32)
-            if audio_array.max() > 1.0 or audio_array.min() < -1.0:
-                audio_array = audio_array / 32768.0
-
-        # Google Speech-to-Text APIは16bit PCMを要求
-        # float32から16bit PCMに変換
-        audio_array = (audio_array * 32767).astype(np.int16)
-
-        # モノラルに変換（ステレオの場合は左チャンネルのみ使用）
-        if audio_segment.channels == 2:
-            # ステレオの場合、左右のチャンネルを平均化
-            audio_array = audio_array.reshape(-1, 2).mean(axis=1).astype(np.int16)
-
-        # サンプリングレートを確認（Google Speech-to-Text APIは8kHz, 16kHz, 32kHz, 48kHzをサポート）
-        sample_rate = audio_segment.frame_rate
-        if sample_rate not in [8000, 16000, 32000, 48000]:
-            # サポートされていないサンプリングレートの場合は16kHzに変換
-            target_rate = 16000
-            audio_array = signal.resample(
-                audio_array, int(len(audio_array) * target_rate / sample_rate)
-            )
-            audio_array = (audio_array * 32767).astype(np.int16)
-            sample_rate = target_rate
-
-        # デバッグ情報をログに出力
-        logger.info(
-            f"音声データ情報: 長さ={len(audio_array)}, サンプリングレート={sample_rate}, チャンネル数={audio_segment.channels}"
-        )
-        logger.info(f"音声データ範囲: min={audio_array.min()}, max={audio_array.max()}")
-
-        # 音声データをbase64エンコード
-        audio_bytes = audio_array.tobytes()
-        audio_base64 = base64.b64encode(audio_bytes).decode("utf-8")
-
-        # Google Cloud APIキーを取得
-        api_key = os.getenv("GOOGLE_CLOUD_API_KEY")
-        if not api_key:
-            logger.error("GOOGLE_CLOUD_API_KEY環境変数が設定されていません")
-            st.error("Google Cloud APIキーが設定されていません")
-            return ""
-
-        # Web APIのエンドポイント
-        url = f"https://speech.googleapis.com/v1/speech:recognize?key={api_key}"
-
-        # リクエストボディの作成
-        request_body = {
-            "config": {
-                "encoding": "LINEAR16",
-                "sampleRateHertz": sample_rate,
-                "languageCode": LANGUAGE,
-                "enableAutomaticPunctuation": True,
-                "model": "default",
-            },
-            "audio": {"content": audio_base64},
-        }
-
-        # APIリクエストの送信
-        headers = {"Content-Type": "application/json"}
-
-        response = requests.post(url, headers=headers, json=request_body)
-
-        if response.status_code == 200:
-            result = response.json()
-
-            # 認識結果を取得
-            if "results" in result and result["results"]:
-                full_text = ""
-                for res in result["results"]:
-                    if "alternatives" in res and res["alternatives"]:
-                        full_text += res["alternatives"][0]["transcript"] + " "
-                logger.info(f"認識結果: {full_text.strip()}")
-                return full_text.strip()
-            else:
-                logger.warning("音声認識結果が空でした")
-                return ""
-        else:
-            logger.error(
-                f"Google Speech-to-Text Web API エラー: {response.status_code} - {response.text}"
-            )
-            st.error(f"Google Speech-to-Text Web API エラー: {response.status_code}")
-            return ""
-
+        audio_array, sample_rate = audio_to_linear16(audio)
+        return recognize_linear16(audio_array, sample_rate)
     except Exception as e:
         logger.error(f"Google Speech-to-Text Web API エラー: {e}")
         st.error(f"Google Speech-to-Text Web API エラー: {e}")
@@ -230,112 +197,239 @@ def transcribe_audio_with_google_web_api(audio_segment):
 
 
 # デフォルトの音声認識関数（Web APIを使用）
-def transcribe_audio_with_google(audio_segment):
+def transcribe_audio_with_google(audio):
     """
     デフォルトの音声認識関数（Web APIを使用）
 
     Args:
-        audio_segment: pydubのAudioSegmentオブジェクト
+        audio: 録音したPcmBuffer または pydubのAudioSegmentオブジェクト
 
     Returns:
         str: 認識されたテキスト
     """
-    return transcribe_audio_with_google_web_api(audio_segment)
+    audio_bytes = audio.nbytes if isinstance(audio, PcmBuffer) else len(audio.raw_data)
+    with trace("transcription"), span("transcribe", bytes=audio_bytes):
+        # 録音中にストリーミング認識していた場合は、残りの区間のみを認識して結合する
+        speech_stream = st.session_state.pop("speech_stream", None)
+        if speech_stream is not None and len(speech_stream):
+            try:
+                return speech_stream.finish()
+            finally:
+                speech_stream.close()
+        return transcribe_audio_with_google_web_api(audio)
+
+
+def _get_item_index(compiled: Dict[str, Any]) -> LexicalIndex:
+    """チェック項目の検索インデックスを取得する（チェックリストが変わった場合のみ作り直す）"""
+    check_group_id = compiled["check_group_id"]
+    with _item_indexes_lock:
+        cached = _item_indexes.get(check_group_id)
+        if cached and cached[0] == compiled["fingerprint"]:
+            return cached[1]
+
+    index = LexicalIndex(
+        (item["check_id"], f"{item['name']} {item['description']}")
+        for item in compiled["check_items"]
+    )
+    with _item_indexes_lock:
+        _item_indexes[check_group_id] = (compiled["fingerprint"], index)
+    return index
 
 
-def auto_fill_check_sheet(check_group_id: int, comment: str) -> Dict[str, Any]:
+def match_check_items(compiled: Dict[str, Any], comment: str) -> List[Dict[str, Any]]:
     """
-    ドキュメントを自動チェックし、チェック結果を返します。
+    音声認識結果の各文に関連するチェック項目を、項目名と説明の類似度で選びます。
 
     Args:
-        check_group_id (int): チェックグループID
+        compiled (Dict[str, Any]): チェックグループのコンパイル済みプロンプト
         comment (str): 音声認識結果
 
     Returns:
-        Dict[str, Any]: チェック結果を含む辞書
+        List[Dict[str, Any]]: 関連するチェック項目（チェックリストの順）
     """
-    # チェックリストの取得（指定されたグループの項目を取得）
-    checksheet_data = db_operations.load_check_items_by_group(check_group_id=check_group_id)
-
-    # チェック項目の情報を収集
-    check_items = []
-    for category, items in checksheet_data.items():
-        for item in items:
-            check_items.append(
-                {
-                    "check_id": item["check_id"],
-                    "name": item["name"],
-                    "description": item["description"],
-                    "level": item["level"],
-                }
+    index = _get_item_index(compiled)
+    matched = set()
+    for utterance in SENTENCE_DELIMITER.split(comment):
+        if not utterance.strip():
+            continue
+        matched.update(
+            check_id
+            for check_id, _ in index.search(
+                utterance, top_k=VOICE_MATCH_TOP_K, min_score=VOICE_MATCH_MIN_SCORE
             )
+        )
+    return [item for item in compiled["check_items"] if item["check_id"] in matched]
 
-    # Gemini APIの呼び出し
-    client = genai.Client(
-        vertexai=True,
-        project=os.getenv("GOOGLE_CLOUD_PROJECT"),
-        location="us-central1",
-    )
 
-    # プロンプトの作成
-    prompt = f"""
-    あなたはチェックシート入力プロキシAIエージェントです。
-    人間に変わって、チェックシートを入力します。
-    以下は人間がチェックシートをチェックする際の音声認識の結果です。
-    この音声認識の結果に基づいてチェックリストを埋めてください。
-    あなたは話者になりきって、チェックリストを埋めてください。
+def auto_fill_check_sheet(
+    check_group_id: int, comment: str, incremental: bool = VOICE_INCREMENTAL_FILL
+) -> Tuple[List[Union[CheckResult, OverallResult]], List[str]]:
+    """
+    音声認識結果からチェックシートを自動入力し、チェック結果と評価対象の項目のcheck_idを返します。
+    incremental が True の場合は、発話に関連するチェック項目のみを評価します。
 
-    各チェック項目について、該当するかどうか（checked）を判定してください。
-    音声が聞き取れない場合や、音声認識の結果がない場合、判断が難しい場合、checkedはfalseとなります。
+    Args:
+        check_group_id (int): チェックグループID
+        comment (str): 音声認識結果
+        incremental (bool): 関連する項目のみを評価するかどうか
 
-    チェック項目に対して、チェック結果の理由や改善点、褒めるポイントがあれば（remarks）を記載してください。
-    無ければ、remarksを空の文字列にしてください。
-    特に理由や改善点がない場合、聞き取れない場合、判断が難しい場合は、remarksを空の文字列にしてください。
+    Returns:
+        Tuple[List[Union[CheckResult, OverallResult]], List[str]]:
+            (評価した項目のチェック結果と全体の評価, Geminiに評価を依頼した項目のcheck_id)
+    """
+    with trace("voice_fill"):
+        # チェックリストの取得（指定されたグループの項目をコンパクトな表形式に変換）
+        with span("load_items"):
+            compiled = compile_group_prompt(
+                kind="voice",
+                check_group_id=check_group_id,
+                instruction=AUTO_FILL_INSTRUCTION,
+            )
 
-    また、全体としての評価や改善点（OverallResult）がもしあれば記載してください。
-    なくても問題ありません。その場合は、overall_remarksを空の文字列にしてください。
-    全体としての評価や改善点は、全体的にどのような点が良いか、または悪いかを記載してください。
+        if incremental:
+            with span("match_items"):
+                matched_items = match_check_items(compiled, comment)
+            logger.info(
+                f"発話に関連するチェック項目: {len(matched_items)}/{len(compiled['check_items'])}件"
+            )
+            if not matched_items:
+                return [], []
+            if len(matched_items) < len(compiled["check_items"]):
+                compiled = compile_prompt(
+                    kind="voice",
+                    check_group_id=check_group_id,
+                    instruction=AUTO_FILL_INSTRUCTION,
+                    check_items=matched_items,
+                )
+
+        check_ids = [item["check_id"] for item in compiled["check_items"]]
 
-    # 音声認識の結果:
-    {comment}
+        # Gemini APIの呼び出し
+        from google import genai
 
-    # チェックリスト:
-    {check_items}
-    """
+        client = genai.Client(
+            vertexai=True,
+            project=os.getenv("GOOGLE_CLOUD_PROJECT"),
+            location="us-central1",
+        )
 
-    # Gemini APIの呼び出し
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=prompt,
-        config={
-            "response_mime_type": "application/json",
-            "response_schema": list[Union[CheckResult, OverallResult]],
-        },
-    )
+        # プロンプトの作成（指示文とチェックリストはグループごとに共通のためキャッシュ対象）
+        with span("llm", bytes=len(comment.encode("utf-8"))):
+            response = generate_with_checklist(
+                client,
+                model="gemini-2.0-flash",
+                compiled=compiled,
+                request_text=f"# 音声認識の結果:\n{comment}",
+                config={
+                    "response_mime_type": "application/json",
+                    "response_schema": list[Union[CheckResult, OverallResult]],
+                },
+            )
 
     # レスポンスの解析
     try:
-        return response.parsed
+        return response.parsed, check_ids
     except Exception as e:
         raise Exception(
             f"Gemini APIのレスポンスの解析中にエラーが発生しました: {str(e)}"
         )
 
 
+def patch_results(
+    results: Dict[str, Dict[str, Any]],
+    gemini_response: List[Union[CheckResult, OverallResult]],
+    check_ids: List[str],
+) -> Tuple[Dict[str, Dict[str, Any]], str]:
+    """
+    既存のチェック結果のうち、Geminiが回答した項目のみを上書きします。
+    評価を依頼していない項目（存在しないIDや発話に関連しない項目）の回答は無視します。
+
+    Args:
+        results (Dict[str, Dict[str, Any]]): check_idごとの既存の結果
+        gemini_response (List[Union[CheckResult, OverallResult]]): auto_fill_check_sheetの結果
+        check_ids (List[str]): auto_fill_check_sheetで評価を依頼した項目のcheck_id
+
+    Returns:
+        Tuple[Dict[str, Dict[str, Any]], str]: (更新後の結果, 全体の評価（なければ空文字列）)
+    """
+    patched = {check_id: dict(result) for check_id, result in results.items()}
+    overall_remarks = ""
+    allowed = set(check_ids) & set(results)
+    for result in gemini_response:
+        if isinstance(result, CheckResult):
+            if result.check_id not in allowed:
+                logger.warning(f"評価を依頼していない項目の回答を無視しました: {result.check_id}")
+                continue
+            patched[result.check_id] = {
+                "checked": result.checked,
+                "remarks": result.remarks or "",
+            }
+        elif isinstance(result, OverallResult) and result.overall_remarks:
+            overall_remarks = result.overall_remarks
+    return patched, overall_remarks
+
+
+def _get_answer_client() -> "genai.Client":
+    """質問への回答に使うGemini APIクライアントを取得する（接続を再利用するため使い回す）"""
+    global _answer_client
+    with _answer_client_lock:
+        if _answer_client is None:
+            from google import genai
+
+            _answer_client = genai.Client()
+        return _answer_client
+
+
+def extract_question(transcribed_text: str) -> Optional[str]:
+    """
+    「質問」で始まる発話から質問内容を取り出します。
+
+    Args:
+        transcribed_text (str): 音声認識で得られたテキスト
+
+    Returns:
+        Optional[str]: 質問内容（「質問」で始まらない発話はチェック結果の入力としてNone）
+    """
+    match = QUESTION_PATTERN.match(transcribed_text)
+    return match.group("question").strip() if match else None
+
+
+def warm_answer_client() -> None:
+    """質問への回答に使うGemini APIクライアントを作成しておく（起動時のウォームアップ用）"""
+    _get_answer_client()
+
+
 # Gemini APIを使用した音声内容の分析
-def analyze_voice_content_with_gemini(transcribed_text: str) -> str:
+def analyze_voice_content_with_gemini(
+    transcribed_text: str,
+    check_group_id: Optional[int] = None,
+    user_id: Optional[str] = None,
+) -> str:
     """
     音声認識結果をGemini APIを使用して質問に回答します。
+    チェックグループが指定された場合は、先に過去の回答済み・FAQの質問から同じ質問を探し、
+    見つからなかった場合のみGeminiに問い合わせて回答を保存します。
 
     Args:
         transcribed_text (str): 音声認識で得られたテキスト
+        check_group_id (Optional[int]): チェックグループID
+        user_id (Optional[str]): 質問者のユーザーID（回答の保存に使用）
 
     Returns:
-        str: Geminiからの回答
+        str: 回答
     """
+    if check_group_id is not None:
+        try:
+            cached = find_answer(check_group_id, transcribed_text)
+        except Exception as e:
+            logger.warning(f"FAQの検索中にエラーが発生しました: {e}")
+            cached = None
+        if cached:
+            return cached["answer"]
+
     try:
-        # Gemini APIクライアントの初期化
-        client = genai.Client()
+        # Gemini APIクライアントの取得
+        client = _get_answer_client()
 
         # シンプルなプロンプト
         prompt = f"""
@@ -358,13 +452,17 @@ def analyze_voice_content_with_gemini(transcribed_text: str) -> str:
         try:
             result = response.parsed
             logger.info(f"Gemini回答: {result.response}")
-            return result.response
         except Exception as e:
             logger.error(
                 f"Gemini APIのレスポンスの解析中にエラーが発生しました: {str(e)}"
             )
             return "回答の解析中にエラーが発生しました"
 
+        # 次回以降の同じ質問に再利用できるよう回答を保存
+        if check_group_id is not None and user_id:
+            save_answer(check_group_id, transcribed_text, result.response, user_id)
+        return result.response
+
     except Exception as e:
         logger.error(f"Gemini API エラー: {e}")
         return "Gemini APIの呼び出し中にエラーが発生しました"
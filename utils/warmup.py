@@ -0,0 +1,166 @@
+import importlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+
+import utils.db_operations as db_operations
+
+logger = logging.getLogger(__name__)
+
+# ウォームアップ時に開いておくDB接続の数（コネクションプールの常駐数まで）
+WARMUP_DB_CONNECTIONS = min(
+    int(os.getenv("WARMUP_DB_CONNECTIONS", str(db_operations.POOL_SIZE))),
+    db_operations.POOL_SIZE,
+)
+# DBに接続できなかった場合に再試行するまでの秒数
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+
+# 最初の利用者が待たないよう、起動時に読み込んでおくモジュール
+WARMUP_MODULES = [
+    "utils.auto_check",
+    "utils.voice_utils",
+    "google.genai",
+    "google.cloud.documentai_v1",
+    "scipy.signal",
+    "pydub",
+    "streamlit_webrtc",
+]
+
+_ready = threading.Event()
+_started = False
+_start_lock = threading.Lock()
+_status: Dict[str, Any] = {"started_at": None, "finished_at": None, "steps": {}}
+
+
+def _open_db_pool() -> None:
+    """コネクションプールに接続を作成しておく（Cloud SQL Connectorの初期化を含む）"""
+
+    def ping(_):
+        with db_operations.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            # 同時に接続を保持して、プールに複数の接続を作らせる
+            time.sleep(0.1)
+
+    with ThreadPoolExecutor(max_workers=WARMUP_DB_CONNECTIONS) as executor:
+        list(executor.map(ping, range(WARMUP_DB_CONNECTIONS)))
+
+
+def _import_modules() -> None:
+    """読み込みに時間がかかるSDKを読み込んでおく（読み込めなかったモジュールはまとめて報告する）"""
+    failed = []
+    for module in WARMUP_MODULES:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            failed.append(f"{module}: {e}")
+    if failed:
+        raise Exception(", ".join(failed))
+
+
+def _construct_clients() -> None:
+    """APIクライアントとHTTPセッションを作成しておく"""
+    from utils import speech_api, voice_utils
+
+    speech_api.warm_session()
+    voice_utils.warm_answer_client()
+
+
+def _preload_checklists() -> None:
+    """チェックグループ・カテゴリーと、各グループのチェックリスト・プロンプト・FAQの索引を読み込んでおく"""
+    from utils import auto_check, faq_cache, prompt_builder, voice_utils
+
+    for group in db_operations.get_all_check_groups():
+        check_group_id = group["id"]
+        db_operations.get_categories_by_group_id(check_group_id)
+        prompt_builder.compile_group_prompt(
+            "voice", check_group_id, voice_utils.AUTO_FILL_INSTRUCTION
+        )
+        prompt_builder.compile_group_prompt(
+            "document", check_group_id, auto_check.AUTO_CHECK_INSTRUCTION
+        )
+        faq_cache.preload_faq_index(check_group_id)
+
+
+# (ステップ名, 処理, 失敗した場合に再試行するか)
+WARMUP_STEPS: List[tuple] = [
+    ("db_pool", _open_db_pool, True),
+    ("imports", _import_modules, False),
+    ("clients", _construct_clients, False),
+    ("checklists", _preload_checklists, True),
+]
+
+
+def _run_step(name: str, func: Callable[[], None]) -> bool:
+    """ウォームアップの1ステップを実行し、結果を記録する"""
+    started = time.perf_counter()
+    try:
+        func()
+        error = None
+    except Exception as e:
+        error = str(e)
+    elapsed = time.perf_counter() - started
+    _status["steps"][name] = {"ok": error is None, "seconds": round(elapsed, 3), "error": error}
+    if error:
+        logger.warning(f"ウォームアップ中にエラーが発生しました: {name} - {error}")
+    else:
+        logger.info(f"ウォームアップ: {name} {elapsed:.2f}秒")
+    return error is None
+
+
+def warm_up() -> None:
+    """
+    DB接続・APIクライアント・チェックリストを準備する。
+    DBに関するステップは成功するまで再試行し、すべて完了したら準備完了とする。
+    それ以外のステップ（認証情報のないローカル環境でのクライアント作成など）の失敗は記録のみ行う。
+    """
+    _status["started_at"] = datetime.now().isoformat()
+    for name, func, required in WARMUP_STEPS:
+        while not _run_step(name, func) and required:
+            time.sleep(WARMUP_RETRY_SECONDS)
+    _status["finished_at"] = datetime.now().isoformat()
+    _ready.set()
+    logger.info("ウォームアップが完了しました")
+
+
+def start_warm_up() -> None:
+    """ウォームアップをバックグラウンドで開始する（プロセスで1回のみ）"""
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=warm_up, name="warmup", daemon=True).start()
+
+
+def wait_until_ready(timeout: Optional[float] = None) -> bool:
+    """
+    ウォームアップの完了を待つ
+
+    Args:
+        timeout (Optional[float]): 待つ最大の秒数（Noneの場合は完了まで待つ）
+
+    Returns:
+        bool: 準備が完了した場合はTrue
+    """
+    return _ready.wait(timeout)
+
+
+def is_ready() -> bool:
+    """準備が完了しているかどうか"""
+    return _ready.is_set()
+
+
+def get_warmup_status() -> Dict[str, Any]:
+    """
+    ウォームアップの状況を取得する
+
+    Returns:
+        Dict[str, Any]: {"ready": bool, "started_at": str, "finished_at": str, "steps": {ステップ名: {"ok", "seconds", "error"}}}
+    """
+    return {"ready": is_ready(), **_status, "steps": dict(_status["steps"])}